@@ -2,6 +2,10 @@ from flask import Flask, jsonify
 from flask_cors import CORS
 from config.settings import Config
 from services.embeddings_loader import embeddings_loader
+from services.model_registry import model_registry
+from services.job_queue import job_queue
+from services.inference_pool import inference_pool
+import multiprocessing as mp
 import os
 
 # Create Flask app
@@ -21,20 +25,83 @@ app.register_blueprint(attendance_bp, url_prefix='/api/attendance')
 app.register_blueprint(students_bp, url_prefix='/api/students')
 app.register_blueprint(teachers_bp, url_prefix='/api/teachers')
 
-# Health check endpoint
+def models_ready() -> bool:
+    # With INFERENCE_WORKERS the models live in the pool's processes
+    if Config.INFERENCE_WORKERS > 0:
+        return inference_pool.ready
+    return model_registry.ready
+
+# Liveness: answers immediately, even while models are still loading
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({
         'status': 'healthy',
         'message': 'Attendance Backend API is running',
+        'ready': embeddings_loader.loaded and models_ready(),
         'embeddings_loaded': embeddings_loader.loaded
     }), 200
 
-# Load embeddings on startup
-print("🚀 Starting Attendance Backend API...")
-print(f"📍 Environment: {Config.FLASK_ENV}")
-embeddings_loader.load_embeddings_database()
-print("✅ Backend ready!")
+# Readiness: 503 until the embeddings and every model are loaded
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    ready = embeddings_loader.loaded and models_ready()
+    return jsonify({
+        'ready': ready,
+        'embeddings_loaded': embeddings_loader.loaded,
+        'embeddings': embeddings_loader.metrics(),
+        'models': model_registry.status(),
+        'inference_pool': inference_pool.stats() if Config.INFERENCE_WORKERS > 0 else None,
+        'jobs': job_queue.stats()
+    }), 200 if ready else 503
+
+def start_background_services():
+    """
+    Load embeddings and models in the background so the worker can serve
+    /health straight away; requests that need a model wait for it.
+
+    Skipped in child processes: under `python app.py` the spawned
+    inference workers re-import this module as __mp_main__, and must not
+    load the database or start their own pool, refresher and compactor.
+    """
+    if mp.parent_process() is not None:
+        return
+
+    print("🚀 Starting Attendance Backend API...")
+    print(f"📍 Environment: {Config.FLASK_ENV}")
+    if Config.INFERENCE_WORKERS > 0:
+        # Detection + embedding run in spawned worker processes that load their
+        # own models; this process only needs the embeddings (PRELOAD_MODELS is ignored)
+        model_registry.warm_up_async(
+            embeddings_loader.load_embeddings_database,
+            embeddings_loader.start_refresher,
+            embeddings_loader.start_compactor,
+            inference_pool.start,
+            load_models=False
+        )
+        print(f"⏳ Starting {Config.INFERENCE_WORKERS} inference workers in the background")
+    elif Config.PRELOAD_MODELS:
+        # gunicorn --preload: load once in the master, warm up in each worker.
+        # The refresher and compactor start in every worker either way
+        embeddings_loader.load_embeddings_database()
+        model_registry.preload()
+        model_registry.warm_up_after_fork(
+            embeddings_loader.start_refresher,
+            embeddings_loader.start_compactor,
+            load_models=Config.WARMUP_ON_START
+        )
+        print("📦 Models preloaded for copy-on-write sharing across workers")
+    else:
+        # Without warm-up the embeddings and models load on first use, but the
+        # refresher and compactor run regardless
+        tasks = [embeddings_loader.start_refresher, embeddings_loader.start_compactor]
+        if Config.WARMUP_ON_START:
+            tasks.insert(0, embeddings_loader.load_embeddings_database)
+            print("⏳ Warming up models in the background")
+        model_registry.warm_up_async(*tasks, load_models=Config.WARMUP_ON_START)
+    print("✅ Backend accepting requests")
+
+
+start_background_services()
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 8080))
@@ -0,0 +1,73 @@
+"""
+Recall vs. latency of the institution-wide ANN indexes against brute force
+
+Synthetic gallery: each student gets a random identity vector plus a few
+noisy prototypes; queries are fresh noisy views of random students.
+Recall@1 is agreement with the exact index's top student.
+
+Run from the repo root:
+    python -m benchmarks.bench_ann_index [--students 50000] [--queries 500]
+"""
+import argparse
+import time
+import numpy as np
+from services.embedding_store import EmbeddingStore
+from services.ann_index import ExactIndex, IVFIndex, HNSWIndex
+from services.gallery_matcher import normalize_rows
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--students', type=int, default=50_000)
+parser.add_argument('--prototypes', type=int, default=3)
+parser.add_argument('--queries', type=int, default=500)
+parser.add_argument('--noise', type=float, default=0.6)
+args = parser.parse_args()
+
+rng = np.random.default_rng(0)
+identities = rng.standard_normal((args.students, 128)).astype(np.float32)
+store = EmbeddingStore.from_dict(
+    {
+        f"student-{i}": identities[i] + args.noise * rng.standard_normal((args.prototypes, 128))
+        for i in range(args.students)
+    },
+    key_type='student_id'
+)
+targets = rng.integers(0, args.students, size=args.queries)
+queries = identities[targets] + args.noise * rng.standard_normal((args.queries, 128)).astype(np.float32)
+
+vectors = normalize_rows(store.matrix)
+owners = np.repeat(np.arange(len(store)), np.diff(store.offsets))
+
+
+def evaluate(label, index, truth=None):
+    start = time.perf_counter()
+    results = index.search(queries, k=1)
+    per_query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    top = np.array([r[0][0] if r else -1 for r in results])
+    recall = 1.0 if truth is None else float(np.mean(top == truth))
+    print(f"  {label:<22} {per_query_ms:>10.3f} ms/query {recall:>10.3f}")
+    return top
+
+
+print(f"{args.students:,} students x {args.prototypes} prototypes, {args.queries} queries")
+print(f"  {'index':<22} {'latency':>18} {'recall@1':>10}")
+print("=" * 56)
+
+exact = ExactIndex(vectors, store.offsets)
+truth = evaluate('exact', exact)
+
+start = time.perf_counter()
+ivf = IVFIndex(vectors, owners, nprobe=1)
+print(f"  (IVF build: {time.perf_counter() - start:.1f}s, nlist={len(ivf.centroids)})")
+for nprobe in (1, 4, 8, 16, 32):
+    ivf.nprobe = min(nprobe, len(ivf.centroids))
+    evaluate(f'ivf nprobe={nprobe}', ivf, truth)
+
+try:
+    start = time.perf_counter()
+    hnsw = HNSWIndex(vectors, owners)
+    print(f"  (HNSW build: {time.perf_counter() - start:.1f}s)")
+    for ef in (16, 64, 256):
+        hnsw.index.set_ef(ef)
+        evaluate(f'hnsw ef={ef}', hnsw, truth)
+except ImportError:
+    print("  hnsw: skipped (pip install hnswlib)")
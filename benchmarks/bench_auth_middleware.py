@@ -0,0 +1,71 @@
+"""
+Per-request overhead of teacher_required with and without the token cache
+
+Times a no-op @teacher_required view twice: the decorator alone, inside
+one request context, and a full round trip through Flask's test client,
+which adds routing and response building. Each runs with JWT_CACHE_SIZE=0
+(every request re-verifies HS256, the old behaviour) and with the cache.
+A handful of distinct tokens stands in for several dashboards polling.
+
+Run from the repo root:
+    python -m benchmarks.bench_auth_middleware [--requests 20000] [--tokens 8]
+"""
+import argparse
+import time
+import jwt
+from datetime import datetime, timedelta
+from flask import Flask
+from config.settings import Config
+from middleware.auth_middleware import teacher_required, token_cache
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--requests', type=int, default=20000)
+parser.add_argument('--tokens', type=int, default=8)
+args = parser.parse_args()
+
+tokens = [
+    jwt.encode({
+        'user_id': f'teacher-{i}',
+        'email': f'teacher{i}@example.com',
+        'role': 'teacher',
+        'exp': datetime.utcnow() + timedelta(hours=Config.JWT_EXPIRATION_HOURS)
+    }, Config.SECRET_KEY, algorithm='HS256')
+    for i in range(args.tokens)
+]
+headers = [{'Authorization': f'Bearer {token}'} for token in tokens]
+
+app = Flask(__name__)
+
+
+@app.route('/ping')
+@teacher_required
+def ping():
+    return 'ok'
+
+
+def decorator_only(n: int):
+    view = teacher_required(lambda: None)
+    for i in range(n):
+        with app.test_request_context('/ping', headers=headers[i % len(headers)]):
+            view()
+
+
+def round_trip(n: int):
+    client = app.test_client()
+    for i in range(n):
+        response = client.get('/ping', headers=headers[i % len(headers)])
+        assert response.status_code == 200
+
+
+print(f"{args.requests} requests over {args.tokens} tokens")
+print(f"  {'path':<14} {'cache':<6} {'us/request':>11}")
+print("=" * 34)
+for label, fn in (('decorator', decorator_only), ('test client', round_trip)):
+    for size in (0, Config.JWT_CACHE_SIZE or 4096):
+        token_cache.max_size = size
+        token_cache.clear()
+        fn(200)  # warm up
+        start = time.perf_counter()
+        fn(args.requests)
+        elapsed = time.perf_counter() - start
+        print(f"  {label:<14} {'on' if size else 'off':<6} {elapsed / args.requests * 1e6:>11.1f}")
@@ -0,0 +1,136 @@
+"""
+Users/sec: one-at-a-time registration vs. services.bulk_registration
+
+Starts a local stand-in for the two Supabase APIs the registration path
+uses (GoTrue /auth/v1/admin/users and /resend, PostgREST /rest/v1/<table>),
+each request delayed by --latency-ms to mimic the network round trip, and
+points the Supabase client at it. Nothing real is created.
+
+    per-user:  auth call + user_profiles insert + students insert, in
+               sequence for every user (what /register does)
+    bulk:      up-front duplicate lookups, --workers concurrent auth
+               calls, chunked inserts
+
+Run from the repo root:
+    python -m benchmarks.bench_bulk_register [--users 3000] [--latency-ms 40] [--workers 1 4 8 16]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--users', type=int, default=3000)
+parser.add_argument('--latency-ms', type=float, default=40.0)
+parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+parser.add_argument('--chunk', type=int, default=500)
+parser.add_argument('--legacy-users', type=int, default=300, help='per-user path is slow; extrapolated from this many')
+args = parser.parse_args()
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Answers just enough of GoTrue and PostgREST for the registration calls"""
+
+    def _reply(self, status: int, body):
+        time.sleep(args.latency_ms / 1000)
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        # Duplicate lookups: nothing is registered yet
+        self._reply(200, [])
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'null')
+        if self.path.startswith('/auth/v1/admin/users'):
+            self._reply(200, {
+                'id': str(uuid.uuid4()),
+                'aud': 'authenticated',
+                'role': 'authenticated',
+                'email': body['email'],
+                'app_metadata': {},
+                'user_metadata': {},
+                'created_at': datetime.now(timezone.utc).isoformat()
+            })
+        elif self.path.startswith('/auth/v1/resend'):
+            self._reply(200, {})
+        else:
+            self._reply(201, body if isinstance(body, list) else [body])
+
+    def log_message(self, *_):
+        pass
+
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+server.daemon_threads = True
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+# Before services.supabase_client is imported, so the singleton targets the stand-in
+os.environ['SUPABASE_URL'] = f"http://127.0.0.1:{server.server_port}"
+os.environ['SUPABASE_SERVICE_KEY'] = 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.standin'
+
+from services.supabase_client import supabase_client
+from services.bulk_registration import BulkRegistration, STATUS_CREATED
+
+
+def make_rows(n: int, tag: str):
+    return [
+        {
+            'email': f"{tag}-{i}@student.example.com",
+            'password': 'pass123',
+            'full_name': f"Student {i}",
+            'role': 'student',
+            'enrollment_number': f"{tag}-{i:05d}",
+            'department': 'Computer Science',
+            'year': 2,
+            'section': 'A'
+        }
+        for i in range(n)
+    ]
+
+
+def per_user(rows):
+    for row in rows:
+        user = supabase_client.auth.admin.create_user({
+            'email': row['email'], 'password': row['password'], 'email_confirm': True
+        }).user
+        supabase_client.table('user_profiles').insert({
+            'user_id': user.id, 'email': row['email'], 'full_name': row['full_name'],
+            'role': row['role'], 'department': row['department']
+        }).execute()
+        supabase_client.table('students').insert({
+            'student_id': user.id, 'enrollment_number': row['enrollment_number'],
+            'year': row['year'], 'section': row['section']
+        }).execute()
+
+
+print(f"{args.users} users, {args.latency_ms:.0f} ms per round trip (stand-in on port {server.server_port})")
+print(f"  {'path':<22} {'seconds':>9} {'users/s':>9}")
+print("=" * 44)
+
+legacy_rows = make_rows(args.legacy_users, 'legacy')
+start = time.perf_counter()
+per_user(legacy_rows)
+elapsed = time.perf_counter() - start
+rate = len(legacy_rows) / elapsed
+print(f"  {'per-user':<22} {args.users / rate:>8.1f}* {rate:>9.1f}")
+
+for workers in args.workers:
+    rows = make_rows(args.users, f"bulk{workers}")
+    start = time.perf_counter()
+    report = BulkRegistration(workers=workers, chunk_size=args.chunk).register(rows)
+    elapsed = time.perf_counter() - start
+    created = sum(1 for r in report if r['status'] == STATUS_CREATED)
+    assert created == len(rows), f"only {created}/{len(rows)} created"
+    print(f"  {f'bulk ({workers} workers)':<22} {elapsed:>9.1f} {len(rows) / elapsed:>9.1f}")
+
+print(f"\n* extrapolated from {args.legacy_users} users")
+server.shutdown()
@@ -0,0 +1,111 @@
+"""
+Rows/sec: per-record /save round trips vs. the bulk save RPC
+
+Talks to PostgREST directly (the same API Supabase exposes under /rest/v1).
+Local stand-in:
+
+    docker run -d --name pg -e POSTGRES_PASSWORD=pg -p 5432:5432 postgres:15
+    psql postgresql://postgres:pg@localhost:5432/postgres \
+        -f benchmarks/postgrest_standin.sql \
+        -f supabase/migrations/20261018000000_bulk_attendance_save.sql \
+        -f supabase/migrations/20261018020000_bulk_save_per_teacher_keys.sql
+    docker run -d --name rest --network host \
+        -e PGRST_DB_URI=postgresql://postgres:pg@localhost:5432/postgres \
+        -e PGRST_DB_ANON_ROLE=service_role postgrest/postgrest
+
+Run from the repo root:
+    python -m benchmarks.bench_bulk_save [--url http://localhost:3000] [--records 500] [--students 60]
+"""
+import argparse
+import time
+import uuid
+import httpx
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--url', default='http://localhost:3000')
+parser.add_argument('--key', help='service key (Supabase); omit for a bare PostgREST')
+parser.add_argument('--records', type=int, default=500)
+parser.add_argument('--students', type=int, default=60)
+parser.add_argument('--chunk', type=int, default=100)
+args = parser.parse_args()
+
+headers = {'Content-Type': 'application/json'}
+if args.key:
+    headers.update({'apikey': args.key, 'Authorization': f'Bearer {args.key}'})
+client = httpx.Client(base_url=args.url.rstrip('/'), headers=headers, timeout=120)
+
+teacher_id = str(uuid.uuid4())
+students = [str(uuid.uuid4()) for _ in range(args.students)]
+
+
+def make_records(n: int, tag: str):
+    return [
+        {
+            'class_id': str(uuid.uuid4()),
+            'date': f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            'present_students': students[: args.students * 3 // 4],
+            'absent_students': students[args.students * 3 // 4:],
+            'manually_edited': False,
+            'idempotency_key': f"{tag}-{i}"
+        }
+        for i in range(n)
+    ]
+
+
+def legacy(records):
+    """What /save does: record insert, wait for its id, then the student rows"""
+    for record in records:
+        response = client.post(
+            '/attendance_records',
+            headers={'Prefer': 'return=representation'},
+            json={
+                'class_id': record['class_id'],
+                'teacher_id': teacher_id,
+                'date': record['date'],
+                'total_students': args.students,
+                'present_count': len(record['present_students']),
+                'absent_count': len(record['absent_students'])
+            }
+        )
+        response.raise_for_status()
+        record_id = response.json()[0]['record_id']
+        rows = [
+            {'record_id': record_id, 'student_id': sid, 'status': status,
+             'marked_by_ai': True, 'manually_edited': False}
+            for status, ids in (('present', record['present_students']), ('absent', record['absent_students']))
+            for sid in ids
+        ]
+        client.post('/student_attendance', json=rows).raise_for_status()
+
+
+def bulk(records):
+    results = []
+    for start in range(0, len(records), args.chunk):
+        response = client.post('/rpc/save_attendance_bulk', json={
+            'p_teacher_id': teacher_id,
+            'p_records': records[start:start + args.chunk]
+        })
+        response.raise_for_status()
+        results.extend(response.json())
+    return results
+
+
+rows_per_record = 1 + args.students
+print(f"{args.records} records x {rows_per_record} rows against {args.url}")
+print(f"  {'path':<24} {'seconds':>8} {'rows/s':>10}")
+print("=" * 46)
+
+tag = uuid.uuid4().hex[:8]
+for label, fn, records in (
+    ('per-record (legacy)', legacy, make_records(args.records, f"legacy-{tag}")),
+    (f'bulk RPC (chunk {args.chunk})', bulk, make_records(args.records, f"bulk-{tag}")),
+):
+    start = time.perf_counter()
+    fn(records)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<24} {elapsed:>8.2f} {args.records * rows_per_record / elapsed:>10.0f}")
+
+# Retrying the same batch must not create anything
+retry = bulk(make_records(args.records, f"bulk-{tag}"))
+created = sum(r['created'] for r in retry)
+print(f"\nRetry of the bulk batch: {created} created, {len(retry) - created} skipped")
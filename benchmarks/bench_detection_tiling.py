@@ -0,0 +1,105 @@
+"""
+Recall vs. latency: single-pass vs. tiled face detection
+
+Needs real lecture-hall photos with ground truth in YOLO format: for every
+image `photo.jpg` a `photo.txt` (same directory, or a sibling `labels/`
+directory) with one `class cx cy w h` line per face, normalised to [0, 1].
+Images are resized to MAX_IMAGE_WIDTH first, exactly like the API does.
+
+Recall counts a face as found when a detection overlaps it with IoU >= 0.5;
+"small" faces are those under 2 x MIN_FACE_SIZE_PX tall after resizing.
+
+Run from the repo root:
+    python -m benchmarks.bench_detection_tiling --images path/to/photos [--repeat 3]
+"""
+import argparse
+import glob
+import os
+import time
+import cv2
+import numpy as np
+from config.settings import Config
+from services.face_detection import FaceDetectionService, tile_grid
+from utils.helpers import resize_image_if_needed
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--images', required=True)
+parser.add_argument('--repeat', type=int, default=3)
+parser.add_argument('--iou', type=float, default=0.5)
+args = parser.parse_args()
+
+
+def load_labels(image_path: str, shape) -> np.ndarray:
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    directory = os.path.dirname(image_path)
+    for candidate in (os.path.join(directory, stem + '.txt'),
+                      os.path.join(directory, '..', 'labels', stem + '.txt')):
+        if os.path.exists(candidate):
+            rows = np.loadtxt(candidate, ndmin=2)
+            break
+    else:
+        return np.empty((0, 4))
+
+    height, width = shape[:2]
+    cx, cy, w, h = rows[:, 1] * width, rows[:, 2] * height, rows[:, 3] * width, rows[:, 4] * height
+    return np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+
+def best_iou(truth: np.ndarray, detections: np.ndarray) -> np.ndarray:
+    """Highest IoU of every ground-truth box with any detection"""
+    if len(detections) == 0:
+        return np.zeros(len(truth))
+    x1 = np.maximum(truth[:, None, 0], detections[None, :, 0])
+    y1 = np.maximum(truth[:, None, 1], detections[None, :, 1])
+    x2 = np.minimum(truth[:, None, 2], detections[None, :, 2])
+    y2 = np.minimum(truth[:, None, 3], detections[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_t = (truth[:, 2] - truth[:, 0]) * (truth[:, 3] - truth[:, 1])
+    area_d = (detections[:, 2] - detections[:, 0]) * (detections[:, 3] - detections[:, 1])
+    return (inter / (area_t[:, None] + area_d[None, :] - inter + 1e-9)).max(axis=1)
+
+
+paths = sorted(
+    p for ext in ('jpg', 'jpeg', 'png')
+    for p in glob.glob(os.path.join(args.images, f'*.{ext}'))
+)
+if not paths:
+    raise SystemExit(f"No images found in {args.images}")
+
+samples = []
+for path in paths:
+    image = resize_image_if_needed(cv2.imread(path), max_width=Config.MAX_IMAGE_WIDTH)
+    samples.append((image, load_labels(path, image.shape)))
+
+detector = FaceDetectionService()
+# Warm up both code paths before timing
+detector._detect_single(samples[0][0])
+detector.detect_faces_tiled(samples[0][0])
+
+total_faces = sum(len(truth) for _, truth in samples)
+print(f"{len(samples)} images, {total_faces} labelled faces, engine={detector.engine}")
+height, width = samples[0][0].shape[:2]
+print(f"Tiles for a {width}x{height} image: {len(tile_grid(width, height, Config.DETECTION_TILE_SIZE, Config.DETECTION_TILE_OVERLAP, Config.DETECTION_MAX_TILES))}")
+print(f"  {'mode':<10} {'latency':>14} {'recall':>8} {'small':>8} {'detections':>11}")
+print("=" * 56)
+
+for label, detect in (('single', detector._detect_single), ('tiled', detector.detect_faces_tiled)):
+    timings = []
+    found = small_found = small_total = detections = 0
+
+    for image, truth in samples:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            boxes = detect(image)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        detections += len(boxes)
+        hits = best_iou(truth, boxes.astype(np.float32)) >= args.iou
+        small = (truth[:, 3] - truth[:, 1]) < 2 * Config.MIN_FACE_SIZE_PX
+        found += int(hits.sum())
+        small_found += int(hits[small].sum())
+        small_total += int(small.sum())
+
+    recall = found / total_faces if total_faces else float('nan')
+    small_recall = small_found / small_total if small_total else float('nan')
+    print(f"  {label:<10} {np.median(timings):>11.1f} ms {recall:>8.3f} {small_recall:>8.3f} {detections:>11}")
@@ -0,0 +1,102 @@
+"""
+Memory per worker: duplicated YOLO instances vs. one shared instance
+
+Reports RSS after loading the detector the old way (YOLODetector and
+FaceDetectionService each building their own model) and the new way (one
+shared instance), then forks workers after a preload and reports their
+PSS, which splits shared copy-on-write pages fairly between processes.
+
+Linux only (reads /proc). Run from the repo root:
+    python -m benchmarks.bench_detector_memory [--workers 2]
+"""
+import argparse
+import gc
+import os
+import signal
+import numpy as np
+from config.settings import Config
+from services.detector_backends import UltralyticsBackend
+
+
+def read_kb(path: str, field: str) -> int:
+    with open(path) as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    return 0
+
+
+def rss_mb(pid: str = 'self') -> float:
+    return read_kb(f'/proc/{pid}/status', 'VmRSS') / 1024
+
+
+def pss_mb(pid: str = 'self') -> float:
+    return read_kb(f'/proc/{pid}/smaps_rollup', 'Pss') / 1024
+
+
+def dummy_image() -> np.ndarray:
+    return np.zeros((Config.INPUT_HEIGHT, Config.INPUT_WIDTH, 3), dtype=np.uint8)
+
+
+def measure_in_child(label: str, num_models: int) -> float:
+    """Load models in a fresh child so each scenario starts from the same baseline"""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        base = rss_mb()
+        models = [UltralyticsBackend(Config.YOLO_MODEL_PATH) for _ in range(num_models)]
+        for model in models:
+            model.predict(dummy_image(), Config.YOLO_CONFIDENCE)
+        os.write(write_fd, f"{rss_mb() - base:.1f}".encode())
+        os._exit(0)
+
+    os.close(write_fd)
+    delta = float(os.read(read_fd, 64).decode())
+    os.waitpid(pid, 0)
+    print(f"  {label:<40} +{delta:>8.1f} MB RSS")
+    return delta
+
+
+def measure_forked_workers(num_workers: int):
+    model = UltralyticsBackend(Config.YOLO_MODEL_PATH)
+    gc.freeze()
+    print(f"  master after preload: {rss_mb():.1f} MB RSS")
+
+    children = []
+    for _ in range(num_workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            model.predict(dummy_image(), Config.YOLO_CONFIDENCE)
+            os.write(write_fd, b'ready')
+            # Park until the parent has read our smaps and kills us
+            signal.pause()
+            os._exit(0)
+        os.close(write_fd)
+        os.read(read_fd, 5)
+        children.append(pid)
+
+    for pid in children:
+        print(f"  worker {pid}: {rss_mb(str(pid)):.1f} MB RSS, {pss_mb(str(pid)):.1f} MB PSS")
+
+    for pid in children:
+        os.kill(pid, 9)
+        os.waitpid(pid, 0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    print("Per-process detector memory")
+    print("=" * 60)
+    before = measure_in_child('before: two YOLO instances', 2)
+    after = measure_in_child('after: one shared instance', 1)
+    print(f"  saved per worker: {before - after:.1f} MB")
+
+    print(f"\nPreloaded master + {args.workers} forked workers (copy-on-write)")
+    print("=" * 60)
+    measure_forked_workers(args.workers)
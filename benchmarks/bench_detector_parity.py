@@ -0,0 +1,90 @@
+"""
+Parity check: OnnxRuntimeBackend vs. ultralytics on the same images
+
+Runs YOLO_MODEL_PATH through ultralytics and YOLO_MODEL_ONNX_PATH through
+onnxruntime and pairs their boxes greedily by IoU. Reports, per backend,
+boxes without a partner above --min-iou, and the IoU and score gap of the
+pairs. Run it on sample class photos before setting DETECTOR_ENGINE=onnx.
+
+Run from the repo root:
+    python -m benchmarks.bench_detector_parity --dir path/to/photos [--conf 0.2] [--min-iou 0.9]
+"""
+import argparse
+import os
+import sys
+import time
+import cv2
+import numpy as np
+from config.settings import Config
+from services.detector_backends import OnnxRuntimeBackend, UltralyticsBackend
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--dir', required=True)
+parser.add_argument('--conf', type=float, default=Config.YOLO_CONFIDENCE)
+parser.add_argument('--min-iou', type=float, default=0.9, help='pairs below this count as mismatches')
+args = parser.parse_args()
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+torch_backend = UltralyticsBackend(Config.YOLO_MODEL_PATH)
+onnx_backend = OnnxRuntimeBackend(Config.YOLO_MODEL_ONNX_PATH)
+print(f"{Config.YOLO_MODEL_PATH} vs {Config.YOLO_MODEL_ONNX_PATH} ({onnx_backend.num_classes} classes), conf {args.conf}")
+
+totals = {'torch': 0, 'onnx': 0, 'pairs': 0, 'torch_only': 0, 'onnx_only': 0}
+ious, score_gaps, timings = [], [], {'torch': [], 'onnx': []}
+
+for name in sorted(os.listdir(args.dir)):
+    image = cv2.imread(os.path.join(args.dir, name))
+    if image is None:
+        continue
+
+    start = time.perf_counter()
+    torch_boxes, torch_scores = torch_backend.predict_batch([image], args.conf)[0]
+    timings['torch'].append(time.perf_counter() - start)
+    start = time.perf_counter()
+    onnx_boxes, onnx_scores = onnx_backend.predict_batch([image], args.conf)[0]
+    timings['onnx'].append(time.perf_counter() - start)
+
+    totals['torch'] += len(torch_boxes)
+    totals['onnx'] += len(onnx_boxes)
+    paired = 0
+    if len(torch_boxes) and len(onnx_boxes):
+        overlap = iou_matrix(torch_boxes.astype(np.float64), onnx_boxes.astype(np.float64))
+        # Greedy: best remaining pair first
+        while overlap.size and overlap.max() >= args.min_iou:
+            i, j = np.unravel_index(np.argmax(overlap), overlap.shape)
+            ious.append(overlap[i, j])
+            score_gaps.append(abs(float(torch_scores[i]) - float(onnx_scores[j])))
+            overlap[i, :] = -1
+            overlap[:, j] = -1
+            paired += 1
+    totals['pairs'] += paired
+    totals['torch_only'] += len(torch_boxes) - paired
+    totals['onnx_only'] += len(onnx_boxes) - paired
+
+if not timings['torch']:
+    sys.exit(f"No readable images under {args.dir}")
+
+print(f"{len(timings['torch'])} images")
+print("=" * 60)
+print(f"  boxes             ultralytics {totals['torch']}, onnx {totals['onnx']}")
+print(f"  paired (IoU >= {args.min_iou})  {totals['pairs']}")
+print(f"  unpaired          ultralytics {totals['torch_only']}, onnx {totals['onnx_only']}")
+if ious:
+    print(f"  pair IoU          mean {np.mean(ious):.4f}  min {np.min(ious):.4f}")
+    print(f"  score gap         mean {np.mean(score_gaps):.4f}  max {np.max(score_gaps):.4f}")
+print(f"  median ms/image   ultralytics {np.median(timings['torch']) * 1000:.1f}, "
+      f"onnx {np.median(timings['onnx']) * 1000:.1f}")
+
+if totals['torch_only'] or totals['onnx_only']:
+    sys.exit("Backends disagree; keep DETECTOR_ENGINE=ultralytics")
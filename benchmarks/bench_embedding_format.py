@@ -0,0 +1,83 @@
+"""
+Load time and memory: pickle vs. memory-mapped .emb embeddings
+
+Each scenario runs in a forked child so RSS deltas don't mix. RssAnon is
+private heap (paid again by every worker); RssFile is page cache, which
+all workers mapping the same file share.
+
+Linux only (reads /proc). Run from the repo root:
+    python -m benchmarks.bench_embedding_format
+"""
+import os
+import pickle
+import tempfile
+import time
+import numpy as np
+from services.embedding_store import EmbeddingStore
+from services.embedding_format import write_embeddings_file, open_embeddings_file
+
+SIZES = [10_000, 100_000]
+DIM = 128
+
+
+def memory_kb() -> dict:
+    fields = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('RssAnon', 'RssFile'):
+                fields[key] = int(value.split()[0])
+    return fields
+
+
+def in_child(fn) -> str:
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        os.write(write_fd, fn().encode())
+        os._exit(0)
+    os.close(write_fd)
+    out = os.read(read_fd, 4096).decode()
+    os.waitpid(pid, 0)
+    return out
+
+
+def measure(label: str, load):
+    def run():
+        before = memory_kb()
+        start = time.perf_counter()
+        store = load()
+        # Touch every row, as a full-institution search would
+        float(np.asarray(store.matrix).sum())
+        elapsed = (time.perf_counter() - start) * 1000
+        after = memory_kb()
+        anon = (after['RssAnon'] - before['RssAnon']) / 1024
+        file_backed = (after['RssFile'] - before['RssFile']) / 1024
+        return f"  {label:<10} {elapsed:>10.1f} ms {anon:>10.1f} MB anon {file_backed:>10.1f} MB file"
+    print(in_child(run))
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    for n in SIZES:
+        rng = np.random.default_rng(0)
+        matrix = rng.standard_normal((n, DIM)).astype(np.float32)
+        keys = [f"{i:08d}-0000-0000-0000-000000000000" for i in range(n)]
+
+        pickle_path = os.path.join(tmp, f'{n}.pickle')
+        with open(pickle_path, 'wb') as f:
+            pickle.dump({'key_type': 'student_id',
+                         'embeddings': {k: row.tolist() for k, row in zip(keys, matrix)}}, f)
+
+        emb_path = os.path.join(tmp, f'{n}.emb')
+        write_embeddings_file(emb_path, keys, matrix)
+
+        def load_pickle():
+            with open(pickle_path, 'rb') as f:
+                return EmbeddingStore.from_pickle_data(pickle.load(f))
+
+        print(f"\n{n:,} students "
+              f"(pickle {os.path.getsize(pickle_path) / 1e6:.1f} MB, .emb {os.path.getsize(emb_path) / 1e6:.1f} MB)")
+        print("=" * 64)
+        measure('pickle', load_pickle)
+        measure('memmap', lambda: open_embeddings_file(emb_path))
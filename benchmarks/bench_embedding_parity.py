@@ -0,0 +1,136 @@
+"""
+Parity check: batched SFace embeddings vs. the DeepFace path they replaced
+
+The gallery was built with DeepFace.represent, which runs its own face
+detector on every image and aligns the face by the eyes before SFace.
+EMBEDDING_ENGINE=dnn embeds the raw YOLO crop instead. This measures how
+far apart the two are on real photos, and should pass before that engine
+is enabled:
+
+    cosine:     similarity between the two embeddings of the same crop
+    agreement:  probes whose nearest gallery identity (or "no match" at
+                SFACE_THRESHOLD) is the same either way
+    accuracy:   probes matched to their own identity, per path
+
+With --gallery (the production .pickle or .emb) probes are matched
+against the enrolled embeddings and folder names must be gallery keys
+(student_id or full_name). Without it, the gallery is the DeepFace
+embedding of every other photo (leave one out).
+
+Photos are laid out one folder per person:
+    <dir>/<person>/*.jpg
+
+Run from the repo root:
+    python -m benchmarks.bench_embedding_parity --dir path/to/faces \
+        [--gallery models/sface_embeddings_database.pickle] [--min-cosine 0.9]
+"""
+import argparse
+import os
+import pickle
+import sys
+import cv2
+import numpy as np
+from deepface import DeepFace
+from config.settings import Config
+from services.embedding_format import open_embeddings_file
+from services.embedding_store import EmbeddingStore
+from services.face_detection import get_face_detector
+from services.face_embedding import FaceEmbeddingService
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--dir', required=True)
+parser.add_argument('--gallery', help='.pickle or .emb embeddings database to match against')
+parser.add_argument('--min-cosine', type=float, default=0.9, help='exit non-zero below this mean cosine')
+parser.add_argument('--min-agreement', type=float, default=0.95, help='exit non-zero below this match agreement')
+args = parser.parse_args()
+
+detector = get_face_detector()
+embedder = FaceEmbeddingService(engine='dnn')
+threshold = Config.SFACE_THRESHOLD
+
+labels, batched, legacy = [], [], []
+for person in sorted(os.listdir(args.dir)):
+    folder = os.path.join(args.dir, person)
+    if not os.path.isdir(folder):
+        continue
+    for name in sorted(os.listdir(folder)):
+        image = cv2.imread(os.path.join(folder, name))
+        if image is None:
+            continue
+        boxes = detector.detect_faces(image)
+        if len(boxes) == 0:
+            continue
+        # Largest face, as enrollment does
+        box = max(boxes, key=lambda b: (b[2] - b[0]) * (b[3] - b[1]))
+        x1, y1, x2, y2 = [int(v) for v in box[:4]]
+        crop = image[max(0, y1):y2, max(0, x1):x2]
+        if crop.size == 0:
+            continue
+
+        embeddings, kept, _ = embedder.embed_faces(image, np.array([box]))
+        if len(kept) == 0:
+            continue
+        # What services/face_recognition.py did per crop before batching
+        represented = DeepFace.represent(img_path=crop, model_name=Config.FACE_MODEL_NAME, enforce_detection=False)
+
+        labels.append(person)
+        batched.append(embeddings[0])
+        legacy.append(np.asarray(represented[0]['embedding'], dtype=np.float32).flatten())
+
+if len(labels) < 2:
+    sys.exit(f"Need at least two usable photos under {args.dir}, found {len(labels)}")
+
+
+def normalise(rows):
+    rows = np.stack(rows).astype(np.float64)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+batched = normalise(batched)
+legacy = normalise(legacy)
+labels = np.array(labels)
+
+cosine = np.sum(batched * legacy, axis=1)
+
+
+if args.gallery:
+    if args.gallery.endswith('.emb'):
+        store = open_embeddings_file(args.gallery)
+    else:
+        with open(args.gallery, 'rb') as f:
+            store = EmbeddingStore.from_pickle_data(pickle.load(f))
+    gallery = normalise(np.asarray(store.matrix))
+    owners = np.repeat(np.array(store.keys, dtype=object), np.diff(store.offsets))
+    unknown = sorted(set(labels) - set(store.keys))
+    if unknown:
+        print(f"⚠️  {len(unknown)} folder(s) are not gallery keys, e.g. {unknown[:3]}")
+else:
+    gallery, owners = legacy, labels
+
+
+def identify(probes):
+    """Nearest gallery identity per probe, or None at/above the threshold"""
+    distances = 1.0 - probes @ gallery.T
+    if not args.gallery:
+        # Leave one out: a photo can't match itself
+        np.fill_diagonal(distances, np.inf)
+    nearest = np.argmin(distances, axis=1)
+    best = distances[np.arange(len(probes)), nearest]
+    return [owners[j] if d < threshold else None for j, d in zip(nearest, best)]
+
+
+batched_ids = identify(batched)
+legacy_ids = identify(legacy)
+agreement = np.mean([a == b for a, b in zip(batched_ids, legacy_ids)])
+
+print(f"{len(labels)} photos, {len(set(labels))} people, {len(gallery)} gallery rows, threshold {threshold}")
+print("=" * 52)
+print(f"  cosine(batched, DeepFace)   mean {cosine.mean():.4f}  min {cosine.min():.4f}  p5 {np.percentile(cosine, 5):.4f}")
+print(f"  match agreement             {agreement:.2%}")
+for name, ids in (('batched', batched_ids), ('DeepFace', legacy_ids)):
+    correct = np.mean([i == label for i, label in zip(ids, labels)])
+    unmatched = np.mean([i is None for i in ids])
+    print(f"  {name:<9} accuracy {correct:.2%}  unmatched {unmatched:.2%}")
+
+if cosine.mean() < args.min_cosine or agreement < args.min_agreement:
+    sys.exit(f"Parity below --min-cosine {args.min_cosine} / --min-agreement {args.min_agreement}")
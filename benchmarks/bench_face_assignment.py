@@ -0,0 +1,38 @@
+"""
+Benchmark + order-independence check for one-to-one face assignment
+
+Run from the repo root:
+    python -m benchmarks.bench_face_assignment
+"""
+import time
+import numpy as np
+from services.face_assignment import assign_faces
+
+THRESHOLD = 0.8
+SIZES = [(20, 60), (100, 120), (200, 200)]
+REPEATS = 20
+
+rng = np.random.default_rng(0)
+
+print(f"{'faces x students':>18} {'median ms':>10} {'matches':>8} {'order-independent':>18}")
+print("=" * 58)
+
+for num_faces, num_students in SIZES:
+    distances = rng.uniform(0.3, 1.2, size=(num_faces, num_students))
+    boxes = [tuple(rng.integers(0, 4000, size=4)) for _ in range(num_faces)]
+    student_ids = [f"student-{i:04d}" for i in range(num_students)]
+
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        matches = assign_faces(distances, THRESHOLD, boxes, student_ids)
+        timings.append(time.perf_counter() - start)
+
+    # Shuffle the face order and make sure the same pairs come out
+    perm = rng.permutation(num_faces)
+    shuffled = assign_faces(distances[perm], THRESHOLD, [boxes[i] for i in perm], student_ids)
+    original_pairs = {(boxes[f], s) for f, s, _ in matches}
+    shuffled_pairs = {(boxes[perm[f]], s) for f, s, _ in shuffled}
+
+    print(f"{f'{num_faces} x {num_students}':>18} {np.median(timings) * 1000:>10.2f} "
+          f"{len(matches):>8} {str(original_pairs == shuffled_pairs):>18}")
@@ -0,0 +1,73 @@
+"""
+Micro-benchmark: per-student scipy cosine loop vs. vectorized gallery matching
+
+Run from the repo root:
+    python -m benchmarks.bench_gallery_matching
+"""
+import time
+import numpy as np
+from scipy.spatial.distance import cosine
+from services.gallery_matcher import ClassGallery
+
+NUM_FACES = 100
+GALLERY_SIZES = [10, 100, 1000]
+REPEATS = 3
+
+
+def loop_match(faces, enrolled):
+    """The old per-face, per-student loop from FaceRecognitionService"""
+    results = []
+    for face in faces:
+        new_embedding = np.array(face, dtype=float).flatten()
+        min_distance = float('inf')
+        best = None
+        for student_id, emb in enrolled.items():
+            stored = np.array(emb, dtype=float).flatten()
+            dist = cosine(new_embedding, stored)
+            if dist < min_distance:
+                min_distance = dist
+                best = student_id
+        results.append((best, min_distance))
+    return results
+
+
+def vector_match(faces, gallery):
+    distances = gallery.distances(faces)
+    best = np.argmin(distances, axis=1)
+    return [(gallery.student_ids[j], float(distances[i, j])) for i, j in enumerate(best)]
+
+
+def timed(fn, *args):
+    best = float('inf')
+    out = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+rng = np.random.default_rng(0)
+faces = rng.standard_normal((NUM_FACES, 128)).astype(np.float32)
+
+print(f"{'students':>10} {'loop ms':>10} {'matmul ms':>10} {'speedup':>9} {'max |Δd|':>10} {'same ids':>9}")
+print("=" * 64)
+
+for n in GALLERY_SIZES:
+    enrolled = {
+        f"student-{i}": rng.standard_normal(128).astype(np.float32)
+        for i in range(n)
+    }
+
+    loop_time, loop_out = timed(loop_match, faces, enrolled)
+
+    def build_and_match():
+        return vector_match(faces, ClassGallery.from_embeddings(enrolled))
+
+    vec_time, vec_out = timed(build_and_match)
+
+    max_diff = max(abs(a[1] - b[1]) for a, b in zip(loop_out, vec_out))
+    same = all(a[0] == b[0] for a, b in zip(loop_out, vec_out))
+
+    print(f"{n:>10} {loop_time * 1000:>10.2f} {vec_time * 1000:>10.2f} "
+          f"{loop_time / vec_time:>8.1f}x {max_diff:>10.2e} {str(same):>9}")
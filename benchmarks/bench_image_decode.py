@@ -0,0 +1,77 @@
+"""
+Upload decode cost: legacy base64 JSON vs. raw bytes streamed to cv2.imdecode
+
+Each scenario runs in a forked child so its peak RSS is measured in
+isolation (ru_maxrss of the child, minus the baseline after setup).
+
+Run from the repo root:
+    python -m benchmarks.bench_image_decode [--width 4000] [--height 3000] [--repeat 10]
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import resource
+import time
+import cv2
+import numpy as np
+from utils.helpers import decode_base64_image, decode_image_bytes, read_stream_limited
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--width', type=int, default=4000)
+parser.add_argument('--height', type=int, default=3000)
+parser.add_argument('--quality', type=int, default=90)
+parser.add_argument('--repeat', type=int, default=10)
+args = parser.parse_args()
+
+rng = np.random.default_rng(0)
+# Smooth gradient + noise so the JPEG is a realistic size for a phone photo
+gradient = np.linspace(0, 255, args.width, dtype=np.float32)[np.newaxis, :, np.newaxis]
+pixels = np.clip(gradient + rng.normal(0, 40, (args.height, args.width, 3)), 0, 255).astype(np.uint8)
+ok, encoded = cv2.imencode('.jpg', pixels, [cv2.IMWRITE_JPEG_QUALITY, args.quality])
+jpeg_bytes = encoded.tobytes()
+json_body = json.dumps({'image': 'data:image/jpeg;base64,' + base64.b64encode(jpeg_bytes).decode('ascii'), 'class_id': 'x'}).encode('ascii')
+del pixels, encoded
+
+
+def legacy_json():
+    data = json.loads(json_body)
+    return decode_base64_image(data['image'])
+
+
+def raw_stream():
+    buffer = read_stream_limited(io.BytesIO(jpeg_bytes), len(jpeg_bytes))
+    return decode_image_bytes(buffer)
+
+
+def run(label, fn):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            image = fn()
+            timings.append((time.perf_counter() - start) * 1000)
+            del image
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        os.write(write_fd, json.dumps([float(np.median(timings)), peak_kb - baseline_kb]).encode())
+        os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        median_ms, peak_delta_kb = json.loads(f.read())
+    os.waitpid(pid, 0)
+    print(f"  {label:<24} {median_ms:>10.1f} ms {peak_delta_kb / 1024:>12.1f} MB")
+
+
+print(f"{args.width}x{args.height} JPEG: {len(jpeg_bytes) / 1e6:.1f} MB on disk, "
+      f"{len(json_body) / 1e6:.1f} MB as base64 JSON")
+print(f"  {'path':<24} {'median':>13} {'peak RSS +':>15}")
+print("=" * 56)
+
+run('base64 JSON', legacy_json)
+run('raw bytes + imdecode', raw_stream)
@@ -0,0 +1,110 @@
+"""
+Load test: throughput and latency of detect + embed vs. inference worker count
+
+In-process mode drives services.inference_pool directly: `--clients`
+threads (think gunicorn --threads) each submit photos back to back for
+`--duration` seconds. Worker count 0 means the pre-pool behaviour, where
+every thread runs the models in this process.
+
+HTTP mode (--url) instead POSTs the photo to a running server's
+/api/attendance/process-image, so restart the server with a different
+INFERENCE_WORKERS between runs.
+
+Run from the repo root:
+    python -m benchmarks.load_test_inference --image photo.jpg --workers 0 1 2 4
+    python -m benchmarks.load_test_inference --image photo.jpg \
+        --url http://localhost:8080 --token $JWT --class-id <class_id>
+"""
+import argparse
+import threading
+import time
+import cv2
+import numpy as np
+from config.settings import Config
+from utils.helpers import resize_image_if_needed
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--image', required=True, help='group photo (JPEG/PNG)')
+parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, 2, 4])
+parser.add_argument('--clients', type=int, default=4)
+parser.add_argument('--duration', type=float, default=30.0)
+parser.add_argument('--url', help='base URL of a running server (HTTP mode)')
+parser.add_argument('--token', help='teacher JWT for HTTP mode')
+parser.add_argument('--class-id', help='class_id for HTTP mode')
+args = parser.parse_args()
+
+
+def drive(call, clients: int, duration: float):
+    """Run call() from `clients` threads for `duration` seconds; per-call latencies in ms"""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                call()
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return np.array(latencies), errors, time.perf_counter() - started
+
+
+def report(label: str, latencies: np.ndarray, errors, elapsed: float):
+    if len(latencies) == 0:
+        print(f"  {label:<12} no successful calls ({len(errors)} errors: {errors[:1]})")
+        return
+    print(
+        f"  {label:<12} {len(latencies) / elapsed:>9.2f} img/s "
+        f"{np.percentile(latencies, 50):>9.0f} ms {np.percentile(latencies, 95):>9.0f} ms "
+        f"{len(errors):>7}"
+    )
+
+
+print(f"{args.clients} client threads, {args.duration:.0f}s per run")
+print(f"  {'workers':<12} {'throughput':>15} {'p50':>12} {'p95':>12} {'errors':>7}")
+print("=" * 64)
+
+if args.url:
+    import httpx
+
+    with open(args.image, 'rb') as f:
+        payload = f.read()
+    url = f"{args.url.rstrip('/')}/api/attendance/process-image"
+    headers = {'Authorization': f'Bearer {args.token}', 'Content-Type': 'image/jpeg'}
+    http = httpx.Client(timeout=300)
+
+    def post():
+        response = http.post(url, params={'class_id': args.class_id}, content=payload, headers=headers)
+        response.raise_for_status()
+
+    report('server', *drive(post, args.clients, args.duration))
+else:
+    from services.inference_pool import InferencePool, run_analysis
+
+    image = resize_image_if_needed(cv2.imread(args.image), max_width=Config.MAX_IMAGE_WIDTH)
+
+    for workers in args.workers:
+        if workers == 0:
+            run_analysis(image)  # load + warm up in this process
+            report('in-process', *drive(lambda: run_analysis(image), args.clients, args.duration))
+            continue
+
+        pool = InferencePool(workers=workers)
+        pool.start()
+        while not pool.ready:
+            time.sleep(0.5)
+        pool.analyze(image)
+        report(f'{workers} procs', *drive(lambda: pool.analyze(image), args.clients, args.duration))
+        pool.shutdown()
@@ -0,0 +1,38 @@
+-- Minimal stand-in for the Supabase tables used by bench_bulk_save.py
+-- Apply this, then supabase/migrations/*.sql, to an empty local Postgres.
+
+-- gen_random_uuid() is built in from PostgreSQL 13 on
+
+do $$ begin
+    create role anon nologin;
+exception when duplicate_object then null; end $$;
+do $$ begin
+    create role authenticated nologin;
+exception when duplicate_object then null; end $$;
+do $$ begin
+    create role service_role nologin bypassrls;
+exception when duplicate_object then null; end $$;
+
+create table if not exists attendance_records (
+    record_id uuid primary key default gen_random_uuid(),
+    class_id uuid not null,
+    teacher_id uuid not null,
+    date date not null,
+    total_students integer,
+    present_count integer,
+    absent_count integer,
+    created_at timestamptz default now()
+);
+
+create table if not exists student_attendance (
+    id bigserial primary key,
+    record_id uuid not null references attendance_records (record_id) on delete cascade,
+    student_id uuid not null,
+    status text not null,
+    marked_by_ai boolean,
+    manually_edited boolean
+);
+
+grant usage on schema public to service_role;
+grant all on all tables in schema public to service_role;
+grant all on all sequences in schema public to service_role;
@@ -17,17 +17,117 @@ class Config:
     
     # Models
     YOLO_MODEL_PATH = os.getenv('YOLO_MODEL_PATH', 'models/best.pt')  # ONNX model path default
+    YOLO_MODEL_ONNX_PATH = os.getenv('YOLO_MODEL_ONNX_PATH', 'models/best.onnx')
+    DETECTOR_ENGINE = os.getenv('DETECTOR_ENGINE', 'ultralytics')  # 'ultralytics' or 'onnx'
     SFACE_THRESHOLD = float(os.getenv('SFACE_THRESHOLD', 0.8))
+    # Students with several embeddings: 'max' (closest prototype) or 'topk' (mean of k closest)
+    EMBEDDING_AGGREGATE = os.getenv('EMBEDDING_AGGREGATE', 'max')
+    EMBEDDING_TOP_K = int(os.getenv('EMBEDDING_TOP_K', 2))
+    # Cluster each student down to this many prototypes at load time (0 = keep all)
+    MAX_PROTOTYPES_PER_STUDENT = int(os.getenv('MAX_PROTOTYPES_PER_STUDENT', 5))
+    # Institution-wide search: 'auto', 'ivf' (NumPy), 'hnsw' (needs hnswlib) or 'exact'
+    ANN_INDEX = os.getenv('ANN_INDEX', 'auto')
+    ANN_EXACT_MAX_ROWS = int(os.getenv('ANN_EXACT_MAX_ROWS', 50000))  # 'auto': exact up to this many embeddings, IVF above
+    ANN_NLIST = int(os.getenv('ANN_NLIST', 0))  # 0 = sqrt(number of embeddings)
+    ANN_NPROBE = int(os.getenv('ANN_NPROBE', 8))
+    ANN_EF_SEARCH = int(os.getenv('ANN_EF_SEARCH', 64))
     YOLO_CONFIDENCE = float(os.getenv('YOLO_CONFIDENCE', 0.2))
+    YOLO_IOU = float(os.getenv('YOLO_IOU', 0.7))
     FACE_MODEL_NAME = 'SFace'
+    SFACE_MODEL_PATH = os.getenv(
+        'SFACE_MODEL_PATH',
+        os.path.join(os.getenv('DEEPFACE_HOME', os.path.expanduser('~')),
+                     '.deepface', 'weights', 'face_recognition_sface_2021dec.onnx')
+    )
+    # 'deepface': DeepFace.represent per crop (detect + align), the path the gallery
+    # was built with. 'dnn': batched cv2.dnn over raw crops; switch only after
+    # benchmarks/bench_embedding_parity.py passes against the real gallery
+    EMBEDDING_ENGINE = os.getenv('EMBEDDING_ENGINE', 'deepface')
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 32))
+    # Cross-request micro-batching: hold the first call up to this long for others
+    # to join one detector / embedder forward pass (0 disables)
+    MICROBATCH_MAX_WAIT_MS = float(os.getenv('MICROBATCH_MAX_WAIT_MS', 5))
+    MICROBATCH_MAX_IMAGES = int(os.getenv('MICROBATCH_MAX_IMAGES', 8))
+    MICROBATCH_MAX_FACES = int(os.getenv('MICROBATCH_MAX_FACES', 128))
+    # Detection + embedding in N worker processes fed via shared memory (0 = in-process)
+    INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', 0))
+    INFERENCE_SLOTS = int(os.getenv('INFERENCE_SLOTS', 0))  # 0 = 2 per worker
+    INFERENCE_SLOT_MB = int(os.getenv('INFERENCE_SLOT_MB', 16))  # fits 1920x2560 BGR
+    INFERENCE_TIMEOUT_SECONDS = int(os.getenv('INFERENCE_TIMEOUT_SECONDS', 120))
+    INFERENCE_WORKER_THREADS = int(os.getenv('INFERENCE_WORKER_THREADS', 1))  # BLAS/OMP threads per worker
+    ONNX_INTRA_OP_THREADS = int(os.getenv('ONNX_INTRA_OP_THREADS', 0))  # 0 = onnxruntime default (all cores)
+    # Uploads are decoded (at reduced JPEG scale when possible) to at most this width;
+    # face crops for embedding come from this image
+    MAX_IMAGE_WIDTH = int(os.getenv('MAX_IMAGE_WIDTH', 1920))
+    # Detector input is downscaled further to this width (0 = use the full image)
+    DETECTION_MAX_WIDTH = int(os.getenv('DETECTION_MAX_WIDTH', 1280))
+    # 'single' (one pass) or 'tiled' (overlapping tiles + one global pass, merged with NMS)
+    # for lecture halls where back-row faces fall below MIN_FACE_SIZE_PX
+    DETECTION_MODE = os.getenv('DETECTION_MODE', 'single')
+    DETECTION_TILE_SIZE = int(os.getenv('DETECTION_TILE_SIZE', 960))
+    DETECTION_TILE_OVERLAP = float(os.getenv('DETECTION_TILE_OVERLAP', 0.25))
+    DETECTION_MAX_TILES = int(os.getenv('DETECTION_MAX_TILES', 12))
     
     # Storage
     EMBEDDINGS_BUCKET = os.getenv('EMBEDDINGS_BUCKET', 'model-files')
     EMBEDDINGS_FILE = os.getenv('EMBEDDINGS_FILE', 'sface_embeddings_database.pickle')
+    # Local directory for memory-mapped .emb files (shared by workers on a host)
+    EMBEDDINGS_CACHE_DIR = os.getenv('EMBEDDINGS_CACHE_DIR', '/tmp/attendance-embeddings')
+    # Poll the bucket for a new embeddings database (0 disables hot reload)
+    EMBEDDINGS_REFRESH_SECONDS = int(os.getenv('EMBEDDINGS_REFRESH_SECONDS', 300))
+    # Enrollment deltas: new faces are uploaded as small .emb segments under this
+    # bucket folder and merged at load time
+    EMBEDDINGS_DELTA_PREFIX = os.getenv('EMBEDDINGS_DELTA_PREFIX', 'embedding-deltas')
+    # Check every N seconds whether EMBEDDINGS_COMPACT_MIN_SEGMENTS segments have piled
+    # up and fold them into the base file (a bucket lock keeps it to one instance; 0 = off)
+    EMBEDDINGS_COMPACT_SECONDS = int(os.getenv('EMBEDDINGS_COMPACT_SECONDS', 600))
+    EMBEDDINGS_COMPACT_MIN_SEGMENTS = int(os.getenv('EMBEDDINGS_COMPACT_MIN_SEGMENTS', 10))
+    ENROLL_MAX_PHOTOS = int(os.getenv('ENROLL_MAX_PHOTOS', 10))
     ATTENDANCE_PHOTOS_BUCKET = os.getenv('ATTENDANCE_PHOTOS_BUCKET', 'attendance-photos')
     
+    # Caches
+    ROSTER_CACHE_TTL_SECONDS = int(os.getenv('ROSTER_CACHE_TTL_SECONDS', 300))
+    PROFILE_CACHE_TTL_SECONDS = int(os.getenv('PROFILE_CACHE_TTL_SECONDS', 600))
+    PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', 20000))
+    HISTORY_CACHE_TTL_SECONDS = int(os.getenv('HISTORY_CACHE_TTL_SECONDS', 300))
+    HISTORY_CACHE_SIZE = int(os.getenv('HISTORY_CACHE_SIZE', 5000))  # students
+    HISTORY_CACHE_QUERIES_PER_STUDENT = int(os.getenv('HISTORY_CACHE_QUERIES_PER_STUDENT', 8))
+    HISTORY_PAGE_MAX = 100
+    
+    # Bulk attendance save
+    BULK_SAVE_MAX_RECORDS = int(os.getenv('BULK_SAVE_MAX_RECORDS', 2000))
+    BULK_SAVE_CHUNK_SIZE = int(os.getenv('BULK_SAVE_CHUNK_SIZE', 100))  # records per RPC / transaction
+    
+    # Bulk registration
+    BULK_REGISTER_MAX_ROWS = int(os.getenv('BULK_REGISTER_MAX_ROWS', 5000))
+    BULK_REGISTER_WORKERS = int(os.getenv('BULK_REGISTER_WORKERS', 8))  # concurrent auth admin calls
+    BULK_REGISTER_CHUNK_SIZE = int(os.getenv('BULK_REGISTER_CHUNK_SIZE', 500))  # rows per insert
+    # Mark bulk-created accounts as email-confirmed instead of mailing a confirmation link
+    BULK_REGISTER_AUTO_CONFIRM = os.getenv('BULK_REGISTER_AUTO_CONFIRM', 'false').lower() == 'true'
+    
+    # Multi-photo attendance sessions
+    SESSION_TTL_SECONDS = int(os.getenv('SESSION_TTL_SECONDS', 1800))
+    SESSION_MAX_PHOTOS = int(os.getenv('SESSION_MAX_PHOTOS', 8))
+    SESSION_PHOTO_WORKERS = int(os.getenv('SESSION_PHOTO_WORKERS', 2))
+    
+    # Asynchronous attendance jobs
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', 16))  # waiting jobs before 429
+    JOB_STORE = os.getenv('JOB_STORE', 'memory')  # 'memory' or 'sqlite'
+    JOB_DB_PATH = os.getenv('JOB_DB_PATH', '/tmp/attendance-jobs.sqlite3')
+    JOB_RESULT_TTL_SECONDS = int(os.getenv('JOB_RESULT_TTL_SECONDS', 3600))
+    # Comma-separated hosts job callbacks may be POSTed to (https only; empty disables callbacks)
+    JOB_CALLBACK_ALLOWED_HOSTS = os.getenv('JOB_CALLBACK_ALLOWED_HOSTS', '')
+    
+    # Startup
+    WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'true').lower() == 'true'
+    # Load weights in the gunicorn master (requires --preload) so forked
+    # workers share them copy-on-write
+    PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', 'false').lower() == 'true'
+    
     # JWT
     JWT_EXPIRATION_HOURS = 24
+    JWT_CACHE_SIZE = int(os.getenv('JWT_CACHE_SIZE', 4096))  # verified tokens kept in memory (0 = off)
     
     # Validation
     MAX_IMAGE_SIZE_MB = 10
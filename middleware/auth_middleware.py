@@ -1,50 +1,146 @@
 from functools import wraps
 from flask import request, jsonify
+import hashlib
+import threading
+import time
 import jwt
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
 from config.settings import Config
 
+
+class TokenCache:
+    """
+    Bounded LRU of verified token -> claims
+
+    Keyed by a SHA-256 of the token (raw tokens are never kept) and
+    dropped once the token's exp passes, so a hit skips the HS256 verify
+    without ever outliving the token. revocation_check(token_hash, claims),
+    when set, runs on every request, cached or not; returning True rejects
+    the token.
+    """
+
+    def __init__(self, max_size: int = None):
+        self.max_size = Config.JWT_CACHE_SIZE if max_size is None else max_size
+        self.revocation_check: Optional[Callable[[str, Dict], bool]] = None
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def verify(self, token: str) -> Dict:
+        """
+        Claims of a valid token
+
+        Raises:
+            jwt.ExpiredSignatureError / jwt.InvalidTokenError like jwt.decode
+        """
+        key = self.key(token)
+        claims = self._get(key)
+        if claims is None:
+            self._misses += 1
+            claims = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
+            self._put(key, claims)
+        else:
+            self._hits += 1
+
+        if self.revocation_check is not None and self.revocation_check(key, claims):
+            self.invalidate(token)
+            raise jwt.InvalidTokenError("Token has been revoked")
+        return claims
+
+    def invalidate(self, token: str):
+        with self._lock:
+            self._entries.pop(self.key(token), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        return {'size': len(self._entries), 'hits': self._hits, 'misses': self._misses}
+
+    def _get(self, key: str) -> Optional[Dict]:
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is None:
+                return None
+            if 'exp' in claims and claims['exp'] <= time.time():
+                del self._entries[key]
+                raise jwt.ExpiredSignatureError("Signature has expired")
+            self._entries.move_to_end(key)
+            return claims
+
+    def _put(self, key: str, claims: Dict):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = claims
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+# Singleton instance (set token_cache.revocation_check to plug in a deny list)
+token_cache = TokenCache()
+
+
+def _authenticate():
+    """Parse and verify the bearer token once; None on success, else an error response"""
+    auth_header = request.headers.get('Authorization')
+    if auth_header is None:
+        return jsonify({'error': 'Token is missing'}), 401
+
+    parts = auth_header.split(" ")
+    if len(parts) < 2:
+        return jsonify({'error': 'Invalid token format'}), 401
+    token = parts[1]  # Bearer <token>
+    if not token:
+        return jsonify({'error': 'Token is missing'}), 401
+
+    try:
+        data = token_cache.verify(token)
+        request.user_id = data['user_id']
+        request.user_role = data['role']
+        request.token_claims = data
+    except jwt.ExpiredSignatureError:
+        return jsonify({'error': 'Token has expired'}), 401
+    except (jwt.InvalidTokenError, KeyError):
+        return jsonify({'error': 'Invalid token'}), 401
+    return None
+
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            try:
-                token = auth_header.split(" ")[1]  # Bearer <token>
-            except IndexError:
-                return jsonify({'error': 'Invalid token format'}), 401
-        
-        if not token:
-            return jsonify({'error': 'Token is missing'}), 401
-        
-        try:
-            data = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
-            request.user_id = data['user_id']
-            request.user_role = data['role']
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
-        
+        error = _authenticate()
+        if error is not None:
+            return error
         return f(*args, **kwargs)
-    
-    return decorated
 
-def teacher_required(f):
-    @wraps(f)
-    @token_required
-    def decorated(*args, **kwargs):
-        if request.user_role != 'teacher':
-            return jsonify({'error': 'Teacher access required'}), 403
-        return f(*args, **kwargs)
     return decorated
 
-def student_required(f):
-    @wraps(f)
-    @token_required
-    def decorated(*args, **kwargs):
-        if request.user_role != 'student':
-            return jsonify({'error': 'Student access required'}), 403
-        return f(*args, **kwargs)
-    return decorated
+
+def role_required(role: str):
+    """token_required plus a role check, in a single decorator layer"""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            error = _authenticate()
+            if error is not None:
+                return error
+            if request.user_role != role:
+                return jsonify({'error': f'{role.capitalize()} access required'}), 403
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+
+teacher_required = role_required('teacher')
+student_required = role_required('student')
@@ -0,0 +1,36 @@
+"""
+Convert the embeddings pickle into the memory-mapped .emb format
+
+Run from the repo root:
+    python -m models.convert_embeddings --input models/sface_embeddings_database.pickle \
+        --output models/sface_embeddings_database.emb
+
+Then upload the .emb file to the embeddings bucket and set
+EMBEDDINGS_FILE=sface_embeddings_database.emb.
+"""
+import argparse
+import pickle
+import numpy as np
+from services.embedding_store import EmbeddingStore
+from services.embedding_format import write_embeddings_file, open_embeddings_file
+
+parser = argparse.ArgumentParser(description="Convert embeddings pickle → .emb")
+parser.add_argument('--input', default='models/sface_embeddings_database.pickle')
+parser.add_argument('--output', default='models/sface_embeddings_database.emb')
+args = parser.parse_args()
+
+with open(args.input, 'rb') as f:
+    data = pickle.load(f)
+
+store = EmbeddingStore.from_pickle_data(data)
+print(f"Loaded {len(store)} embeddings keyed by {store.key_type} from {args.input}")
+
+write_embeddings_file(args.output, store.keys, store.matrix, store.key_type, store.offsets)
+
+# Round-trip check
+check = open_embeddings_file(args.output)
+assert check.keys == store.keys, "key mismatch after conversion"
+assert np.array_equal(np.asarray(check.matrix), store.matrix), "matrix mismatch after conversion"
+assert np.array_equal(check.offsets, store.offsets), "offsets mismatch after conversion"
+
+print(f"✅ Wrote {args.output} ({len(check)} students, {check.matrix.shape[0]} x {check.matrix.shape[1]} float32, key type {check.key_type})")
@@ -1,10 +1,36 @@
+import argparse
+import csv
+import os
 import pickle
+import sys
 import numpy as np
 
+parser = argparse.ArgumentParser(description="Normalize the embeddings pickle")
+parser.add_argument('--input', default='sface_embeddings_database.pickle')
+parser.add_argument('--output', default=None, help="defaults to overwriting --input")
+parser.add_argument('--by-student-id', action='store_true',
+                    help="re-key embeddings from full_name to student_id (one-time migration)")
+parser.add_argument('--mapping', default=None,
+                    help="optional CSV with full_name,student_id rows; overrides the Supabase lookup")
+parser.add_argument('--max-prototypes', type=int, default=0,
+                    help="cluster each student's photos down to at most N prototypes (0 = keep all)")
+parser.add_argument('--average', action='store_true',
+                    help="old behaviour: collapse each student's photos into one mean embedding")
+args = parser.parse_args()
+output_path = args.output or args.input
+
 # Load existing pickle
-with open('sface_embeddings_database.pickle', 'rb') as f:
+with open(args.input, 'rb') as f:
     old_embeddings = pickle.load(f)
 
+# Already migrated → only the student_id keyed payload needs fixing
+already_migrated = isinstance(old_embeddings.get('embeddings'), dict) and 'key_type' in old_embeddings
+if already_migrated:
+    migrated_key_type = old_embeddings['key_type']
+    print(f"ℹ️  {args.input} is already keyed by {migrated_key_type}")
+    old_embeddings = old_embeddings['embeddings']
+    args.by_student_id = False
+
 print("Converting embeddings to correct format...")
 print("="*50)
 
@@ -13,28 +39,91 @@ new_embeddings = {}
 for student_name, embeddings_list in old_embeddings.items():
     print(f"\nProcessing {student_name}...")
     print(f"  Number of photos: {len(embeddings_list)}")
-    
+
     # Check if it's already in correct format
     if isinstance(embeddings_list[0], (int, float)):
         # Already flat - just copy
         new_embeddings[student_name] = embeddings_list
         print(f"  ✓ Already in correct format ({len(embeddings_list)} values)")
-    else:
+    elif args.average:
         # Convert list of embeddings to average
         embeddings_array = np.array(embeddings_list)
         avg_embedding = np.mean(embeddings_array, axis=0).tolist()
         new_embeddings[student_name] = avg_embedding
-        
+
         print(f"  ✓ Averaged {len(embeddings_list)} photos into single embedding")
         print(f"  ✓ Final embedding size: {len(avg_embedding)}")
+    else:
+        # Keep one embedding per photo, optionally clustered to a bounded set
+        embeddings_array = np.array(embeddings_list, dtype=np.float32)
+        if args.max_prototypes and len(embeddings_array) > args.max_prototypes:
+            sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            from services.gallery_matcher import compact_prototypes
+            embeddings_array = compact_prototypes(embeddings_array, args.max_prototypes)
+            print(f"  ✓ Clustered {len(embeddings_list)} photos into {len(embeddings_array)} prototypes")
+        else:
+            print(f"  ✓ Kept {len(embeddings_array)} embeddings")
+        new_embeddings[student_name] = embeddings_array.tolist()
+
+if args.by_student_id:
+    print("\n" + "="*50)
+    print("Re-keying embeddings by student_id...")
+    print("="*50)
+
+    name_to_ids = {}
+
+    if args.mapping:
+        with open(args.mapping, newline='') as f:
+            for row in csv.DictReader(f):
+                name_to_ids.setdefault(row['full_name'], []).append(row['student_id'])
+    else:
+        from dotenv import load_dotenv
+        from supabase import create_client
+
+        load_dotenv()
+        client = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_KEY'))
+        profiles = client.table('user_profiles')\
+            .select('user_id, full_name')\
+            .eq('role', 'student')\
+            .in_('full_name', list(new_embeddings.keys()))\
+            .execute()
+        for p in profiles.data:
+            name_to_ids.setdefault(p['full_name'], []).append(p['user_id'])
+
+    by_student_id = {}
+    unresolved = []
+
+    for name, embedding in new_embeddings.items():
+        ids = name_to_ids.get(name, [])
+        if len(ids) == 1:
+            by_student_id[ids[0]] = embedding
+            print(f"  ✓ {name:20} → {ids[0]}")
+        else:
+            # Missing or ambiguous (two students share the name): map it by hand
+            unresolved.append((name, ids))
+            print(f"  ❌ {name:20} → {'no profile' if not ids else f'{len(ids)} profiles: {ids}'}")
+
+    if unresolved:
+        print(f"\n⚠️  {len(unresolved)} name(s) could not be mapped uniquely.")
+        print("   Add them to a full_name,student_id CSV and re-run with --mapping.")
+        raise SystemExit(1)
+
+    payload = {'key_type': 'student_id', 'embeddings': by_student_id}
+elif already_migrated:
+    payload = {'key_type': migrated_key_type, 'embeddings': new_embeddings}
+else:
+    payload = new_embeddings
 
 # Save corrected pickle
-with open('sface_embeddings_database.pickle', 'wb') as f:
-    pickle.dump(new_embeddings, f)
+with open(output_path, 'wb') as f:
+    pickle.dump(payload, f)
 
 print("\n" + "="*50)
 print("✅ Pickle file corrected!")
 print(f"Total students: {len(new_embeddings)}")
 print("\nVerification:")
 for name, embedding in new_embeddings.items():
-    print(f"  {name}: {len(embedding)} values (type: {type(embedding[0]).__name__})")
+    if isinstance(embedding[0], list):
+        print(f"  {name}: {len(embedding)} x {len(embedding[0])} values")
+    else:
+        print(f"  {name}: {len(embedding)} values (type: {type(embedding[0]).__name__})")
@@ -1,110 +1,257 @@
 from flask import Blueprint, request, jsonify
 from services.supabase_client import supabase_client
-from services.embeddings_loader import embeddings_loader
-from services.face_detection import face_detector
+from services.inference_pool import analyze_faces
 from services.face_recognition import face_recognizer
+from services.class_roster import class_roster_cache
+from services.profile_cache import profile_cache
+from services.attendance_history import history_cache
 from middleware.auth_middleware import teacher_required
-from utils.helpers import decode_base64_image, resize_image_if_needed
+from services.attendance_sessions import attendance_sessions, SessionLimitError
+from services.job_queue import job_queue, QueueFullError
+from utils.helpers import read_request_image, read_request_images, resize_image_if_needed, ImageTooLargeError
+from config.settings import Config
 
 
 attendance_bp = Blueprint('attendance', __name__)
 
 
+def run_attendance_pipeline(image, class_id: str) -> tuple:
+    """
+    Detect + recognise one resized photo against a class roster
+    
+    Returns (response body, HTTP status). Needs no request context, so the
+    job queue workers run it too.
+    """
+    # Enrolled students, names and gallery from the cached class roster
+    roster = class_roster_cache.get(class_id)
+    enrolled_embeddings = roster.embeddings
+    
+    if not enrolled_embeddings:
+        return {'error': 'No students enrolled or no embeddings found'}, 404
+    
+    all_student_ids = roster.matchable_ids
+    name_map = roster.name_map
+    
+    # Detect faces with YOLO and embed them (in the inference pool when enabled)
+    analysis = analyze_faces(image)
+    face_boxes = analysis.boxes
+    
+    if len(face_boxes) == 0:
+        # ALL students are absent (no faces detected)
+        absent_students = [
+            {
+                'student_id': sid,
+                'name': name_map.get(sid, sid)
+            }
+            for sid in all_student_ids
+        ]
+        
+        return {
+            'success': True,
+            'warning': 'No faces detected in image',
+            'present_students': [],
+            'absent_students': absent_students,
+            'total_faces_detected': 0,
+            'recognized_count': 0,
+            'unknown_faces': 0,
+            'processing_details': {
+                'total_enrolled': len(all_student_ids),
+                'model': 'SFace',
+                'threshold': 0.8
+            }
+        }, 200
+    
+    # Recognize faces with SFace
+    result = face_recognizer.process_attendance_image(
+        image,
+        face_boxes,
+        enrolled_embeddings,
+        gallery=roster.gallery,
+        analysis=analysis
+    )
+    
+    # Get recognized student IDs
+    recognized_ids = set([s['student_id'] for s in result.get('present_students', [])])
+    
+    # Calculate absent students (CRITICAL: Done here, not in face_recognizer)
+    absent_student_ids = [sid for sid in all_student_ids if sid not in recognized_ids]
+    
+    # Add names to present students
+    for student in result.get('present_students', []):
+        student['name'] = name_map.get(student['student_id'], student['student_id'])
+    
+    # Build absent students with names
+    absent_students = [
+        {
+            'student_id': sid,
+            'name': name_map.get(sid, sid)
+        }
+        for sid in absent_student_ids
+    ]
+    
+    return {
+        'success': True,
+        'present_students': result.get('present_students', []),
+        'absent_students': absent_students,
+        'total_faces_detected': result.get('total_faces_detected', len(face_boxes)),
+        'recognized_count': len(recognized_ids),
+        'unknown_faces': result.get('unknown_faces', 0),
+        'processing_details': {
+            'model': result.get('processing_details', {}).get('model', 'SFace'),
+            'threshold': result.get('processing_details', {}).get('threshold', 0.8),
+            'total_enrolled': len(all_student_ids),
+            'timings_ms': result.get('processing_details', {}).get('timings_ms', {})
+        }
+    }, 200
+
+
 @attendance_bp.route('/process-image', methods=['POST'])
 @teacher_required
 def process_attendance():
-    """Process group photo for attendance detection"""
+    """
+    Process group photo for attendance detection
+    
+    Accepts multipart/form-data (image file + class_id field), a raw
+    image/jpeg body (?class_id=...), or the legacy JSON {image: base64, class_id}
+    """
     try:
-        data = request.json
+        # Decode image
+        try:
+            image, data = read_request_image(request, max_width=Config.MAX_IMAGE_WIDTH)
+        except ImageTooLargeError as e:
+            return jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        if 'image' not in data or 'class_id' not in data:
+        if 'class_id' not in data:
             return jsonify({'error': 'image and class_id required'}), 400
         
-        # Decode image
-        image = decode_base64_image(data['image'])
-        image = resize_image_if_needed(image, max_width=1920)
+        image = resize_image_if_needed(image, max_width=Config.MAX_IMAGE_WIDTH)
         
-        # Get enrolled students with embeddings
-        enrolled_embeddings = embeddings_loader.get_embeddings_for_class(data['class_id'])
+        body, status = run_attendance_pipeline(image, data['class_id'])
+        return jsonify(body), status
         
-        if not enrolled_embeddings:
-            return jsonify({'error': 'No students enrolled or no embeddings found'}), 404
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@attendance_bp.route('/jobs', methods=['POST'])
+@teacher_required
+def submit_attendance_job():
+    """
+    Queue a group photo for background processing; returns 202 + job_id
+    
+    Same input as /process-image, plus an optional callback_url that gets
+    the finished job POSTed to it (https, JOB_CALLBACK_ALLOWED_HOSTS only). Poll GET /jobs/<job_id> otherwise.
+    Answers 429 when the queue is full.
+    """
+    try:
+        try:
+            image, data = read_request_image(request, max_width=Config.MAX_IMAGE_WIDTH)
+        except ImageTooLargeError as e:
+            return jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Fetch all student names in ONE query (efficient!)
-        all_student_ids = list(enrolled_embeddings.keys())
-        profiles_response = supabase_client.table('user_profiles')\
-            .select('user_id, full_name')\
-            .in_('user_id', all_student_ids)\
-            .execute()
+        if 'class_id' not in data:
+            return jsonify({'error': 'image and class_id required'}), 400
+        
+        image = resize_image_if_needed(image, max_width=Config.MAX_IMAGE_WIDTH)
+        
+        try:
+            job = job_queue.submit(
+                'process-image',
+                request.user_id,
+                run_attendance_pipeline,
+                image,
+                data['class_id'],
+                callback_url=data.get('callback_url')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except QueueFullError as e:
+            response = jsonify({'error': f'Server busy, retry shortly ({e})'})
+            response.headers['Retry-After'] = '5'
+            return response, 429
+        
+        return jsonify({
+            'success': True,
+            'job_id': job['job_id'],
+            'status': job['status'],
+            'status_url': f"{request.script_root}/api/attendance/jobs/{job['job_id']}"
+        }), 202
+        
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@attendance_bp.route('/jobs/<job_id>', methods=['GET'])
+@teacher_required
+def get_attendance_job(job_id):
+    """Status, timings and (once done) the /process-image result of a job"""
+    job = job_queue.get(job_id, request.user_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({'success': True, **job}), 200
+
+
+@attendance_bp.route('/identify', methods=['POST'])
+@teacher_required
+def identify_faces():
+    """Identify faces against every enrolled student in the institution (walk-ins, cross-listed)"""
+    try:
+        try:
+            image, data = read_request_image(request, max_width=Config.MAX_IMAGE_WIDTH)
+        except ImageTooLargeError as e:
+            return jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        try:
+            top_k = min(max(int(data.get('top_k', 1)), 1), 10)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'top_k must be an integer'}), 400
+        
+        image = resize_image_if_needed(image, max_width=Config.MAX_IMAGE_WIDTH)
+        
+        analysis = analyze_faces(image)
+        face_boxes = analysis.boxes
+        result = face_recognizer.identify_faces(image, face_boxes, top_k=top_k, analysis=analysis)
         
-        # Create UUID -> Name mapping
-        name_map = {p['user_id']: p['full_name'] for p in profiles_response.data}
-        
-        # Detect faces with YOLO
-        face_boxes = face_detector.detect_faces(image)
-        
-        if len(face_boxes) == 0:
-            # ALL students are absent (no faces detected)
-            absent_students = [
-                {
-                    'student_id': sid,
-                    'name': name_map.get(sid, sid)
-                }
-                for sid in all_student_ids
-            ]
+        # Resolve names for every candidate (cached, at most ONE query for the rest)
+        if result['key_type'] == 'student_id':
+            candidate_ids = list({c['key'] for f in result['faces'] for c in f['candidates']})
+            profiles = profile_cache.get_many(candidate_ids)
+            name_map = {user_id: p['full_name'] for user_id, p in profiles.items()}
             
-            return jsonify({
-                'success': True,
-                'warning': 'No faces detected in image',
-                'present_students': [],
-                'absent_students': absent_students,
-                'total_faces_detected': 0,
-                'recognized_count': 0,
-                'unknown_faces': 0,
-                'processing_details': {
-                    'total_enrolled': len(all_student_ids),
-                    'model': 'SFace',
-                    'threshold': 0.8
-                }
-            }), 200
-        
-        # Recognize faces with SFace
-        result = face_recognizer.process_attendance_image(
-            image,
-            face_boxes,
-            enrolled_embeddings
-        )
-        
-        # Get recognized student IDs
-        recognized_ids = set([s['student_id'] for s in result.get('present_students', [])])
-        
-        # Calculate absent students (CRITICAL: Done here, not in face_recognizer)
-        absent_student_ids = [sid for sid in all_student_ids if sid not in recognized_ids]
-        
-        # Add names to present students
-        for student in result.get('present_students', []):
-            student['name'] = name_map.get(student['student_id'], student['student_id'])
-        
-        # Build absent students with names
-        absent_students = [
-            {
-                'student_id': sid,
-                'name': name_map.get(sid, sid)
-            }
-            for sid in absent_student_ids
-        ]
+            for face in result['faces']:
+                for c in face['candidates']:
+                    c['student_id'] = c['key']
+                    c['name'] = name_map.get(c['key'], c['key'])
+        else:
+            # Legacy name-keyed database: only the name is known
+            for face in result['faces']:
+                for c in face['candidates']:
+                    c['name'] = c['key']
+        
+        for face in result['faces']:
+            for c in face['candidates']:
+                del c['key']
         
         return jsonify({
             'success': True,
-            'present_students': result.get('present_students', []),
-            'absent_students': absent_students,
-            'total_faces_detected': result.get('total_faces_detected', len(face_boxes)),
-            'recognized_count': len(recognized_ids),
-            'unknown_faces': result.get('unknown_faces', 0),
+            'faces': result['faces'],
+            'total_faces_detected': len(face_boxes),
+            'identified_count': sum(1 for f in result['faces'] if f['candidates']),
             'processing_details': {
-                'model': result.get('processing_details', {}).get('model', 'SFace'),
-                'threshold': result.get('processing_details', {}).get('threshold', 0.8),
-                'total_enrolled': len(all_student_ids)
+                'index': result['index'],
+                'threshold': face_recognizer.threshold,
+                'timings_ms': result['timings_ms']
             }
         }), 200
         
@@ -114,6 +261,112 @@ def process_attendance():
         return jsonify({'error': str(e)}), 500
 
 
+@attendance_bp.route('/sessions', methods=['POST'])
+@teacher_required
+def open_session():
+    """Open a multi-photo attendance session for one class"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        if 'class_id' not in data:
+            return jsonify({'error': 'class_id required'}), 400
+        
+        session = attendance_sessions.create(data['class_id'], request.user_id)
+        
+        if not session.roster.embeddings:
+            attendance_sessions.close(session.session_id, request.user_id)
+            return jsonify({'error': 'No students enrolled or no embeddings found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'session_id': session.session_id,
+            'class_id': session.class_id,
+            'total_enrolled': len(session.roster.student_ids),
+            'max_photos': Config.SESSION_MAX_PHOTOS,
+            'expires_in': attendance_sessions.ttl_seconds
+        }), 201
+        
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@attendance_bp.route('/sessions/<session_id>/photos', methods=['POST'])
+@teacher_required
+def add_session_photos(session_id):
+    """
+    Add one or more photos to a session and return the fused result
+    
+    Multipart requests may repeat the 'image' part; the photos are
+    processed concurrently against the session's roster snapshot. A photo
+    that fails is reported in added_photos with an 'error' (207 when
+    others succeeded).
+    """
+    try:
+        session = attendance_sessions.get(session_id, request.user_id)
+        if session is None:
+            return jsonify({'error': 'Session not found or expired'}), 404
+        
+        try:
+            images, _ = read_request_images(
+                request,
+                max_width=Config.MAX_IMAGE_WIDTH,
+                max_count=Config.SESSION_MAX_PHOTOS
+            )
+        except ImageTooLargeError as e:
+            return jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        images = [resize_image_if_needed(image, max_width=Config.MAX_IMAGE_WIDTH) for image in images]
+        
+        try:
+            added = attendance_sessions.process_photos(session, images)
+        except SessionLimitError as e:
+            return jsonify({'error': str(e)}), 409
+        
+        # Photos that went through are merged even when others failed
+        failed = sum(1 for photo in added if 'error' in photo)
+        if failed == len(added):
+            status = 500
+        elif failed:
+            status = 207
+        else:
+            status = 200
+        return jsonify({
+            'success': failed == 0,
+            'added_photos': added,
+            'failed_count': failed,
+            **session.result()
+        }), status
+        
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@attendance_bp.route('/sessions/<session_id>', methods=['GET'])
+@teacher_required
+def get_session(session_id):
+    """Current fused result of a session"""
+    session = attendance_sessions.get(session_id, request.user_id)
+    if session is None:
+        return jsonify({'error': 'Session not found or expired'}), 404
+    
+    return jsonify({'success': True, **session.result()}), 200
+
+
+@attendance_bp.route('/sessions/<session_id>', methods=['DELETE'])
+@teacher_required
+def close_session(session_id):
+    """Close a session and return its final fused result (then POST it to /save)"""
+    session = attendance_sessions.close(session_id, request.user_id)
+    if session is None:
+        return jsonify({'error': 'Session not found or expired'}), 404
+    
+    return jsonify({'success': True, **session.result()}), 200
 
 
 @attendance_bp.route('/save', methods=['POST'])
@@ -165,6 +418,7 @@ def save_attendance():
             })
         
         supabase_client.table('student_attendance').insert(attendance_entries).execute()
+        history_cache.invalidate(data['present_students'] + data['absent_students'])
         
         return jsonify({
             'success': True,
@@ -176,3 +430,112 @@ def save_attendance():
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
+
+
+@attendance_bp.route('/save-bulk', methods=['POST'])
+@teacher_required
+def save_attendance_bulk():
+    """
+    Save many class/date attendance records in batched transactions
+    
+    Body: {records: [{class_id, date, present_students, absent_students,
+    manually_edited?, idempotency_key?}, ...]}. Without a per-record key,
+    an Idempotency-Key header is expanded to '<header>:<index>'. Records
+    whose key this teacher already saved are skipped and reported with
+    created=false. Needs supabase/migrations/20261018000000_bulk_attendance_save.sql
+    and 20261018020000_bulk_save_per_teacher_keys.sql.
+    
+    Each chunk of BULK_SAVE_CHUNK_SIZE records commits on its own. When a
+    chunk fails the others are still saved: the response is 207 with one
+    entry per chunk, and the failed chunk's records carry its error
+    instead of a record_id (retrying the request with the same keys only
+    saves what is missing).
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        records = data.get('records')
+        teacher_id = request.user_id
+        
+        if not isinstance(records, list) or not records:
+            return jsonify({'error': 'records must be a non-empty list'}), 400
+        if len(records) > Config.BULK_SAVE_MAX_RECORDS:
+            return jsonify({'error': f'At most {Config.BULK_SAVE_MAX_RECORDS} records per request'}), 413
+        
+        required = ['class_id', 'date', 'present_students', 'absent_students']
+        header_key = request.headers.get('Idempotency-Key')
+        payload = []
+        for i, record in enumerate(records):
+            if not isinstance(record, dict):
+                return jsonify({'error': f'Record {i}: must be an object'}), 400
+            missing = [f for f in required if f not in record]
+            if missing:
+                return jsonify({'error': f'Record {i}: missing fields: {missing}'}), 400
+            for field in ('present_students', 'absent_students'):
+                if not isinstance(record[field], list) or not all(isinstance(sid, str) for sid in record[field]):
+                    return jsonify({'error': f'Record {i}: {field} must be a list of student ids'}), 400
+            
+            payload.append({
+                'class_id': record['class_id'],
+                'date': record['date'],
+                'present_students': record['present_students'],
+                'absent_students': record['absent_students'],
+                'manually_edited': bool(record.get('manually_edited', False)),
+                'idempotency_key': record.get('idempotency_key') or (f"{header_key}:{i}" if header_key else None)
+            })
+        
+        # One RPC (one transaction, one round trip) per chunk of records
+        report = []
+        chunks = []
+        chunk_size = max(1, Config.BULK_SAVE_CHUNK_SIZE)
+        for start in range(0, len(payload), chunk_size):
+            chunk = payload[start:start + chunk_size]
+            indices = range(start, start + len(chunk))
+            try:
+                response = supabase_client.rpc('save_attendance_bulk', {
+                    'p_teacher_id': teacher_id,
+                    'p_records': chunk
+                }).execute()
+            except Exception as e:
+                print(f"⚠️ Bulk save chunk {start}-{start + len(chunk) - 1} failed: {e}")
+                chunks.append({'first_index': start, 'count': len(chunk), 'committed': False, 'error': str(e)})
+                report.extend(
+                    {'index': i, 'record_id': None, 'created': False,
+                     'idempotency_key': record['idempotency_key'], 'error': str(e)}
+                    for i, record in zip(indices, chunk)
+                )
+                continue
+            
+            chunks.append({'first_index': start, 'count': len(chunk), 'committed': True, 'error': None})
+            report.extend(
+                {'index': i, 'record_id': r['record_id'], 'created': r['created'],
+                 'idempotency_key': r['idempotency_key'], 'error': None}
+                for i, r in zip(indices, response.data)
+            )
+        
+        created = sum(1 for r in report if r['created'])
+        failed = sum(1 for r in report if r['error'])
+        history_cache.invalidate({
+            sid
+            for record, r in zip(payload, report) if r['created']
+            for sid in record['present_students'] + record['absent_students']
+        })
+        
+        if failed == len(report):
+            status = 500
+        elif failed:
+            status = 207
+        else:
+            status = 201
+        return jsonify({
+            'success': failed == 0,
+            'records': report,
+            'chunks': chunks,
+            'created_count': created,
+            'skipped_count': len(report) - created - failed,
+            'failed_count': failed
+        }), status
+        
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
@@ -1,37 +1,38 @@
 from flask import Blueprint, request, jsonify
 from services.supabase_client import supabase_client
-from utils.validators import validate_email, validate_password, validate_required_fields
+from services.bulk_registration import bulk_registration, STATUS_CREATED
+from services.profile_cache import profile_cache, token_claims
+from middleware.auth_middleware import token_required, teacher_required
+from utils.validators import validate_registration, validate_required_fields
+from utils.helpers import read_request_rows
 import jwt
 from datetime import datetime, timedelta
 from config.settings import Config
 
 auth_bp = Blueprint('auth', __name__)
 
+
+def issue_token(profile: dict) -> str:
+    """Signed JWT carrying the user's id, role and non-sensitive profile fields"""
+    return jwt.encode({
+        'user_id': profile['user_id'],
+        'role': profile['role'],
+        **token_claims(profile),
+        'exp': datetime.utcnow() + timedelta(hours=Config.JWT_EXPIRATION_HOURS)
+    }, Config.SECRET_KEY, algorithm='HS256')
+
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """Register a new user (teacher or student)"""
     try:
-        data = request.json
-        
-        # Validate required fields
-        required = ['email', 'password', 'full_name', 'role']
-        is_valid, missing = validate_required_fields(data, required)
-        if not is_valid:
-            return jsonify({'error': f'Missing fields: {missing}'}), 400
+        data = request.get_json(silent=True) or {}
         
-        # Validate email
-        if not validate_email(data['email']):
-            return jsonify({'error': 'Invalid email format'}), 400
-        
-        # Validate password
-        is_valid, msg = validate_password(data['password'])
+        # Validate everything (role-specific fields included) before creating anything
+        is_valid, msg = validate_registration(data)
         if not is_valid:
             return jsonify({'error': msg}), 400
         
-        # Validate role
-        if data['role'] not in ['teacher', 'student']:
-            return jsonify({'error': 'Role must be teacher or student'}), 400
-        
         # Create user in Supabase Auth
         auth_response = supabase_client.auth.sign_up({
             'email': data['email'],
@@ -53,12 +54,10 @@ def register():
         }
         
         supabase_client.table('user_profiles').insert(profile_data).execute()
+        profile_cache.put(profile_data)
         
         # Create role-specific entry
         if data['role'] == 'teacher':
-            if 'employee_id' not in data:
-                return jsonify({'error': 'employee_id required for teachers'}), 400
-            
             teacher_data = {
                 'teacher_id': user_id,
                 'employee_id': data['employee_id'],
@@ -67,9 +66,6 @@ def register():
             supabase_client.table('teachers').insert(teacher_data).execute()
         
         elif data['role'] == 'student':
-            if 'enrollment_number' not in data:
-                return jsonify({'error': 'enrollment_number required for students'}), 400
-            
             student_data = {
                 'student_id': user_id,
                 'enrollment_number': data['enrollment_number'],
@@ -79,12 +75,7 @@ def register():
             supabase_client.table('students').insert(student_data).execute()
         
         # Generate JWT token
-        token = jwt.encode({
-            'user_id': user_id,
-            'email': data['email'],
-            'role': data['role'],
-            'exp': datetime.utcnow() + timedelta(hours=Config.JWT_EXPIRATION_HOURS)
-        }, Config.SECRET_KEY, algorithm='HS256')
+        token = issue_token(profile_data)
         
         return jsonify({
             'success': True,
@@ -102,6 +93,42 @@ def register():
         return jsonify({'error': str(e)}), 500
 
 
+@auth_bp.route('/register/bulk', methods=['POST'])
+@teacher_required
+def register_bulk():
+    """
+    Register many users from CSV or JSON; returns a per-row report
+    
+    Rows take the same fields as /register (CSV: one header row, role
+    defaults to student). Invalid or duplicate rows are reported and
+    skipped; the rest are created. No tokens are issued. Like /register,
+    accounts must confirm their email unless BULK_REGISTER_AUTO_CONFIRM.
+    """
+    try:
+        try:
+            rows = read_request_rows(request, max_rows=Config.BULK_REGISTER_MAX_ROWS, json_key='users')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        for row in rows:
+            row.setdefault('role', 'student')
+        
+        report = bulk_registration.register(rows)
+        created = sum(1 for r in report if r['status'] == STATUS_CREATED)
+        
+        return jsonify({
+            'success': created > 0,
+            'created_count': created,
+            'failed_count': len(report) - created,
+            'results': report
+        }), 201 if created else 400
+        
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
 @auth_bp.route('/login', methods=['POST'])
 def login():
     """Login user"""
@@ -125,23 +152,14 @@ def login():
         
         user_id = auth_response.user.id
         
-        # Get user profile
-        profile = supabase_client.table('user_profiles')\
-            .select('*')\
-            .eq('user_id', user_id)\
-            .single()\
-            .execute()
+        # Get user profile (cached; a miss also warms the cache for later requests)
+        profile = profile_cache.get(user_id)
         
-        if not profile.data:
+        if not profile:
             return jsonify({'error': 'User profile not found'}), 404
         
         # Generate JWT token
-        token = jwt.encode({
-            'user_id': user_id,
-            'email': profile.data['email'],
-            'role': profile.data['role'],
-            'exp': datetime.utcnow() + timedelta(hours=Config.JWT_EXPIRATION_HOURS)
-        }, Config.SECRET_KEY, algorithm='HS256')
+        token = issue_token(profile)
         
         return jsonify({
             'success': True,
@@ -149,12 +167,76 @@ def login():
             'token': token,
             'user': {
                 'user_id': user_id,
-                'email': profile.data['email'],
-                'full_name': profile.data['full_name'],
-                'role': profile.data['role'],
-                'department': profile.data.get('department', '')
+                'email': profile['email'],
+                'full_name': profile['full_name'],
+                'role': profile['role'],
+                'department': profile.get('department') or ''
             }
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 401
+
+
+@auth_bp.route('/me', methods=['GET'])
+@token_required
+def get_current_user():
+    """Current user's profile, straight from the token's claims"""
+    try:
+        claims = request.token_claims
+        if 'full_name' not in claims:
+            # Token issued before profile claims were embedded
+            claims = profile_cache.get(request.user_id) or {}
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'success': True,
+        'user': {
+            'user_id': request.user_id,
+            'role': request.user_role,
+            **token_claims(claims)
+        }
+    }), 200
+
+
+@auth_bp.route('/profile', methods=['PATCH'])
+@token_required
+def update_profile():
+    """Update full_name / department; returns a token carrying the new values"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        updates = {k: data[k] for k in ('full_name', 'department') if k in data}
+        if not updates:
+            return jsonify({'error': 'Nothing to update (full_name, department)'}), 400
+        if not all(isinstance(v, str) for v in updates.values()):
+            return jsonify({'error': 'full_name and department must be strings'}), 400
+        if 'full_name' in updates and not updates['full_name']:
+            return jsonify({'error': 'full_name cannot be empty'}), 400
+        
+        supabase_client.table('user_profiles')\
+            .update(updates)\
+            .eq('user_id', request.user_id)\
+            .execute()
+        profile_cache.invalidate(request.user_id)
+        
+        profile = profile_cache.get(request.user_id)
+        if not profile:
+            return jsonify({'error': 'User profile not found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'token': issue_token(profile),
+            'user': {
+                'user_id': profile['user_id'],
+                'email': profile['email'],
+                'full_name': profile['full_name'],
+                'role': profile['role'],
+                'department': profile.get('department') or ''
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,24 +1,58 @@
+import uuid
+from datetime import date
 from flask import Blueprint, request, jsonify
 from services.supabase_client import supabase_client
+from services.attendance_history import history_cache, build_attendance_history
 from middleware.auth_middleware import student_required
+from config.settings import Config
 
 students_bp = Blueprint('students', __name__)
 
 @students_bp.route('/attendance', methods=['GET'])
 @student_required
 def get_student_attendance():
-    """Get student's own attendance"""
+    """
+    Get student's own attendance
+    
+    Query: from / to (YYYY-MM-DD, inclusive), class_id, limit, offset.
+    Returns overall and per-class percentage and streaks, plus one page
+    of sessions (newest first).
+    """
     try:
         student_id = request.user_id
+        args = request.args
         
-        enrollments = supabase_client.table('enrollments')\
-            .select('class_id')\
-            .eq('student_id', student_id)\
-            .execute()
+        try:
+            date_from = date.fromisoformat(args['from']).isoformat() if args.get('from') else None
+            date_to = date.fromisoformat(args['to']).isoformat() if args.get('to') else None
+            limit = min(max(int(args.get('limit', 20)), 1), Config.HISTORY_PAGE_MAX)
+            offset = max(int(args.get('offset', 0)), 0)
+            class_id = str(uuid.UUID(args['class_id'])) if args.get('class_id') else None
+        except ValueError:
+            return jsonify({'error': 'from/to must be YYYY-MM-DD, limit/offset integers, class_id a UUID'}), 400
+        
+        def build():
+            enrollments = supabase_client.table('enrollments')\
+                .select('class_id')\
+                .eq('student_id', student_id)\
+                .execute()
+            
+            return build_attendance_history(
+                student_id,
+                [rec['class_id'] for rec in enrollments.data],
+                date_from=date_from,
+                date_to=date_to,
+                class_id=class_id,
+                limit=limit,
+                offset=offset
+            )
+        
+        history = history_cache.get(student_id, (date_from, date_to, class_id, limit, offset), build)
         
         return jsonify({
             'success': True,
-            'message': 'Student attendance endpoint'
+            'student_id': student_id,
+            **history
         }), 200
         
     except Exception as e:
@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify
 from services.supabase_client import supabase_client
+from services.class_roster import class_roster_cache
+from services.enrollment import enrollment_service
 from middleware.auth_middleware import teacher_required
+from utils.helpers import read_request_images, resize_image_if_needed, ImageTooLargeError
+from config.settings import Config
 
 teachers_bp = Blueprint('teachers', __name__)
 
@@ -23,3 +27,82 @@ def get_teacher_classes():
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+@teachers_bp.route('/classes/<class_id>/roster/refresh', methods=['POST'])
+@teacher_required
+def refresh_class_roster(class_id):
+    """Drop the cached roster after enrollments for a class change"""
+    try:
+        owned = supabase_client.table('classes')\
+            .select('id')\
+            .eq('id', class_id)\
+            .eq('teacher_id', request.user_id)\
+            .execute()
+        if not owned.data:
+            return jsonify({'error': 'Class not found'}), 404
+        
+        class_roster_cache.invalidate(class_id)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Class roster will be reloaded on next use'
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@teachers_bp.route('/students/<student_id>/faces', methods=['POST'])
+@teacher_required
+def enroll_student_faces(student_id):
+    """
+    Enroll face photos for a student in one of the teacher's classes
+    
+    Accepts the same bodies as /process-image; multipart requests may
+    repeat the 'image' part. The embeddings are appended as a delta
+    segment instead of rewriting the gallery.
+    """
+    try:
+        classes = supabase_client.table('classes')\
+            .select('id')\
+            .eq('teacher_id', request.user_id)\
+            .execute()
+        class_ids = [c['id'] for c in classes.data]
+        
+        enrolled = supabase_client.table('enrollments')\
+            .select('class_id')\
+            .eq('student_id', student_id)\
+            .in_('class_id', class_ids)\
+            .limit(1)\
+            .execute() if class_ids else None
+        if not enrolled or not enrolled.data:
+            return jsonify({'error': 'Student is not enrolled in any of your classes'}), 404
+        
+        try:
+            images, _ = read_request_images(
+                request,
+                max_width=Config.MAX_IMAGE_WIDTH,
+                max_count=Config.ENROLL_MAX_PHOTOS
+            )
+        except ImageTooLargeError as e:
+            return jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        images = [resize_image_if_needed(image, max_width=Config.MAX_IMAGE_WIDTH) for image in images]
+        
+        try:
+            result = enrollment_service.enroll(student_id, images)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if result['enrolled_photos'] == 0:
+            return jsonify({'error': 'No face detected in any photo', **result}), 422
+        
+        return jsonify({'success': True, **result}), 201
+        
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,203 @@
+import threading
+import numpy as np
+from typing import List, Optional, Tuple
+from config.settings import Config
+from services.embedding_store import EmbeddingStore
+from services.gallery_matcher import normalize_rows
+
+# Rows scored per matmul in brute-force scans (bounds temporary memory)
+CHUNK_ROWS = 65536
+
+
+class ExactIndex:
+    """Brute-force cosine search over every prototype (ground truth)"""
+
+    name = 'exact'
+
+    def __init__(self, vectors: np.ndarray, offsets: np.ndarray):
+        self.vectors = vectors
+        self.offsets = offsets
+
+    def search(self, queries: np.ndarray, k: int = 1) -> List[List[Tuple[int, float]]]:
+        queries = normalize_rows(np.atleast_2d(queries))
+        # Bound the (queries x rows) temporary to roughly CHUNK_ROWS x 64 floats
+        batch = max(1, CHUNK_ROWS * 64 // max(1, len(self.vectors)))
+
+        results = []
+        for start in range(0, len(queries), batch):
+            sims = queries[start:start + batch] @ self.vectors.T
+            best = np.maximum.reduceat(sims, self.offsets[:-1], axis=1)
+            results.extend(_top_k_students(row, k) for row in best)
+        return results
+
+
+class IVFIndex:
+    """
+    Inverted-file index in pure NumPy
+
+    Rows are clustered into nlist cells with spherical k-means; a query
+    only scores the rows in its nprobe closest cells.
+    """
+
+    name = 'ivf'
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        owners: np.ndarray,
+        nlist: int = 0,
+        nprobe: int = None,
+        iterations: int = 10,
+        seed: int = 0
+    ):
+        nlist = nlist or max(1, int(np.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+        self.nprobe = min(nlist, nprobe or Config.ANN_NPROBE)
+
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(vectors), nlist * 64)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~np.any(sums, axis=1)
+            # Re-seed empty cells so every list stays useful
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            centroids = normalize_rows(sums)
+
+        assignment = np.concatenate([
+            np.argmax(vectors[start:start + CHUNK_ROWS] @ centroids.T, axis=1)
+            for start in range(0, len(vectors), CHUNK_ROWS)
+        ])
+        order = np.argsort(assignment, kind='stable')
+
+        self.centroids = centroids
+        self.vectors = vectors[order]
+        self.owners = owners[order]
+        self.list_offsets = np.searchsorted(assignment[order], np.arange(nlist + 1))
+
+    def search(self, queries: np.ndarray, k: int = 1) -> List[List[Tuple[int, float]]]:
+        queries = normalize_rows(np.atleast_2d(queries))
+        cell_sims = queries @ self.centroids.T
+        probes = np.argpartition(-cell_sims, self.nprobe - 1, axis=1)[:, :self.nprobe]
+
+        results = []
+        for query, cells in zip(queries, probes):
+            rows = np.concatenate([
+                np.arange(self.list_offsets[c], self.list_offsets[c + 1]) for c in cells
+            ])
+            if rows.size == 0:
+                results.append([])
+                continue
+            sims = self.vectors[rows] @ query
+            results.append(_best_per_owner(self.owners[rows], sims, k))
+        return results
+
+
+class HNSWIndex:
+    """Graph index via the optional hnswlib package"""
+
+    name = 'hnsw'
+
+    def __init__(self, vectors: np.ndarray, owners: np.ndarray, ef_search: int = None):
+        import hnswlib
+
+        self.owners = owners
+        self.max_prototypes = int(np.bincount(owners).max())
+        self.index = hnswlib.Index(space='ip', dim=vectors.shape[1])
+        self.index.init_index(max_elements=len(vectors), ef_construction=200, M=16)
+        self.index.add_items(vectors, np.arange(len(vectors)))
+        self.index.set_ef(ef_search or Config.ANN_EF_SEARCH)
+
+    def search(self, queries: np.ndarray, k: int = 1) -> List[List[Tuple[int, float]]]:
+        queries = normalize_rows(np.atleast_2d(queries))
+        # Over-fetch so k distinct students survive collapsing prototypes
+        fetch = min(len(self.owners), k * self.max_prototypes)
+        labels, distances = self.index.knn_query(queries, k=fetch)
+        return [
+            _best_per_owner(self.owners[row_labels], 1.0 - row_dists, k)
+            for row_labels, row_dists in zip(labels, distances)
+        ]
+
+
+def _best_per_owner(owners: np.ndarray, sims: np.ndarray, k: int) -> List[Tuple[int, float]]:
+    """Top-k distinct owners by their best similarity, as (owner, cosine distance)"""
+    order = np.argsort(-sims, kind='stable')
+    _, first = np.unique(owners[order], return_index=True)
+    top = order[np.sort(first)][:k]
+    return [(int(owners[i]), float(1.0 - sims[i])) for i in top]
+
+
+def _top_k_students(best_sims: np.ndarray, k: int) -> List[Tuple[int, float]]:
+    k = min(k, len(best_sims))
+    top = np.argpartition(-best_sims, k - 1)[:k]
+    top = top[np.argsort(-best_sims[top], kind='stable')]
+    return [(int(i), float(1.0 - best_sims[i])) for i in top if np.isfinite(best_sims[i])]
+
+
+def build_ann_index(store: EmbeddingStore, kind: str = None):
+    """
+    Build the configured index (ANN_INDEX: 'auto', 'ivf', 'hnsw' or 'exact') over a store
+
+    'auto' scans exactly up to ANN_EXACT_MAX_ROWS embeddings: below that a
+    brute-force matmul is about as fast as IVF at nprobe=8 and never
+    misses, and IVF only pulls ahead on larger galleries.
+    """
+    kind = (kind or Config.ANN_INDEX).lower()
+    if kind == 'auto':
+        kind = 'exact' if store.matrix.shape[0] <= Config.ANN_EXACT_MAX_ROWS else 'ivf'
+    vectors = normalize_rows(store.matrix)
+    owners = np.repeat(np.arange(len(store)), np.diff(store.offsets))
+
+    if kind == 'hnsw':
+        try:
+            return HNSWIndex(vectors, owners)
+        except ImportError:
+            print("⚠️ hnswlib not installed, falling back to IVF index")
+            kind = 'ivf'
+    if kind == 'ivf':
+        return IVFIndex(vectors, owners, nlist=Config.ANN_NLIST)
+    if kind == 'exact':
+        return ExactIndex(vectors, store.offsets)
+
+    raise ValueError(f"Unknown ANN index: {kind} (expected 'auto', 'ivf', 'hnsw' or 'exact')")
+
+
+class InstitutionIndex:
+    """Lazily built ANN index over the whole embeddings database"""
+
+    def __init__(self):
+        self._index = None
+        self._store: Optional[EmbeddingStore] = None
+        self._generation = -1
+        self._lock = threading.Lock()
+
+    def get(self) -> Tuple[EmbeddingStore, object]:
+        """(store, index) snapshot; rebuilt after the embeddings database is hot-reloaded"""
+        from services.embeddings_loader import embeddings_loader
+
+        if self._index is not None and self._generation == embeddings_loader.generation:
+            return self._store, self._index
+
+        with self._lock:
+            if self._index is not None and self._generation == embeddings_loader.generation:
+                return self._store, self._index
+
+            store = embeddings_loader.load_embeddings_database()
+            generation = embeddings_loader.generation
+            if embeddings_loader.embeddings_cache is not store:
+                generation = -1  # raced a reload; rebuild on next use
+            if len(store) == 0:
+                return store, None
+
+            index = build_ann_index(store)
+            print(f"🔧 Built {index.name} index over {store.matrix.shape[0]} embeddings")
+            self._store, self._index, self._generation = store, index, generation
+            return store, index
+
+
+# Singleton instance
+institution_index = InstitutionIndex()
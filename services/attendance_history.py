@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+from services.supabase_client import supabase_client
+from config.settings import Config
+
+
+class StudentHistoryCache:
+    """
+    TTL cache of attendance history responses, grouped by student
+
+    Each student holds one entry per query (date range, class, page), at
+    most max_queries of them (least recently used go first), so paging
+    through offsets can't grow memory without bound. invalidate() drops
+    everything for the given students and bumps their version, so a build
+    that raced with a save is never stored.
+    """
+
+    def __init__(self, ttl_seconds: int = None, max_students: int = None, max_queries: int = None):
+        self.ttl_seconds = Config.HISTORY_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_students = Config.HISTORY_CACHE_SIZE if max_students is None else max_students
+        self.max_queries = Config.HISTORY_CACHE_QUERIES_PER_STUDENT if max_queries is None else max_queries
+        self._entries: "OrderedDict[str, OrderedDict[tuple, tuple]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, student_id: str, query: tuple, build: Callable[[], Dict]) -> Dict:
+        with self._lock:
+            queries = self._entries.get(student_id)
+            entry = queries.get(query) if queries is not None else None
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(student_id)
+                queries.move_to_end(query)
+                return entry[1]
+            version = self._versions.get(student_id, 0)
+
+        result = build()
+
+        if self.ttl_seconds > 0 and self.max_students > 0 and self.max_queries > 0:
+            with self._lock:
+                if self._versions.get(student_id, 0) == version:
+                    queries = self._entries.setdefault(student_id, OrderedDict())
+                    queries[query] = (time.monotonic(), result)
+                    queries.move_to_end(query)
+                    while len(queries) > self.max_queries:
+                        queries.popitem(last=False)
+                    self._entries.move_to_end(student_id)
+                    while len(self._entries) > self.max_students:
+                        self._entries.popitem(last=False)
+        return result
+
+    def invalidate(self, student_ids: Optional[Iterable[str]] = None):
+        """Drop the given students' history, or everyone's"""
+        with self._lock:
+            if student_ids is None:
+                self._entries.clear()
+                self._versions.clear()
+                return
+            for student_id in student_ids:
+                self._entries.pop(student_id, None)
+                self._versions[student_id] = self._versions.get(student_id, 0) + 1
+
+
+def build_attendance_history(
+    student_id: str,
+    class_ids: list,
+    date_from: str = None,
+    date_to: str = None,
+    class_id: str = None,
+    limit: int = 20,
+    offset: int = 0
+) -> Dict:
+    """
+    Per-class percentage and streaks plus one page of sessions, aggregated
+    by the student_attendance_summary / student_attendance_sessions RPCs
+    (supabase/migrations/20261018010000_student_attendance_history.sql)
+
+    class_ids are the student's enrollments: classes without any session
+    in the range are still listed, with zero totals.
+    """
+    summary = supabase_client.rpc('student_attendance_summary', {
+        'p_student_id': student_id,
+        'p_from': date_from,
+        'p_to': date_to
+    }).execute().data or []
+
+    sessions = supabase_client.rpc('student_attendance_sessions', {
+        'p_student_id': student_id,
+        'p_from': date_from,
+        'p_to': date_to,
+        'p_class_id': class_id,
+        'p_limit': limit,
+        'p_offset': offset
+    }).execute().data or []
+
+    by_class = {row['class_id']: row for row in summary}
+    classes = [by_class.pop(cid, _empty_summary(cid)) for cid in class_ids]
+    # Sessions of classes the student has since left
+    classes.extend(by_class.values())
+    if class_id is not None:
+        classes = [row for row in classes if row['class_id'] == class_id]
+
+    total = sum(row['total_sessions'] for row in classes)
+    present = sum(row['present_count'] for row in classes)
+
+    return {
+        'overall': {
+            'total_sessions': total,
+            'present_count': present,
+            'absent_count': total - present,
+            'attendance_percentage': round(100.0 * present / total, 2) if total else None
+        },
+        'classes': classes,
+        'sessions': sessions,
+        'pagination': {
+            'limit': limit,
+            'offset': offset,
+            'total': total,
+            'has_more': offset + len(sessions) < total
+        }
+    }
+
+
+def _empty_summary(class_id: str) -> Dict:
+    return {
+        'class_id': class_id,
+        'total_sessions': 0,
+        'present_count': 0,
+        'absent_count': 0,
+        'attendance_percentage': None,
+        'current_streak': 0,
+        'longest_streak': 0,
+        'first_date': None,
+        'last_date': None,
+        'last_present_date': None
+    }
+
+
+# Singleton instance
+history_cache = StudentHistoryCache()
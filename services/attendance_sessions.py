@@ -0,0 +1,197 @@
+import threading
+import time
+import uuid
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from services.class_roster import ClassRoster, class_roster_cache
+from services.inference_pool import analyze_faces
+from services.face_recognition import face_recognizer
+from config.settings import Config
+
+
+class SessionLimitError(ValueError):
+    """Session already holds SESSION_MAX_PHOTOS photos"""
+    pass
+
+
+class AttendanceSession:
+    """
+    Several photos of one class fused into a single attendance result
+
+    The roster (enrollments, names, gallery) is captured once when the
+    session opens; every photo is matched against that snapshot. A student
+    is present if any photo matched them, keeping the closest match.
+    """
+
+    def __init__(self, session_id: str, class_id: str, teacher_id: str, roster: ClassRoster):
+        self.session_id = session_id
+        self.class_id = class_id
+        self.teacher_id = teacher_id
+        self.roster = roster
+        self.photos: List[Optional[Dict]] = []      # per-photo summary, by upload order
+        self.best: Dict[str, Dict] = {}             # student_id -> closest match so far
+        self.created_at = time.monotonic()
+        self.touched_at = self.created_at
+        self._lock = threading.Lock()
+
+    def reserve_photos(self, count: int) -> List[int]:
+        """Claim photo indices up front so results keep upload order"""
+        with self._lock:
+            if len(self.photos) + count > Config.SESSION_MAX_PHOTOS:
+                raise SessionLimitError(f"A session holds at most {Config.SESSION_MAX_PHOTOS} photos")
+            start = len(self.photos)
+            self.photos.extend([None] * count)
+            self.touched_at = time.monotonic()
+            return list(range(start, start + count))
+
+    def add_photo(self, photo_index: int, image: np.ndarray) -> Dict:
+        """Detect + recognise one photo and merge it into the fused result"""
+        try:
+            analysis = analyze_faces(image)
+            face_boxes = analysis.boxes
+
+            if len(face_boxes) > 0 and self.roster.embeddings:
+                result = face_recognizer.process_attendance_image(
+                    image,
+                    face_boxes,
+                    self.roster.embeddings,
+                    gallery=self.roster.gallery,
+                    analysis=analysis
+                )
+                matches = result['present_students']
+            else:
+                matches = []
+        except Exception as e:
+            with self._lock:
+                self.photos[photo_index] = {'photo': photo_index, 'error': str(e)}
+            raise
+
+        summary = {
+            'photo': photo_index,
+            'total_faces_detected': len(face_boxes),
+            'recognized_count': len(matches),
+            'unknown_faces': len(face_boxes) - len(matches),
+            'timings_ms': analysis.timings
+        }
+
+        with self._lock:
+            self.photos[photo_index] = summary
+            for match in matches:
+                current = self.best.get(match['student_id'])
+                if current is None or match['distance'] < current['distance']:
+                    self.best[match['student_id']] = {**match, 'photo': photo_index}
+            self.touched_at = time.monotonic()
+
+        return summary
+
+    def result(self) -> Dict:
+        """Fused present/absent lists across every processed photo"""
+        name_map = self.roster.name_map
+        with self._lock:
+            best = dict(self.best)
+            photos = [p for p in self.photos if p is not None]
+            pending = len(self.photos) - len(photos)
+
+        present_students = sorted(
+            ({**match, 'name': name_map.get(sid, sid)} for sid, match in best.items()),
+            key=lambda s: s['name']
+        )
+        # Same definition as run_attendance_pipeline: students without
+        # embeddings can't be recognised, so they're never listed absent
+        matchable_ids = self.roster.matchable_ids
+        absent_students = [
+            {'student_id': sid, 'name': name_map.get(sid, sid)}
+            for sid in matchable_ids
+            if sid not in best
+        ]
+
+        return {
+            'session_id': self.session_id,
+            'class_id': self.class_id,
+            'present_students': present_students,
+            'absent_students': absent_students,
+            'recognized_count': len(present_students),
+            'photos': photos,
+            'pending_photos': pending,
+            'processing_details': {
+                'model': face_recognizer.model_name,
+                'threshold': face_recognizer.threshold,
+                'total_enrolled': len(matchable_ids)
+            }
+        }
+
+
+class AttendanceSessionStore:
+    """
+    In-process sessions keyed by id, expired after SESSION_TTL_SECONDS idle
+
+    Sessions live in worker memory, so the service must run a single
+    worker process (the Dockerfile default) or sticky routing.
+    """
+
+    def __init__(self, ttl_seconds: int = None):
+        self.ttl_seconds = Config.SESSION_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._sessions: Dict[str, AttendanceSession] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(
+            max_workers=Config.SESSION_PHOTO_WORKERS,
+            thread_name_prefix='session-photo'
+        )
+
+    def create(self, class_id: str, teacher_id: str) -> AttendanceSession:
+        roster = class_roster_cache.get(class_id)
+        session = AttendanceSession(uuid.uuid4().hex, class_id, teacher_id, roster)
+        with self._lock:
+            self._expire()
+            self._sessions[session.session_id] = session
+        return session
+
+    def get(self, session_id: str, teacher_id: str) -> Optional[AttendanceSession]:
+        """The session, or None if unknown, expired or owned by another teacher"""
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+        if session is None or session.teacher_id != teacher_id:
+            return None
+        return session
+
+    def close(self, session_id: str, teacher_id: str) -> Optional[AttendanceSession]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.teacher_id != teacher_id:
+                return None
+            return self._sessions.pop(session_id)
+
+    def process_photos(self, session: AttendanceSession, images: List[np.ndarray]) -> List[Dict]:
+        """
+        Run the photos concurrently on the shared pool; summaries in upload order
+
+        A photo that fails doesn't fail the others (they are merged into
+        the session either way): its summary carries an 'error' instead.
+        """
+        indices = session.reserve_photos(len(images))
+        futures = [
+            self._pool.submit(session.add_photo, index, image)
+            for index, image in zip(indices, images)
+        ]
+        summaries = []
+        for index, future in zip(indices, futures):
+            try:
+                summaries.append(future.result())
+            except Exception as e:
+                summaries.append({'photo': index, 'error': str(e)})
+        return summaries
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [
+            sid for sid, session in self._sessions.items()
+            if now - session.touched_at > self.ttl_seconds
+        ]
+        for sid in expired:
+            del self._sessions[sid]
+
+
+# Singleton instance
+attendance_sessions = AttendanceSessionStore()
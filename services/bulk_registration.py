@@ -0,0 +1,225 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from services.supabase_client import supabase_client
+from services.profile_cache import profile_cache
+from utils.validators import validate_registration
+from config.settings import Config
+
+STATUS_CREATED = 'created'
+STATUS_INVALID = 'invalid'
+STATUS_FAILED = 'failed'
+
+
+class BulkRegistration:
+    """
+    Register many teachers/students in one request
+
+    Every row is validated (and checked against existing emails and
+    enrollment/employee numbers) before anything is created. Auth users are
+    then created through a bounded thread pool with the admin API, and the
+    user_profiles / students / teachers rows are inserted in chunks instead
+    of one round trip per user. A chunk whose insert fails is undone and
+    retried one user at a time, so only the rows that fail on their own
+    are reported failed; their auth users are deleted again, so no
+    account is left without a profile.
+
+    The email check needs supabase/migrations/20261018030000_registered_emails.sql.
+
+    As with /register, new accounts must confirm their email: each one is
+    sent the signup confirmation mail. BULK_REGISTER_AUTO_CONFIRM marks
+    them confirmed instead, for institutions that own the addresses.
+    """
+
+    def __init__(self, workers: int = None, chunk_size: int = None):
+        self.workers = workers or Config.BULK_REGISTER_WORKERS
+        self.chunk_size = chunk_size or Config.BULK_REGISTER_CHUNK_SIZE
+
+    def register(self, rows: List[Dict]) -> List[Dict]:
+        """Returns one {row, email, status, user_id, error} report per input row"""
+        report = [
+            {'row': i, 'email': row.get('email'), 'status': None, 'user_id': None, 'error': None}
+            for i, row in enumerate(rows)
+        ]
+        records = self._validate(rows, report)
+        valid = [i for i, entry in enumerate(report) if entry['status'] is None]
+
+        # Auth users: one admin call each, but several in flight at once
+        with ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix='register') as pool:
+            for i, outcome in zip(valid, pool.map(self._create_auth_user, [rows[i] for i in valid])):
+                user_id, error = outcome
+                if error:
+                    report[i].update(status=STATUS_FAILED, error=error)
+                else:
+                    report[i]['user_id'] = user_id
+
+        created = [i for i in valid if report[i]['user_id'] is not None]
+        for start in range(0, len(created), self.chunk_size):
+            self._insert_chunk(created[start:start + self.chunk_size], records, report)
+
+        return report
+
+    def _validate(self, rows: List[Dict], report: List[Dict]) -> Dict[int, Dict]:
+        """Mark invalid rows in report; returns normalised records for the rest"""
+        records = {}
+        seen = {}
+        for i, row in enumerate(rows):
+            is_valid, msg = validate_registration(row)
+            if is_valid:
+                try:
+                    records[i] = self._normalise(row)
+                except (TypeError, ValueError):
+                    is_valid, msg = False, "year must be a number"
+            if not is_valid:
+                report[i].update(status=STATUS_INVALID, error=msg)
+                continue
+
+            # Duplicates inside the batch: the first occurrence wins
+            for key in self._unique_keys(records[i]):
+                if key in seen:
+                    report[i].update(status=STATUS_INVALID, error=f"Duplicate {key[0]} (row {seen[key]})")
+                    break
+            else:
+                for key in self._unique_keys(records[i]):
+                    seen[key] = i
+
+        # Duplicates of existing users, looked up in one query per column.
+        # Emails compare case-insensitively on the stored side too
+        existing = set()
+        for column, table in (('email', 'user_profiles'), ('enrollment_number', 'students'), ('employee_id', 'teachers')):
+            values = list({value for (name, value) in seen if name == column})
+            for start in range(0, len(values), self.chunk_size):
+                batch = values[start:start + self.chunk_size]
+                if column == 'email':
+                    response = supabase_client.rpc('registered_emails', {'p_emails': batch}).execute()
+                else:
+                    response = supabase_client.table(table)\
+                        .select(column)\
+                        .in_(column, batch)\
+                        .execute()
+                for r in response.data:
+                    existing.add((column, str(r[column])))
+
+        for key in existing:
+            i = seen.get(key)
+            if i is not None and report[i]['status'] is None:
+                report[i].update(status=STATUS_INVALID, error=f"{key[0]} already registered")
+
+        return records
+
+    @staticmethod
+    def _normalise(row: Dict) -> Dict:
+        record = {
+            'email': row['email'].strip(),
+            'full_name': row['full_name'],
+            'role': row['role'],
+            'department': row.get('department', '')
+        }
+        if row['role'] == 'teacher':
+            record.update(employee_id=str(row['employee_id']), designation=row.get('designation', ''))
+        else:
+            record.update(
+                enrollment_number=str(row['enrollment_number']),
+                year=int(row.get('year', 1)),
+                section=row.get('section', '')
+            )
+        return record
+
+    @staticmethod
+    def _unique_keys(record: Dict) -> List[tuple]:
+        keys = [('email', record['email'].lower())]
+        if record['role'] == 'teacher':
+            keys.append(('employee_id', record['employee_id']))
+        else:
+            keys.append(('enrollment_number', record['enrollment_number']))
+        return keys
+
+    @staticmethod
+    def _create_auth_user(row: Dict) -> tuple:
+        """(user_id, None) or (None, error message)"""
+        email = row['email'].strip()
+        try:
+            response = supabase_client.auth.admin.create_user({
+                'email': email,
+                'password': row['password'],
+                'email_confirm': Config.BULK_REGISTER_AUTO_CONFIRM
+            })
+            if not response.user:
+                return None, 'User registration failed'
+        except Exception as e:
+            return None, str(e)
+
+        if not Config.BULK_REGISTER_AUTO_CONFIRM:
+            # The admin API sends no mail itself; this is the same
+            # confirmation mail sign_up would have sent
+            try:
+                supabase_client.auth.resend({'type': 'signup', 'email': email})
+            except Exception as e:
+                print(f"⚠️ Confirmation email to {email} failed: {e}")
+        return response.user.id, None
+
+    def _insert_chunk(self, indices: List[int], records: Dict[int, Dict], report: List[Dict]):
+        user_ids = [report[i]['user_id'] for i in indices]
+        try:
+            profiles = self._insert_rows([records[i] for i in indices], user_ids)
+        except Exception as e:
+            # Undo whichever inserts landed
+            for table, column in (('students', 'student_id'), ('teachers', 'teacher_id'), ('user_profiles', 'user_id')):
+                try:
+                    supabase_client.table(table).delete().in_(column, user_ids).execute()
+                except Exception:
+                    pass
+            if len(indices) > 1:
+                # Don't let one bad row fail the rest of its chunk
+                print(f"⚠️ Bulk registration chunk of {len(indices)} failed, retrying row by row: {e}")
+                for i in indices:
+                    self._insert_chunk([i], records, report)
+                return
+            i = indices[0]
+            try:
+                supabase_client.auth.admin.delete_user(user_ids[0])
+            except Exception:
+                pass
+            report[i].update(status=STATUS_FAILED, user_id=None, error=str(e))
+            return
+
+        for profile in profiles:
+            profile_cache.put(profile)
+        for i in indices:
+            report[i]['status'] = STATUS_CREATED
+
+    @staticmethod
+    def _insert_rows(records: List[Dict], user_ids: List[str]) -> List[Dict]:
+        """Insert profile + role rows; returns the profiles. Raises on any failed insert"""
+        profiles, teachers, students = [], [], []
+        for record, user_id in zip(records, user_ids):
+            profiles.append({
+                'user_id': user_id,
+                'email': record['email'],
+                'full_name': record['full_name'],
+                'role': record['role'],
+                'department': record['department']
+            })
+            if record['role'] == 'teacher':
+                teachers.append({
+                    'teacher_id': user_id,
+                    'employee_id': record['employee_id'],
+                    'designation': record['designation']
+                })
+            else:
+                students.append({
+                    'student_id': user_id,
+                    'enrollment_number': record['enrollment_number'],
+                    'year': record['year'],
+                    'section': record['section']
+                })
+
+        supabase_client.table('user_profiles').insert(profiles).execute()
+        if teachers:
+            supabase_client.table('teachers').insert(teachers).execute()
+        if students:
+            supabase_client.table('students').insert(students).execute()
+        return profiles
+
+
+# Singleton instance
+bulk_registration = BulkRegistration()
@@ -0,0 +1,126 @@
+import threading
+import time
+from typing import Dict, List, Optional
+from services.supabase_client import supabase_client
+from services.embeddings_loader import embeddings_loader
+from services.profile_cache import profile_cache
+from services.gallery_matcher import ClassGallery
+from config.settings import Config
+
+
+class ClassRoster:
+    """Everything the attendance hot path needs for one class"""
+
+    def __init__(
+        self,
+        class_id: str,
+        student_ids: List[str],
+        name_map: Dict[str, str],
+        embeddings: Dict[str, object],
+        gallery: ClassGallery,
+        generation: int = 0
+    ):
+        self.class_id = class_id
+        self.student_ids = student_ids      # every enrolled student
+        self.name_map = name_map            # student_id -> full_name
+        self.embeddings = embeddings        # student_id -> (K x D) prototypes (only those we have)
+        self.gallery = gallery              # normalized matrix over `embeddings`
+        self.generation = generation        # embeddings database it was built from
+        self.loaded_at = time.monotonic()
+
+    @property
+    def matchable_ids(self) -> List[str]:
+        """
+        Enrolled students with embeddings, in enrollment order
+
+        The students attendance can decide on: the absent list and
+        total_enrolled of every attendance response count these only.
+        """
+        return [sid for sid in self.student_ids if sid in self.embeddings]
+
+
+class ClassRosterCache:
+    """
+    TTL cache of class rosters keyed by class_id
+
+    A miss costs the enrollments query plus at most one bulk .in_() query
+    for profiles not already in profile_cache. Call
+    invalidate() whenever enrollments change.
+    """
+
+    def __init__(self, ttl_seconds: int = None):
+        self.ttl_seconds = Config.ROSTER_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._rosters: Dict[str, ClassRoster] = {}
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, class_id: str) -> ClassRoster:
+        roster = self._fresh(class_id)
+        if roster is not None:
+            return roster
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(class_id, threading.Lock())
+
+        # One build per class at a time; concurrent callers reuse its result
+        with build_lock:
+            roster = self._fresh(class_id)
+            if roster is not None:
+                return roster
+
+            roster = self._build(class_id)
+            # Don't pin an empty roster while the embeddings database is unavailable
+            if embeddings_loader.loaded:
+                with self._lock:
+                    self._rosters[class_id] = roster
+            return roster
+
+    def invalidate(self, class_id: Optional[str] = None):
+        """Drop one class roster, or all of them"""
+        with self._lock:
+            if class_id is None:
+                self._rosters.clear()
+            else:
+                self._rosters.pop(class_id, None)
+
+    def _fresh(self, class_id: str) -> Optional[ClassRoster]:
+        roster = self._rosters.get(class_id)
+        if roster is None:
+            return None
+        if time.monotonic() - roster.loaded_at > self.ttl_seconds:
+            return None
+        # Embeddings database was hot-reloaded since this roster was built
+        if roster.generation != embeddings_loader.generation:
+            return None
+        return roster
+
+    def _build(self, class_id: str) -> ClassRoster:
+        enrollments = supabase_client.table('enrollments')\
+            .select('student_id')\
+            .eq('class_id', class_id)\
+            .execute()
+
+        student_ids = [rec['student_id'] for rec in enrollments.data]
+
+        profiles = profile_cache.get_many(student_ids)
+        name_map = {user_id: p['full_name'] for user_id, p in profiles.items()}
+
+        # Read before selecting: a concurrent reload can only make us rebuild early
+        generation = embeddings_loader.generation
+        found_ids, matrix, offsets = embeddings_loader.select_embeddings(student_ids, name_map)
+
+        return ClassRoster(
+            class_id=class_id,
+            student_ids=student_ids,
+            name_map=name_map,
+            embeddings={
+                sid: matrix[offsets[i]:offsets[i + 1]]
+                for i, sid in enumerate(found_ids)
+            },
+            gallery=ClassGallery.from_matrix(found_ids, matrix, offsets),
+            generation=generation
+        )
+
+
+# Singleton instance
+class_roster_cache = ClassRosterCache()
@@ -0,0 +1,221 @@
+import ast
+import cv2
+import numpy as np
+from typing import List, Tuple
+from config.settings import Config
+
+
+class UltralyticsBackend:
+    """PyTorch YOLO via ultralytics (imports torch)"""
+
+    name = 'ultralytics'
+
+    def __init__(self, model_path: str):
+        from ultralytics import YOLO
+        self.model = YOLO(model_path)
+
+    def predict(self, image: np.ndarray, conf: float) -> np.ndarray:
+        predictions = self.model(image, conf=conf, verbose=False)
+        return predictions[0].boxes.xyxy.cpu().numpy().astype(int)
+
+    def predict_batch(self, images: List[np.ndarray], conf: float) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """One batched forward pass; float (boxes, scores) per image"""
+        predictions = self.model(images, conf=conf, verbose=False)
+        return [
+            (p.boxes.xyxy.cpu().numpy(), p.boxes.conf.cpu().numpy())
+            for p in predictions
+        ]
+
+
+class OnnxRuntimeBackend:
+    """
+    YOLO exported to ONNX, run with onnxruntime
+
+    Does its own letterbox preprocessing, output decoding and NMS in NumPy,
+    so torch is never imported on this path.
+    """
+
+    name = 'onnx'
+
+    def __init__(self, model_path: str, iou_threshold: float = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if Config.ONNX_INTRA_OP_THREADS > 0:
+            options.intra_op_num_threads = Config.ONNX_INTRA_OP_THREADS
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=['CPUExecutionProvider']
+        )
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+
+        # Prefer the exported static shape, fall back to config for dynamic axes
+        _, _, height, width = model_input.shape
+        self.input_height = height if isinstance(height, int) else Config.INPUT_HEIGHT
+        self.input_width = width if isinstance(width, int) else Config.INPUT_WIDTH
+
+        # Exports with a fixed batch of 1 are fed one image per run
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+
+        self.iou_threshold = Config.YOLO_IOU if iou_threshold is None else iou_threshold
+        self.num_classes = self._read_num_classes()
+
+    def _read_num_classes(self) -> int:
+        """
+        Class count from the 'names' metadata ultralytics writes on export
+
+        The head carries 4 box columns, then num_classes scores, then any
+        extra columns (pose keypoints, segmentation mask coefficients), so
+        the count can't be inferred from the output width.
+        """
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        try:
+            return len(ast.literal_eval(metadata['names']))
+        except (KeyError, ValueError, SyntaxError):
+            raise ValueError(
+                "ONNX detector has no 'names' metadata; export it with ultralytics (model.export(format='onnx'))"
+            )
+
+    def predict(self, image: np.ndarray, conf: float) -> np.ndarray:
+        boxes, _ = self.predict_batch([image], conf)[0]
+        return boxes.astype(int)
+
+    def predict_batch(self, images: List[np.ndarray], conf: float) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Float (boxes, scores) per image; one session run when the batch axis is dynamic"""
+        prepared = [self._preprocess(image) for image in images]
+        blobs = [blob for blob, _, _ in prepared]
+
+        if self.dynamic_batch:
+            outputs = self.session.run(None, {self.input_name: np.concatenate(blobs)})[0]
+        else:
+            outputs = [self.session.run(None, {self.input_name: blob})[0][0] for blob in blobs]
+
+        return [
+            self._postprocess(output, conf, ratio, pad, image.shape[:2])
+            for output, (_, ratio, pad), image in zip(outputs, prepared, images)
+        ]
+
+    def _preprocess(self, image: np.ndarray) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+        padded, ratio, pad = letterbox(image, (self.input_height, self.input_width))
+        # BGR -> RGB, HWC -> CHW, [0, 255] -> [0, 1]
+        blob = padded[:, :, ::-1].transpose(2, 0, 1)
+        blob = np.ascontiguousarray(blob, dtype=np.float32)[np.newaxis] / 255.0
+        return blob, ratio, pad
+
+    def _postprocess(
+        self,
+        output: np.ndarray,
+        conf: float,
+        ratio: float,
+        pad: Tuple[float, float],
+        original_shape: Tuple[int, int]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # Raw YOLOv8+ head is (4 + num_classes + extra, num_anchors); make it row-major
+        predictions = output.T if output.shape[0] < output.shape[1] else output
+
+        scores = predictions[:, 4:4 + self.num_classes].max(axis=1)
+        mask = scores > conf
+        if not mask.any():
+            return np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32)
+
+        predictions = predictions[mask]
+        scores = scores[mask]
+
+        boxes = xywh_to_xyxy(predictions[:, :4])
+        keep = nms(boxes, scores, self.iou_threshold)
+        boxes, scores = boxes[keep], scores[keep]
+
+        # Undo letterbox: remove padding, rescale, clip to the original image
+        pad_w, pad_h = pad
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad_w) / ratio
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad_h) / ratio
+
+        height, width = original_shape
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+
+        return boxes, scores
+
+
+def letterbox(
+    image: np.ndarray,
+    new_shape: Tuple[int, int],
+    color: Tuple[int, int, int] = (114, 114, 114)
+) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """
+    Resize keeping aspect ratio and pad to new_shape (height, width),
+    the same way ultralytics' LetterBox does
+
+    Returns:
+        (padded_image, ratio, (pad_w, pad_h))
+    """
+    height, width = image.shape[:2]
+    new_h, new_w = new_shape
+
+    ratio = min(new_h / height, new_w / width)
+    unpad_w = int(round(width * ratio))
+    unpad_h = int(round(height * ratio))
+
+    dw = (new_w - unpad_w) / 2
+    dh = (new_h - unpad_h) / 2
+
+    if (width, height) != (unpad_w, unpad_h):
+        image = cv2.resize(image, (unpad_w, unpad_h), interpolation=cv2.INTER_LINEAR)
+
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    padded = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+
+    return padded, ratio, (left, top)
+
+
+def xywh_to_xyxy(boxes: np.ndarray) -> np.ndarray:
+    """[cx, cy, w, h] -> [x1, y1, x2, y2]"""
+    out = np.empty_like(boxes, dtype=np.float32)
+    half_w = boxes[:, 2] / 2
+    half_h = boxes[:, 3] / 2
+    out[:, 0] = boxes[:, 0] - half_w
+    out[:, 1] = boxes[:, 1] - half_h
+    out[:, 2] = boxes[:, 0] + half_w
+    out[:, 3] = boxes[:, 1] + half_h
+    return out
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Greedy non-maximum suppression; returns kept indices by descending score"""
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = np.maximum(0, x2 - x1) * np.maximum(0, y2 - y1)
+    order = scores.argsort()[::-1]
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+
+        xx1 = np.maximum(x1[i], x1[order[1:]])
+        yy1 = np.maximum(y1[i], y1[order[1:]])
+        xx2 = np.minimum(x2[i], x2[order[1:]])
+        yy2 = np.minimum(y2[i], y2[order[1:]])
+
+        inter = np.maximum(0, xx2 - xx1) * np.maximum(0, yy2 - yy1)
+        iou = inter / (areas[i] + areas[order[1:]] - inter + 1e-9)
+
+        order = order[1:][iou <= iou_threshold]
+
+    return np.array(keep, dtype=int)
+
+
+def create_detector_backend(engine: str = None):
+    """Build the detector backend selected by Config.DETECTOR_ENGINE"""
+    engine = (engine or Config.DETECTOR_ENGINE).lower()
+
+    if engine == 'onnx':
+        return OnnxRuntimeBackend(Config.YOLO_MODEL_ONNX_PATH)
+    if engine == 'ultralytics':
+        return UltralyticsBackend(Config.YOLO_MODEL_PATH)
+
+    raise ValueError(f"Unknown detector engine: {engine} (expected 'ultralytics' or 'onnx')")
@@ -0,0 +1,132 @@
+"""
+Versioned binary embeddings file, opened with np.memmap
+
+Layout (little-endian):
+    [0, 64)           header: magic, version, key type, student count, dim,
+                      matrix offset, ids offset, ids length
+                      (v2 adds: offsets offset, row count)
+    [matrix_offset)   float32 matrix, rows x dim, row-major, 64-byte aligned
+    [offsets_offset)  v2 only: int64 (count + 1) row offsets; student i owns
+                      rows [offsets[i], offsets[i + 1])
+    [ids_offset)      UTF-8 JSON array with one key per student
+
+v1 files (one row per student) are still readable.
+
+Unlike pickle, opening the file executes nothing, and every worker that
+maps the same file shares the same physical pages.
+"""
+import json
+import os
+import struct
+import numpy as np
+from typing import List, Optional
+from services.embedding_store import EmbeddingStore, KEY_STUDENT_ID, KEY_FULL_NAME
+
+MAGIC = b'ATTEMB\x00\x00'
+VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+HEADER_V1 = struct.Struct('<8sIIIIQQQ')
+HEADER_V2 = struct.Struct('<8sIIIIQQQQQ')
+HEADER_SIZE = 64
+ALIGNMENT = 64
+
+KEY_TYPE_CODES = {KEY_STUDENT_ID: 0, KEY_FULL_NAME: 1}
+KEY_TYPE_NAMES = {code: name for name, code in KEY_TYPE_CODES.items()}
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_embeddings_file(
+    path: str,
+    keys: List[str],
+    matrix: np.ndarray,
+    key_type: str = KEY_STUDENT_ID,
+    offsets: Optional[np.ndarray] = None
+):
+    """Write keys + (rows x D) matrix + row offsets atomically (temp file + rename)"""
+    matrix = np.ascontiguousarray(matrix, dtype='<f4')
+    offsets = np.arange(len(keys) + 1) if offsets is None else offsets
+    offsets = np.ascontiguousarray(offsets, dtype='<i8')
+
+    if matrix.ndim != 2 or len(offsets) != len(keys) + 1 or offsets[-1] != matrix.shape[0]:
+        raise ValueError(f"Matrix shape {matrix.shape} / offsets do not match {len(keys)} keys")
+
+    rows, dim = matrix.shape
+    ids_blob = json.dumps(list(keys), ensure_ascii=False).encode('utf-8')
+
+    matrix_offset = _align(HEADER_SIZE)
+    offsets_offset = _align(matrix_offset + matrix.nbytes)
+    ids_offset = offsets_offset + offsets.nbytes
+
+    header = HEADER_V2.pack(
+        MAGIC, VERSION, KEY_TYPE_CODES[key_type], len(keys), dim,
+        matrix_offset, ids_offset, len(ids_blob), offsets_offset, rows
+    )
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(header.ljust(matrix_offset, b'\x00'))
+        f.write(matrix.tobytes())
+        f.write(b'\x00' * (offsets_offset - matrix_offset - matrix.nbytes))
+        f.write(offsets.tobytes())
+        f.write(ids_blob)
+    os.replace(tmp_path, path)
+
+
+def open_embeddings_file(path: str) -> EmbeddingStore:
+    """Map an embeddings file read-only; the matrix is never copied into the heap"""
+    file_size = os.path.getsize(path)
+
+    with open(path, 'rb') as f:
+        raw_header = f.read(HEADER_V2.size)
+        if len(raw_header) < HEADER_V1.size:
+            raise ValueError(f"{path}: truncated header")
+
+        magic, version = raw_header[:8], struct.unpack_from('<I', raw_header, 8)[0]
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not an embeddings file")
+        if version not in SUPPORTED_VERSIONS:
+            raise ValueError(f"{path}: unsupported embeddings format version {version}")
+
+        if version == 1:
+            _, _, key_code, count, dim, matrix_offset, ids_offset, ids_length = HEADER_V1.unpack(raw_header[:HEADER_V1.size])
+            offsets_offset, rows = None, count
+        else:
+            (_, _, key_code, count, dim, matrix_offset, ids_offset, ids_length,
+             offsets_offset, rows) = HEADER_V2.unpack(raw_header)
+
+        if key_code not in KEY_TYPE_NAMES:
+            raise ValueError(f"{path}: unknown key type {key_code}")
+        if ids_offset + ids_length > file_size or matrix_offset + rows * dim * 4 > (offsets_offset or ids_offset):
+            raise ValueError(f"{path}: truncated or corrupt file")
+
+        if offsets_offset is None:
+            offsets = np.arange(count + 1, dtype=np.int64)
+        else:
+            f.seek(offsets_offset)
+            offsets = np.frombuffer(f.read((count + 1) * 8), dtype='<i8').astype(np.int64)
+            if len(offsets) != count + 1 or offsets[-1] != rows or np.any(np.diff(offsets) <= 0):
+                raise ValueError(f"{path}: corrupt row offsets")
+
+        f.seek(ids_offset)
+        keys = json.loads(f.read(ids_length).decode('utf-8'))
+
+    if len(keys) != count:
+        raise ValueError(f"{path}: {len(keys)} ids for {count} students")
+
+    if rows == 0:
+        matrix = np.empty((0, dim), dtype=np.float32)
+    else:
+        matrix = np.memmap(path, dtype='<f4', mode='r', offset=matrix_offset, shape=(rows, dim))
+
+    return EmbeddingStore(keys, matrix, KEY_TYPE_NAMES[key_code], offsets)
+
+
+def is_embeddings_file(path: str) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
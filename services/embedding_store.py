@@ -0,0 +1,250 @@
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+from services.gallery_matcher import EMBEDDING_DIM, compact_prototypes
+
+# Pickle layouts understood by EmbeddingStore.from_pickle_data
+KEY_STUDENT_ID = 'student_id'
+KEY_FULL_NAME = 'full_name'
+
+
+class EmbeddingStore:
+    """
+    Indexed in-memory embedding database
+
+    One contiguous float32 (M x D) matrix plus a key -> student index. Each
+    student owns K >= 1 contiguous rows: matrix[offsets[i]:offsets[i + 1]].
+    Keys are student_ids for migrated databases, or full_names for legacy
+    pickles.
+    """
+
+    def __init__(
+        self,
+        keys: List[str],
+        matrix: np.ndarray,
+        key_type: str = KEY_STUDENT_ID,
+        offsets: Optional[np.ndarray] = None
+    ):
+        self.keys = keys
+        self.matrix = matrix
+        self.key_type = key_type
+        self.offsets = np.arange(len(keys) + 1, dtype=np.int64) if offsets is None else np.asarray(offsets, dtype=np.int64)
+        self.index: Dict[str, int] = {key: i for i, key in enumerate(keys)}
+
+    @classmethod
+    def from_dict(cls, embeddings: Dict, key_type: str, dim: int = EMBEDDING_DIM) -> 'EmbeddingStore':
+        """
+        Build from {key: embedding or [embedding, ...]}, skipping entries
+        with the wrong size
+        """
+        keys = []
+        blocks = []
+
+        for key, embedding in embeddings.items():
+            block = np.asarray(embedding, dtype=np.float32)
+            if block.ndim == 1:
+                block = block[np.newaxis, :]
+            if block.ndim != 2 or block.shape[1] != dim or block.shape[0] == 0:
+                print(f"⚠️ Invalid embedding size for {key} {block.shape}, skipping")
+                continue
+            keys.append(key)
+            blocks.append(block)
+
+        offsets = np.zeros(len(blocks) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(b) for b in blocks])
+
+        matrix = np.empty((int(offsets[-1]), dim), dtype=np.float32)
+        for i, block in enumerate(blocks):
+            matrix[offsets[i]:offsets[i + 1]] = block
+
+        return cls(keys, matrix, key_type, offsets)
+
+    @classmethod
+    def from_pickle_data(cls, data: Dict) -> 'EmbeddingStore':
+        """
+        Accept either pickle layout:
+            migrated: {'key_type': 'student_id', 'embeddings': {student_id: [...]}}
+            legacy:   {full_name: [...]}
+        Values may be one embedding or a list of embeddings per student.
+        """
+        if isinstance(data.get('embeddings'), dict) and 'key_type' in data:
+            return cls.from_dict(data['embeddings'], data['key_type'])
+        return cls.from_dict(data, KEY_FULL_NAME)
+
+    @classmethod
+    def merged(cls, stores: Sequence['EmbeddingStore']) -> 'EmbeddingStore':
+        """
+        Union of several stores with the same key type; a key found in
+        several keeps all of its rows, earlier stores first
+        """
+        blocks: Dict[str, List[np.ndarray]] = {}
+        for store in stores:
+            for i, key in enumerate(store.keys):
+                blocks.setdefault(key, []).append(store.matrix[store.offsets[i]:store.offsets[i + 1]])
+
+        return cls.from_dict(
+            {key: np.concatenate(parts) if len(parts) > 1 else parts[0] for key, parts in blocks.items()},
+            stores[0].key_type,
+            stores[0].matrix.shape[1]
+        )
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    @property
+    def max_prototypes(self) -> int:
+        return int(np.diff(self.offsets).max()) if len(self.keys) else 0
+
+    def compacted(self, max_prototypes: int) -> 'EmbeddingStore':
+        """Copy with every student clustered down to at most max_prototypes rows"""
+        if max_prototypes <= 0 or self.max_prototypes <= max_prototypes:
+            return self
+
+        return EmbeddingStore.from_dict(
+            {
+                key: compact_prototypes(self.matrix[self.offsets[i]:self.offsets[i + 1]], max_prototypes)
+                for i, key in enumerate(self.keys)
+            },
+            self.key_type,
+            self.matrix.shape[1]
+        )
+
+    def student_indices(self, keys: Sequence) -> np.ndarray:
+        """Student index per key, -1 where the key is unknown"""
+        return np.fromiter(
+            (self.index.get(key, -1) if key is not None else -1 for key in keys),
+            dtype=np.intp,
+            count=len(keys)
+        )
+
+    def subset(self, keys: Sequence) -> Tuple[List, np.ndarray, np.ndarray]:
+        """
+        Rows for the given keys via one fancy-index (no copies per key)
+
+        Returns:
+            (positions, matrix, offsets): positions into `keys` that were
+            found, their rows stacked in the same order, and per-student
+            row offsets into that matrix
+        """
+        students = self.student_indices(keys)
+        found = np.flatnonzero(students >= 0)
+        students = students[found]
+
+        starts = self.offsets[students]
+        counts = self.offsets[students + 1] - starts
+
+        offsets = np.zeros(len(students) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(counts)
+
+        # Expand each student's [start, start + count) range into row indices
+        rows = np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1])
+
+        return found.tolist(), self.matrix[rows], offsets
+
+
+class LayeredEmbeddingStore:
+    """
+    A (memory-mapped) base store with a small delta store on top
+
+    The delta holds every row of the students enrolled since the base was
+    written (their base rows plus the new ones) and of students capped to
+    fewer prototypes; a key found in the delta shadows the base. Lookups
+    read both layers without copying the base, so its pages stay shared
+    between workers. matrix/offsets, needed only to build the
+    institution-wide index, are flattened into one store on first use.
+    """
+
+    def __init__(self, base: EmbeddingStore, delta: EmbeddingStore):
+        self.base = base
+        self.delta = delta
+        self.key_type = base.key_type
+        added = [key for key in delta.keys if key not in base.index]
+        self.keys = base.keys + added
+        self._added_index = {key: len(base.keys) + i for i, key in enumerate(added)}
+        self._flat: Optional[EmbeddingStore] = None
+
+    @classmethod
+    def build(
+        cls,
+        base: EmbeddingStore,
+        segments: Sequence[EmbeddingStore] = (),
+        max_prototypes: int = 0,
+        capped: Optional[EmbeddingStore] = None
+    ):
+        """
+        Layer delta segments over base, capping students to max_prototypes
+
+        Only the students the segments touch, or that have more than
+        max_prototypes base rows, are copied. capped is an earlier build's
+        delta over the same base, reused for students the segments don't
+        touch so they are not clustered again. Returns base itself when
+        there is nothing to layer.
+        """
+        added = EmbeddingStore.merged(segments) if segments else None
+        touched = set(added.keys) if added is not None else set()
+
+        if capped is not None:
+            over = [key for key in capped.keys if key not in touched]
+            _, matrix, offsets = capped.subset(over)
+            kept = EmbeddingStore(over, matrix, base.key_type, offsets)
+            over = []
+        else:
+            counts = np.diff(base.offsets)
+            over = [base.keys[i] for i in np.flatnonzero(counts > max_prototypes)] if max_prototypes > 0 else []
+            kept = None
+
+        wanted = (added.keys if added is not None else []) + [key for key in over if key not in touched]
+        if not wanted and not (kept is not None and len(kept)):
+            return base
+
+        positions, matrix, offsets = base.subset(wanted)
+        raw = EmbeddingStore([wanted[p] for p in positions], matrix, base.key_type, offsets)
+        if added is not None:
+            raw = EmbeddingStore.merged([raw, added])
+        delta = raw.compacted(max_prototypes)
+        if kept is not None and len(kept):
+            delta = EmbeddingStore.merged([kept, delta])
+        return cls(base, delta)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.base.index or key in self._added_index
+
+    def subset(self, keys: Sequence) -> Tuple[List, np.ndarray, np.ndarray]:
+        """Same contract as EmbeddingStore.subset, reading each key from the layer that owns it"""
+        in_delta = [key is not None and key in self.delta.index for key in keys]
+        base_positions, base_matrix, base_offsets = self.base.subset(
+            [None if d else key for key, d in zip(keys, in_delta)]
+        )
+        if not any(in_delta):
+            return base_positions, base_matrix, base_offsets
+
+        delta_positions, delta_matrix, delta_offsets = self.delta.subset(
+            [key if d else None for key, d in zip(keys, in_delta)]
+        )
+        blocks = {p: base_matrix[base_offsets[i]:base_offsets[i + 1]] for i, p in enumerate(base_positions)}
+        blocks.update({p: delta_matrix[delta_offsets[i]:delta_offsets[i + 1]] for i, p in enumerate(delta_positions)})
+
+        positions = sorted(blocks)
+        offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(blocks[p]) for p in positions])
+        matrix = np.concatenate([blocks[p] for p in positions]) if positions else base_matrix[:0]
+        return positions, matrix, offsets
+
+    def _flatten(self) -> EmbeddingStore:
+        if self._flat is None:
+            _, matrix, offsets = self.subset(self.keys)
+            self._flat = EmbeddingStore(self.keys, matrix, self.key_type, offsets)
+        return self._flat
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._flatten().matrix
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self._flatten().offsets
@@ -1,85 +1,565 @@
+import fcntl
+import hashlib
 import pickle
-import tempfile
 import os
+import re
+import threading
+import time
+import uuid
+import httpx
 import numpy as np
-from typing import Dict, List
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
 from services.supabase_client import supabase_client
+from services.embedding_store import EmbeddingStore, LayeredEmbeddingStore, KEY_STUDENT_ID, KEY_FULL_NAME
+from services.embedding_format import open_embeddings_file, is_embeddings_file, write_embeddings_file
 from config.settings import Config
 
+# Storage list() page size, and the segment count that suggests compaction is stalled
+SEGMENT_PAGE_SIZE = 1000
+SEGMENT_BACKLOG_WARNING = 1000
+# Bucket object that makes compaction single-instance; older ones are abandoned
+COMPACT_LOCK_NAME = 'compact.lock'
+COMPACT_LOCK_STALE_SECONDS = 900
+
 class EmbeddingsLoader:
     def __init__(self):
         self.embeddings_cache = None
         self.loaded = False
+        self.version = None      # base eTag (+ digest of delta segment names) of the loaded database
+        self.generation = 0      # bumped on every swap; dependent caches compare it
+        self.segments: List[str] = []   # delta segments merged into the loaded database
+        # Base database reused across delta-only reloads (never re-downloaded),
+        # and its MAX_PROTOTYPES_PER_STUDENT-capped serving view
+        self._base_store: EmbeddingStore = None
+        self._base_serving: EmbeddingStore = None
+        self._base_version = None
+        self._lock = threading.Lock()
+        self._refresher: threading.Thread = None
+        self._compactor: threading.Thread = None
+        self._metrics = {
+            'last_reload_at': None,
+            'last_reload_duration_ms': None,
+            'last_check_at': None,
+            'last_error': None,
+            'reload_count': 0
+        }
 
-    def load_embeddings_database(self) -> Dict[str, List]:
+    def load_embeddings_database(self) -> EmbeddingStore:
+        # Callers keep the returned store as their snapshot; reloads swap
+        # the reference and never mutate a store in place
         if self.embeddings_cache is not None:
             return self.embeddings_cache
 
+        # Concurrent first requests wait for a single download
+        with self._lock:
+            if self.embeddings_cache is not None:
+                return self.embeddings_cache
+            return self._download_embeddings()
+
+    def _download_embeddings(self) -> EmbeddingStore:
         try:
-            print(f"📥 Downloading {Config.EMBEDDINGS_FILE} from Supabase Storage...")
+            self._swap_in(*self._remote_state())
+            return self.embeddings_cache
+
+        except Exception as e:
+            self._metrics['last_error'] = str(e)
+            print(f"❌ Error loading embeddings: {e}")
+            return EmbeddingStore([], np.empty((0, 128), dtype=np.float32))
 
-            data = supabase_client.storage.from_(Config.EMBEDDINGS_BUCKET)\
-                .download(Config.EMBEDDINGS_FILE)
+    def refresh(self) -> bool:
+        """Reload if the bucket object changed; returns True when a new database was swapped in"""
+        self._metrics['last_check_at'] = datetime.now(timezone.utc).isoformat()
 
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pickle') as tmp:
-                tmp.write(data)
-                tmp_path = tmp.name
+        version, base_version, segments = self._remote_state()
+        if version is None or version == self.version:
+            return False
 
-            with open(tmp_path, 'rb') as f:
-                raw_dict = pickle.load(f)
+        with self._lock:
+            if version == self.version:
+                return False
+            print(f"🔄 Embeddings changed in bucket ({self.version} → {version}), reloading...")
+            self._swap_in(version, base_version, segments)
+        return True
 
-            os.remove(tmp_path)
+    def _swap_in(self, version: str, base_version: str = None, segments: List[str] = None):
+        """Build the new store off to the side, then publish it with one reference swap"""
+        start = time.perf_counter()
+        base_version = version if base_version is None else base_version
+        segments = segments or []
 
-            # Convert list → numpy array
-            self.embeddings_cache = {
-                name: np.array(emb, dtype=np.float32).flatten()
-                for name, emb in raw_dict.items()
-            }
+        if self._base_store is not None and base_version is not None and base_version == self._base_version:
+            base, serving = self._base_store, self._base_serving
+        else:
+            if Config.EMBEDDINGS_FILE.endswith('.emb'):
+                base = self._load_binary(base_version)
+            else:
+                base = self._load_pickle()
+            # Bound memory and match time when students carry many photos:
+            # only those students are clustered, into a small layer over the
+            # base (_base_store keeps every row for compaction)
+            serving = LayeredEmbeddingStore.build(base, max_prototypes=Config.MAX_PROTOTYPES_PER_STUDENT)
+            if serving is not base:
+                print(f"🧩 Capped {len(serving.delta)} students to {Config.MAX_PROTOTYPES_PER_STUDENT} prototypes")
+        self._base_store, self._base_serving, self._base_version = base, serving, base_version
 
-            print(f"✅ Loaded embeddings for {len(self.embeddings_cache)} students")
-            self.loaded = True
-            return self.embeddings_cache
+        if base.key_type == KEY_FULL_NAME:
+            print("⚠️ Embeddings are keyed by full_name; run models/fix_pickle_format.py --by-student-id")
+            if segments:
+                print(f"⚠️ Ignoring {len(segments)} enrollment segments (they are keyed by student_id)")
+                segments = []
+
+        store = serving
+        if segments:
+            # Only the enrolled students are copied: their raw base rows plus
+            # the segments' rows, capped like the base. The base stays mapped.
+            store = LayeredEmbeddingStore.build(
+                base,
+                [self._load_segment(name) for name in segments],
+                Config.MAX_PROTOTYPES_PER_STUDENT,
+                capped=serving.delta if serving is not base else None
+            )
 
+        previous = self.segments
+        self.embeddings_cache = store
+        self.version = version
+        self.segments = segments
+        self.generation += 1
+        self.loaded = True
+
+        self._metrics.update({
+            'last_reload_at': datetime.now(timezone.utc).isoformat(),
+            'last_reload_duration_ms': round((time.perf_counter() - start) * 1000, 1),
+            'last_error': None,
+            'reload_count': self._metrics['reload_count'] + 1
+        })
+        if store is not base:
+            rows = f"{base.matrix.shape[0]} base + {store.delta.matrix.shape[0]} delta"
+        else:
+            rows = base.matrix.shape[0]
+        print(f"✅ Loaded embeddings for {len(store)} students ({rows} prototypes, {len(segments)} delta segments)")
+
+        # Segments that left the listing were folded into the base
+        self._prune_local_segments(set(previous) - set(segments))
+
+    def _remote_state(self) -> Tuple[str, str, List[str]]:
+        """
+        (version, base eTag, delta segment names) as currently in the bucket
+
+        version is None when the bucket can't be checked; it changes
+        whenever the base object or the set of segments does.
+        """
+        base_version = self._remote_version()
+        segments = self._list_segments()
+        if base_version is None or segments is None:
+            return None, base_version, segments or []
+        return self._version_of(base_version, segments), base_version, segments
+
+    @staticmethod
+    def _version_of(base_version: str, segments: List[str]) -> str:
+        if not segments:
+            return base_version
+        digest = hashlib.sha1('\n'.join(segments).encode('utf-8')).hexdigest()[:12]
+        return f"{base_version}+{digest}"
+
+    def _remote_version(self):
+        """eTag (or last update time) of the embeddings object, None if unavailable"""
+        folder, name = os.path.split(Config.EMBEDDINGS_FILE)
+        try:
+            entries = supabase_client.storage.from_(Config.EMBEDDINGS_BUCKET)\
+                .list(folder, {'search': name, 'limit': 100})
         except Exception as e:
-            print(f"❌ Error loading embeddings: {e}")
-            return {}
+            print(f"⚠️ Could not check embeddings version: {e}")
+            return None
 
-    def get_embeddings_for_class(self, class_id: str) -> Dict:
-        all_embeddings = self.load_embeddings_database()
+        for entry in entries or []:
+            if entry.get('name') == name:
+                metadata = entry.get('metadata') or {}
+                return (metadata.get('eTag') or entry.get('updated_at') or '').strip('"') or None
+        return None
 
-        # Get enrolled students
-        enrollments = supabase_client.table("enrollments")\
-            .select("student_id")\
-            .eq("class_id", class_id)\
-            .execute()
+    def _list_segments(self):
+        """
+        Sorted delta segment names (oldest first), None if the listing failed
 
-        student_ids = [rec["student_id"] for rec in enrollments.data]
+        Pages through the folder until it is exhausted. A listing that
+        fails part way is reported as failed rather than served truncated,
+        which would silently drop the newest enrollments.
+        """
+        bucket = supabase_client.storage.from_(Config.EMBEDDINGS_BUCKET)
+        names = []
+        offset = 0
+        while True:
+            try:
+                entries = bucket.list(Config.EMBEDDINGS_DELTA_PREFIX, {
+                    'limit': SEGMENT_PAGE_SIZE,
+                    'offset': offset,
+                    'sortBy': {'column': 'name', 'order': 'asc'}
+                }) or []
+            except Exception as e:
+                if offset:
+                    print(f"⚠️ Segment listing truncated after {offset} entries, keeping the loaded database: {e}")
+                else:
+                    print(f"⚠️ Could not list embedding segments: {e}")
+                return None
+
+            names.extend(entry['name'] for entry in entries if entry.get('name', '').endswith('.emb'))
+            if len(entries) < SEGMENT_PAGE_SIZE:
+                break
+            offset += len(entries)
+
+        if len(names) > SEGMENT_BACKLOG_WARNING:
+            print(f"⚠️ {len(names)} embedding segments pending; is the compactor running (EMBEDDINGS_COMPACT_SECONDS)?")
+        return sorted(names)
 
-        result = {}
+    @contextmanager
+    def _cache_lock(self, exclusive: bool = False, blocking: bool = True):
+        """
+        flock on EMBEDDINGS_CACHE_DIR shared by every worker on the host
 
-        for student_id in student_ids:
+        Loads hold it shared from the existence check until the file is
+        mapped (a mapping survives unlink); pruning holds it exclusively.
+        Yields False when a non-blocking exclusive lock is busy.
+        """
+        os.makedirs(Config.EMBEDDINGS_CACHE_DIR, exist_ok=True)
+        with open(os.path.join(Config.EMBEDDINGS_CACHE_DIR, '.lock'), 'a') as lock_file:
+            mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
             try:
-                res = supabase_client.table("user_profiles")\
-                    .select("full_name")\
-                    .eq("user_id", student_id)\
-                    .single().execute()
+                fcntl.flock(lock_file, mode if blocking else mode | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
 
-                name = res.data["full_name"]
+    def _load_segment(self, name: str) -> EmbeddingStore:
+        """Segments are immutable, so each is downloaded once per host and cached by name"""
+        directory = os.path.join(Config.EMBEDDINGS_CACHE_DIR, 'segments')
+        local_path = os.path.join(directory, name)
 
-                if name in all_embeddings:
-                    emb = all_embeddings[name]
+        with self._cache_lock():
+            if not is_embeddings_file(local_path):
+                os.makedirs(directory, exist_ok=True)
+                self._download_to_file(f"{Config.EMBEDDINGS_DELTA_PREFIX}/{name}", local_path)
+            return open_embeddings_file(local_path)
 
-                    if emb.shape[0] != 128:
-                        print(f"⚠️ Invalid embedding size for {name}, skipping")
-                        continue
+    def _prune_local_segments(self, names):
+        """
+        Delete local copies of segments that were compacted away
 
-                    result[student_id] = emb
-                else:
-                    print(f"⚠️ No embedding for {name}")
+        Only segments this worker saw leave the listing, never ones it
+        hasn't listed yet (another worker may have just fetched those).
+        Done under the exclusive cache lock, so no worker is between
+        finding a file and mapping it; a busy lock skips pruning, and a
+        worker that later needs a deleted segment downloads it again.
+        """
+        if not names:
+            return
+        directory = os.path.join(Config.EMBEDDINGS_CACHE_DIR, 'segments')
+        with self._cache_lock(exclusive=True, blocking=False) as locked:
+            if not locked:
+                return
+            for name in names:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
+    def publish_segment(self, embeddings: Dict[str, np.ndarray]) -> str:
+        """
+        Upload {student_id: (K x D) embeddings} as a new delta segment
+
+        The base database is never rewritten; every worker picks the
+        segment up on its next refresh. Returns the segment name.
+        """
+        store = EmbeddingStore.from_dict(embeddings, KEY_STUDENT_ID)
+        if len(store) == 0:
+            raise ValueError("No valid embeddings to publish")
 
+        # Timestamp prefix keeps segments in creation order when listed by name
+        name = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}.emb"
+        directory = os.path.join(Config.EMBEDDINGS_CACHE_DIR, 'segments')
+        local_path = os.path.join(directory, name)
+        with self._cache_lock():
+            os.makedirs(directory, exist_ok=True)
+            write_embeddings_file(local_path, store.keys, store.matrix, KEY_STUDENT_ID, store.offsets)
+
+        with open(local_path, 'rb') as f:
+            supabase_client.storage.from_(Config.EMBEDDINGS_BUCKET).upload(
+                f"{Config.EMBEDDINGS_DELTA_PREFIX}/{name}",
+                f.read(),
+                file_options={'content-type': 'application/octet-stream'}
+            )
+
+        print(f"📤 Published embedding segment {name} ({len(store)} students, {store.matrix.shape[0]} rows)")
+        return name
+
+    def apply_segment(self, name: str):
+        """
+        Serve a segment this worker just published, without re-listing the bucket
+
+        Only the delta layer is rebuilt. Other workers (and segments
+        published elsewhere meanwhile) are picked up by the next refresh.
+        """
+        with self._lock:
+            if self._base_store is None or name in self.segments:
+                return
+            segments = sorted(self.segments + [name])
+            self._swap_in(self._version_of(self._base_version, segments), self._base_version, segments)
+
+    def compact_segments(self, min_segments: int = None) -> bool:
+        """
+        Fold the loaded delta segments into a new base object, then delete them
+
+        Safe to run on every instance: a lock object in the bucket lets one
+        compactor at a time through, and it gives up if the base changed
+        since it was loaded. Segments published meanwhile are untouched.
+        Until the deletes land, other workers may briefly see a student's
+        new photos twice, which only duplicates prototypes and does not
+        change matching.
+        """
+        min_segments = Config.EMBEDDINGS_COMPACT_MIN_SEGMENTS if min_segments is None else min_segments
+        with self._lock:
+            base, base_version, segments = self._base_store, self._base_version, list(self.segments)
+        if base is None or len(segments) < max(1, min_segments):
+            return False
+
+        bucket = supabase_client.storage.from_(Config.EMBEDDINGS_BUCKET)
+        lock_name = f"{Config.EMBEDDINGS_DELTA_PREFIX}/{COMPACT_LOCK_NAME}"
+        if not self._acquire_compact_lock(bucket, lock_name):
+            return False
+        try:
+            if self._remote_version() != base_version:
+                print("🗜️ Base embeddings changed since load (compacted elsewhere?), skipping this round")
+                return False
+            self._compact_into_base(bucket, base, segments)
+        finally:
+            try:
+                bucket.remove([lock_name])
             except Exception as e:
-                print(f"⚠️ Error handling {student_id}: {e}")
+                print(f"⚠️ Could not release {lock_name}: {e}")
 
-        return result
+        self.refresh()
+        return True
+
+    def _acquire_compact_lock(self, bucket, lock_name: str) -> bool:
+        """Create the lock object (uploads without upsert fail if it exists)"""
+        payload = f"{os.uname().nodename}:{os.getpid()}".encode('utf-8')
+        for attempt in range(2):
+            try:
+                bucket.upload(lock_name, payload, file_options={'content-type': 'text/plain'})
+                return True
+            except Exception:
+                if attempt or not self._compact_lock_is_stale(bucket):
+                    return False
+                print(f"⚠️ Breaking stale {lock_name}")
+                bucket.remove([lock_name])
+        return False
+
+    def _compact_lock_is_stale(self, bucket) -> bool:
+        try:
+            entries = bucket.list(Config.EMBEDDINGS_DELTA_PREFIX, {'search': COMPACT_LOCK_NAME, 'limit': 10})
+        except Exception:
+            return False
+        for entry in entries or []:
+            if entry.get('name') == COMPACT_LOCK_NAME and entry.get('created_at'):
+                created = datetime.fromisoformat(entry['created_at'].replace('Z', '+00:00'))
+                return (datetime.now(timezone.utc) - created).total_seconds() > COMPACT_LOCK_STALE_SECONDS
+        return False
+
+    def _compact_into_base(self, bucket, base: EmbeddingStore, segments: List[str]):
+        # From the raw rows, not the serving copy: that one may be capped to
+        # MAX_PROTOTYPES_PER_STUDENT centroids, which must never become the base
+        store = EmbeddingStore.merged([base] + [self._load_segment(name) for name in segments])
+
+        print(f"🗜️ Compacting {len(segments)} embedding segments into {Config.EMBEDDINGS_FILE}...")
+        if Config.EMBEDDINGS_FILE.endswith('.emb'):
+            os.makedirs(Config.EMBEDDINGS_CACHE_DIR, exist_ok=True)
+            tmp_path = os.path.join(Config.EMBEDDINGS_CACHE_DIR, f"compact-{os.getpid()}.tmp")
+            write_embeddings_file(tmp_path, store.keys, store.matrix, store.key_type, store.offsets)
+            with open(tmp_path, 'rb') as f:
+                payload = f.read()
+            os.remove(tmp_path)
+        else:
+            # Same layout as models/fix_pickle_format.py --by-student-id
+            payload = pickle.dumps({
+                'key_type': store.key_type,
+                'embeddings': {
+                    key: np.array(store.matrix[store.offsets[i]:store.offsets[i + 1]])
+                    for i, key in enumerate(store.keys)
+                }
+            })
+
+        bucket.upload(
+            Config.EMBEDDINGS_FILE,
+            payload,
+            file_options={'content-type': 'application/octet-stream', 'upsert': 'true'}
+        )
+        bucket.remove([f"{Config.EMBEDDINGS_DELTA_PREFIX}/{name}" for name in segments])
+        print(f"✅ Compacted {len(segments)} segments ({len(store)} students)")
+
+    def start_compactor(self, interval_seconds: int = None):
+        """Periodically fold delta segments into the base once EMBEDDINGS_COMPACT_MIN_SEGMENTS pile up"""
+        interval = Config.EMBEDDINGS_COMPACT_SECONDS if interval_seconds is None else interval_seconds
+        if interval <= 0 or (self._compactor is not None and self._compactor.is_alive()):
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                    self.compact_segments()
+                except Exception as e:
+                    self._metrics['last_error'] = str(e)
+                    print(f"⚠️ Embeddings compaction failed: {e}")
+
+        self._compactor = threading.Thread(target=run, name='embeddings-compactor', daemon=True)
+        self._compactor.start()
+        print(f"🗜️ Embeddings compactor running every {interval}s")
+
+    def start_refresher(self, interval_seconds: int = None):
+        """Poll the bucket in a daemon thread and hot-swap the database when it changes"""
+        interval = Config.EMBEDDINGS_REFRESH_SECONDS if interval_seconds is None else interval_seconds
+        if interval <= 0 or (self._refresher is not None and self._refresher.is_alive()):
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    self._metrics['last_error'] = str(e)
+                    print(f"⚠️ Embeddings refresh failed: {e}")
+
+        self._refresher = threading.Thread(target=run, name='embeddings-refresher', daemon=True)
+        self._refresher.start()
+        print(f"🔄 Embeddings refresher polling every {interval}s")
+
+    def metrics(self) -> Dict:
+        store = self.embeddings_cache
+        return {
+            **self._metrics,
+            'version': self.version,
+            'segments': len(self.segments),
+            'gallery_size': len(store) if store is not None else 0
+        }
+
+    def _load_binary(self, version: str = None) -> EmbeddingStore:
+        """Memory-map the binary file; workers on one host share a single local copy"""
+        stem, ext = os.path.splitext(os.path.basename(Config.EMBEDDINGS_FILE))
+        # One local file per version so in-flight snapshots keep their mapping
+        tag = re.sub(r'[^A-Za-z0-9_-]', '', version or '')[:64] or 'current'
+        local_path = os.path.join(Config.EMBEDDINGS_CACHE_DIR, f"{stem}.{tag}{ext}")
+
+        downloaded = False
+        with self._cache_lock():
+            if not is_embeddings_file(local_path):
+                print(f"📥 Downloading {Config.EMBEDDINGS_FILE} from Supabase Storage...")
+                self._download_to_file(Config.EMBEDDINGS_FILE, local_path)
+                downloaded = True
+            else:
+                print(f"📦 Reusing {local_path}")
+            store = open_embeddings_file(local_path)
+
+        if downloaded:
+            self._prune_local_versions(keep=local_path)
+        return store
+
+    def _prune_local_versions(self, keep: str):
+        """
+        Delete older local versions; existing mappings stay valid after unlink
+
+        Done under the exclusive cache lock, so no worker is between finding
+        a file and mapping it; skipped when the lock is busy.
+        """
+        stem, ext = os.path.splitext(os.path.basename(Config.EMBEDDINGS_FILE))
+        with self._cache_lock(exclusive=True, blocking=False) as locked:
+            if not locked:
+                return
+            kept_at = os.path.getmtime(keep)
+            for entry in os.listdir(Config.EMBEDDINGS_CACHE_DIR):
+                path = os.path.join(Config.EMBEDDINGS_CACHE_DIR, entry)
+                if entry.startswith(stem + '.') and entry.endswith(ext) and path != keep:
+                    try:
+                        if os.path.getmtime(path) < kept_at:
+                            os.remove(path)
+                    except OSError:
+                        pass
+
+    def _download_to_file(self, object_name: str, dest_path: str):
+        """Stream a bucket object to disk without holding it in memory"""
+        storage = supabase_client.storage.from_(Config.EMBEDDINGS_BUCKET)
+        signed = storage.create_signed_url(object_name, 300)
+        url = (signed or {}).get('signedURL') or (signed or {}).get('signedUrl')
+        if not url:
+            raise RuntimeError(
+                f"No signed URL for {Config.EMBEDDINGS_BUCKET}/{object_name} (response: {signed!r})"
+            )
+
+        tmp_path = f"{dest_path}.part-{os.getpid()}"
+        try:
+            with httpx.stream('GET', url, timeout=120) as response:
+                response.raise_for_status()
+                with open(tmp_path, 'wb') as f:
+                    for chunk in response.iter_bytes(1 << 20):
+                        f.write(chunk)
+            # Atomic: other workers only ever see a complete file
+            os.replace(tmp_path, dest_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _load_pickle(self) -> EmbeddingStore:
+        """Legacy format: whole-file download + pickle.load (only for trusted buckets)"""
+        print(f"📥 Downloading {Config.EMBEDDINGS_FILE} from Supabase Storage...")
+
+        data = supabase_client.storage.from_(Config.EMBEDDINGS_BUCKET)\
+            .download(Config.EMBEDDINGS_FILE)
+
+        raw_dict = pickle.loads(data)
+        del data
+
+        # Convert lists → one contiguous matrix + key index
+        return EmbeddingStore.from_pickle_data(raw_dict)
+
+    def select_embeddings(
+        self,
+        student_ids: List[str],
+        name_map: Dict[str, str] = None
+    ) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        Embedding rows for a set of students (no network)
+
+        Returns:
+            (found_student_ids, matrix, offsets): student i owns rows
+            matrix[offsets[i]:offsets[i + 1]]
+        """
+        store = self.load_embeddings_database()
+
+        if store.key_type == KEY_STUDENT_ID:
+            keys = student_ids
+        else:
+            # Legacy pickle: join by name (collides on duplicate names)
+            name_map = name_map or {}
+            keys = [name_map.get(sid) for sid in student_ids]
+
+        positions, matrix, offsets = store.subset(keys)
+        found_ids = [student_ids[i] for i in positions]
+
+        missing = len(student_ids) - len(found_ids)
+        if missing:
+            print(f"⚠️ No embedding for {missing} of {len(student_ids)} students")
+
+        return found_ids, matrix, offsets
+
+    def get_embeddings_for_class(self, class_id: str) -> Dict:
+        # Resolved through the cached class roster (bulk queries, TTL'd)
+        from services.class_roster import class_roster_cache
+        return class_roster_cache.get(class_id).embeddings
 
 embeddings_loader = EmbeddingsLoader()
@@ -0,0 +1,63 @@
+import numpy as np
+from typing import Dict, List
+from services.inference_pool import analyze_faces
+from services.embeddings_loader import embeddings_loader
+from services.embedding_store import KEY_FULL_NAME
+
+
+class EnrollmentService:
+    """
+    Add a student's face photos to the gallery without rewriting it
+
+    Photos go through the same detect + embed path as /process-image
+    (in the inference pool when enabled). The embeddings are published as
+    one delta segment; the background compactor later folds segments into
+    the base database.
+    """
+
+    def enroll(self, student_id: str, images: List[np.ndarray]) -> Dict:
+        """
+        Embed the largest face of every photo and publish them for student_id
+
+        Returns per-photo status plus the segment name (None when no photo
+        had a usable face).
+        """
+        store = embeddings_loader.load_embeddings_database()
+        if store.key_type == KEY_FULL_NAME:
+            raise ValueError(
+                "Gallery is keyed by full_name; run models/fix_pickle_format.py --by-student-id first"
+            )
+
+        photos, embeddings = [], []
+        for index, image in enumerate(images):
+            analysis = analyze_faces(image)
+            if len(analysis.kept_indices) == 0:
+                photos.append({'photo': index, 'status': 'no_face', 'faces': len(analysis.boxes)})
+                continue
+
+            # Group shots: the largest face is the one being enrolled
+            areas = [
+                (analysis.boxes[i][2] - analysis.boxes[i][0]) * (analysis.boxes[i][3] - analysis.boxes[i][1])
+                for i in analysis.kept_indices
+            ]
+            best = int(np.argmax(areas))
+            embeddings.append(analysis.embeddings[best])
+            photos.append({'photo': index, 'status': 'enrolled', 'faces': len(analysis.kept_indices)})
+
+        segment = None
+        if embeddings:
+            segment = embeddings_loader.publish_segment({student_id: np.stack(embeddings)})
+            # Visible to this worker now (no bucket re-listing); the others
+            # pick it up on their next refresh
+            embeddings_loader.apply_segment(segment)
+
+        return {
+            'student_id': student_id,
+            'enrolled_photos': len(embeddings),
+            'photos': photos,
+            'segment': segment
+        }
+
+
+# Singleton instance
+enrollment_service = EnrollmentService()
@@ -0,0 +1,82 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from typing import List, Sequence, Tuple
+
+# Cost for face/student pairs that fail the threshold. Large enough that the
+# solver always prefers one more valid match over a lower total distance.
+GATED_COST = 1e6
+
+
+def assign_faces(
+    distances: np.ndarray,
+    threshold: float,
+    face_keys: Sequence = None,
+    student_ids: Sequence[str] = None
+) -> List[Tuple[int, int, float]]:
+    """
+    One-to-one face -> student assignment over the full distance matrix
+
+    Solves a linear-sum assignment where pairs at or above the threshold are
+    gated out. The result maximizes the number of matched faces and, among
+    those, minimizes the total distance.
+
+    Rows and columns are solved in a canonical order (faces by face_keys,
+    e.g. their bboxes, students by id) so the result does not depend on the
+    order YOLO returned the boxes in.
+
+    Args:
+        distances: (faces x students) cosine distance matrix
+        threshold: Maximum distance (exclusive) for a valid match
+        face_keys: Sortable key per face row (defaults to row order)
+        student_ids: Sortable key per student column (defaults to column order)
+
+    Returns:
+        [(face_index, student_index, distance), ...] sorted by face_index
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    if distances.ndim != 2 or distances.size == 0:
+        return []
+
+    num_faces, num_students = distances.shape
+    row_order = _canonical_order(face_keys, num_faces)
+    col_order = _canonical_order(student_ids, num_students)
+
+    canonical = distances[np.ix_(row_order, col_order)]
+    valid = np.isfinite(canonical) & (canonical < threshold)
+
+    # Skip the solver entirely when nothing can match
+    if not valid.any():
+        return []
+
+    # Faces/students with no valid pair can never be matched; drop them so
+    # the solver only sees the (usually much smaller) contested block
+    keep_rows = np.flatnonzero(valid.any(axis=1))
+    keep_cols = np.flatnonzero(valid.any(axis=0))
+    valid = valid[np.ix_(keep_rows, keep_cols)]
+
+    cost = np.where(valid, canonical[np.ix_(keep_rows, keep_cols)], GATED_COST)
+    rows, cols = linear_sum_assignment(cost)
+
+    matches = []
+    for r, c in zip(rows, cols):
+        if valid[r, c]:
+            face_idx = int(row_order[keep_rows[r]])
+            student_idx = int(col_order[keep_cols[c]])
+            matches.append((face_idx, student_idx, float(distances[face_idx, student_idx])))
+
+    matches.sort(key=lambda m: m[0])
+    return matches
+
+
+def _canonical_order(keys, n: int) -> np.ndarray:
+    if keys is None:
+        return np.arange(n)
+    return np.array(sorted(range(n), key=lambda i: _sort_key(keys[i])), dtype=np.intp)
+
+
+def _sort_key(key):
+    if isinstance(key, np.ndarray):
+        return tuple(key.tolist())
+    if isinstance(key, (list, tuple)):
+        return tuple(key)
+    return key
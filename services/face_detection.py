@@ -1,48 +1,201 @@
-from ultralytics import YOLO
 from config.settings import Config
 from services.supabase_client import supabase_client
+from services.detector_backends import create_detector_backend, nms
+from services.model_registry import model_registry
+from services.micro_batcher import MicroBatcher
 import os
 import warnings
+import cv2
 import numpy as np
+from typing import List, Tuple
 
 warnings.filterwarnings('ignore')
 
+# Tiled mode: duplicates across tiles / the global pass are merged at this IoU
+TILE_MERGE_IOU = 0.5
+# Boxes this close to an inner tile edge are treated as cut off
+TILE_EDGE_MARGIN_PX = 2
+
 class FaceDetectionService:
-    def __init__(self):
-        model_path = Config.YOLO_MODEL_PATH
+    def __init__(self, engine: str = None):
+        self.engine = (engine or Config.DETECTOR_ENGINE).lower()
+        model_path = Config.YOLO_MODEL_ONNX_PATH if self.engine == 'onnx' else Config.YOLO_MODEL_PATH
         bucket = Config.EMBEDDINGS_BUCKET
 
-        print(f"🔧 Checking YOLO model at: {model_path}")
+        print(f"🔧 Checking YOLO model at: {model_path} (engine: {self.engine})")
 
         # If model doesn't exist → download from Supabase
         if not os.path.exists(model_path):
-            print(f"📥 Model not found locally. Downloading from Supabase bucket '{bucket}'...")
+            model_file = os.path.basename(model_path)
+            print(f"📥 Model not found locally. Downloading {model_file} from Supabase bucket '{bucket}'...")
             try:
-                data = supabase_client.storage.from_(bucket).download("best.pt")
+                data = supabase_client.storage.from_(bucket).download(model_file)
 
                 os.makedirs(os.path.dirname(model_path), exist_ok=True)
                 with open(model_path, "wb") as f:
                     f.write(data)
 
-                print("✅ Best.pt downloaded successfully from Supabase")
+                print(f"✅ {model_file} downloaded successfully from Supabase")
             except Exception as e:
                 print(f"❌ Failed to download YOLO model: {e}")
                 raise
 
         # Load YOLO
         try:
-            self.model = YOLO(model_path)
-            print("✅ YOLO model loaded successfully")
+            self.backend = create_detector_backend(self.engine)
+            print(f"✅ YOLO model loaded successfully ({self.backend.name})")
         except Exception as e:
             print(f"❌ Error loading YOLO model: {e}")
             raise
 
+        # Concurrent requests share one batched forward pass
+        self._batcher = MicroBatcher('detect', self._predict_many, Config.MICROBATCH_MAX_IMAGES)
+
     def detect_faces(self, image: np.ndarray) -> np.ndarray:
-        """Run YOLO detection on numpy image"""
-        predictions = self.model(image, conf=Config.YOLO_CONFIDENCE, verbose=False)
-        boxes = predictions[0].boxes.xyxy.cpu().numpy().astype(int)
+        """
+        Run YOLO detection on numpy image
+        
+        Detection runs on a copy downscaled to DETECTION_MAX_WIDTH; boxes are
+        returned in the coordinates of `image` so crops keep full detail.
+        DETECTION_MODE='tiled' switches to detect_faces_tiled.
+        """
+        if Config.DETECTION_MODE.lower() == 'tiled':
+            return self.detect_faces_tiled(image)
+        return self._detect_single(image)
+    
+    def _detect_single(self, image: np.ndarray) -> np.ndarray:
+        small, scale = downscale_for_detection(image, Config.DETECTION_MAX_WIDTH)
+        boxes = self._batcher.submit(small)
+        if scale == 1.0 or len(boxes) == 0:
+            return boxes
+        
+        height, width = image.shape[:2]
+        boxes = np.rint(boxes * scale).astype(int)
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height)
+        return boxes
+
+
+    def _predict_many(self, images: List[np.ndarray]) -> List[np.ndarray]:
+        if len(images) == 1:
+            return [self.backend.predict(images[0], conf=Config.YOLO_CONFIDENCE)]
+        results = self.backend.predict_batch(images, conf=Config.YOLO_CONFIDENCE)
+        return [boxes.astype(int) for boxes, _ in results]
+    
+    def detect_faces_tiled(self, image: np.ndarray) -> np.ndarray:
+        """
+        Multi-scale detection for large photos
+        
+        One downscaled global pass (large, front-row faces) plus overlapping
+        full-resolution tiles (small, back-row faces), run as a single batch.
+        Tile boxes cut off by an inner tile edge are dropped, since the
+        overlap or the global pass sees that face whole; the rest are
+        merged with NMS.
+        """
+        height, width = image.shape[:2]
+        tiles = tile_grid(
+            width, height,
+            Config.DETECTION_TILE_SIZE,
+            Config.DETECTION_TILE_OVERLAP,
+            Config.DETECTION_MAX_TILES
+        )
+        if len(tiles) == 1:
+            return self._detect_single(image)
+        
+        small, scale = downscale_for_detection(image, Config.DETECTION_MAX_WIDTH)
+        batch = [small] + [image[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+        results = self.backend.predict_batch(batch, conf=Config.YOLO_CONFIDENCE)
+        
+        global_boxes, global_scores = results[0]
+        all_boxes = [global_boxes * scale]
+        all_scores = [global_scores]
+        
+        for (x1, y1, x2, y2), (boxes, scores) in zip(tiles, results[1:]):
+            keep = ~touches_inner_edge(boxes, (x1, y1, x2, y2), width, height)
+            all_boxes.append(boxes[keep] + np.array([x1, y1, x1, y1], dtype=np.float32))
+            all_scores.append(scores[keep])
+        
+        boxes = np.concatenate(all_boxes).astype(np.float32)
+        scores = np.concatenate(all_scores)
+        if len(boxes) == 0:
+            return np.empty((0, 4), dtype=int)
+        
+        keep = nms(boxes, scores, TILE_MERGE_IOU)
+        boxes = np.rint(boxes[keep]).astype(int)
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height)
         return boxes
 
 
-# Singleton instance
-face_detector = FaceDetectionService()
+def tile_grid(width: int, height: int, tile: int, overlap: float, max_tiles: int) -> List[Tuple[int, int, int, int]]:
+    """
+    Overlapping (x1, y1, x2, y2) tiles covering the image
+    
+    The count follows the image size; past max_tiles the tile grows
+    instead, so latency stays bounded for very large photos.
+    """
+    while True:
+        cols = _tile_count(width, tile, overlap)
+        rows = _tile_count(height, tile, overlap)
+        if cols * rows <= max(1, max_tiles):
+            break
+        tile = int(tile * 1.25)
+    
+    tile_w, tile_h = min(tile, width), min(tile, height)
+    xs = np.linspace(0, width - tile_w, cols).round().astype(int)
+    ys = np.linspace(0, height - tile_h, rows).round().astype(int)
+    return [(int(x), int(y), int(x) + tile_w, int(y) + tile_h) for y in ys for x in xs]
+
+
+def _tile_count(length: int, tile: int, overlap: float) -> int:
+    if length <= tile:
+        return 1
+    stride = max(1, int(tile * (1 - overlap)))
+    return int(np.ceil((length - tile) / stride)) + 1
+
+
+def touches_inner_edge(boxes: np.ndarray, tile: Tuple[int, int, int, int], width: int, height: int) -> np.ndarray:
+    """Mask of tile-local boxes cut off by a tile edge that is not an image edge"""
+    x1, y1, x2, y2 = tile
+    margin = TILE_EDGE_MARGIN_PX
+    cut = np.zeros(len(boxes), dtype=bool)
+    if x1 > 0:
+        cut |= boxes[:, 0] <= margin
+    if y1 > 0:
+        cut |= boxes[:, 1] <= margin
+    if x2 < width:
+        cut |= boxes[:, 2] >= (x2 - x1) - margin
+    if y2 < height:
+        cut |= boxes[:, 3] >= (y2 - y1) - margin
+    return cut
+
+
+def downscale_for_detection(image: np.ndarray, max_width: int):
+    """(image shrunk to max_width with INTER_AREA, source / detection scale)"""
+    width = image.shape[1]
+    if not max_width or width <= max_width:
+        return image, 1.0
+    
+    scale = width / max_width
+    height = max(1, int(round(image.shape[0] / scale)))
+    return cv2.resize(image, (max_width, height), interpolation=cv2.INTER_AREA), scale
+
+
+def _warm_up(detector: FaceDetectionService):
+    """Dummy inference so kernels are initialised before the first real request"""
+    detector.detect_faces(np.zeros((Config.INPUT_HEIGHT, Config.INPUT_WIDTH, 3), dtype=np.uint8))
+
+
+# Loaded lazily (or by the warm-up thread) through the model registry
+# onnxruntime sessions own native thread pools that don't survive fork,
+# so the ONNX detector is always loaded per worker
+model_registry.register(
+    'face_detector',
+    FaceDetectionService,
+    warmup=_warm_up,
+    fork_safe=Config.DETECTOR_ENGINE.lower() != 'onnx'
+)
+
+
+def get_face_detector() -> FaceDetectionService:
+    return model_registry.get('face_detector')
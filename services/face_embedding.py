@@ -0,0 +1,215 @@
+import os
+import threading
+import time
+import cv2
+import numpy as np
+from typing import Dict, List, Tuple
+from config.settings import Config
+from services.model_registry import model_registry
+from services.micro_batcher import MicroBatcher
+
+
+class FaceEmbeddingService:
+    """
+    SFace embeddings for YOLO face crops
+
+    EMBEDDING_ENGINE='deepface' (the default) calls DeepFace.represent on
+    every crop, which detects and aligns the face again exactly as when the
+    gallery was built. 'dnn' runs the same SFace ONNX weights on the raw
+    crops through a single cv2.dnn forward pass per batch; it is faster but
+    skips alignment, so it is opt-in until bench_embedding_parity shows the
+    distances (and SFACE_THRESHOLD) still hold.
+    """
+
+    INPUT_SIZE = 112
+    EMBEDDING_DIM = 128
+
+    def __init__(self, engine: str = None):
+        self.model_name = Config.FACE_MODEL_NAME
+        self.engine = engine or Config.EMBEDDING_ENGINE
+        self.max_batch_size = max(1, Config.EMBEDDING_BATCH_SIZE)
+        self.model_path = Config.SFACE_MODEL_PATH
+
+        if self.engine == 'deepface':
+            from deepface import DeepFace
+            self._deepface = DeepFace
+            DeepFace.build_model(self.model_name)
+            print("✅ SFace embedding model loaded successfully (DeepFace)")
+            return
+        if self.engine != 'dnn':
+            raise ValueError(f"Unknown EMBEDDING_ENGINE '{self.engine}' (expected 'deepface' or 'dnn')")
+
+        if not os.path.exists(self.model_path):
+            print(f"📥 SFace weights not found at {self.model_path}, fetching via DeepFace...")
+            from deepface import DeepFace
+            DeepFace.build_model(self.model_name)
+
+        try:
+            self.net = cv2.dnn.readNetFromONNX(self.model_path)
+            print("✅ SFace embedding model loaded successfully")
+        except Exception as e:
+            print(f"❌ Error loading SFace model: {e}")
+            raise
+
+        # cv2.dnn.Net is not safe to run from several threads at once
+        self._net_lock = threading.Lock()
+        self._batch_supported = True
+        self._buffers = threading.local()
+        # Concurrent requests' crops share one forward pass
+        self._batcher = MicroBatcher('embed', self._infer_many, Config.MICROBATCH_MAX_FACES, size_of=len)
+
+    def _get_buffer(self) -> np.ndarray:
+        """Per-thread preallocated (B, 3, 112, 112) float32 input tensor"""
+        buffer = getattr(self._buffers, 'batch', None)
+        if buffer is None:
+            size = self.INPUT_SIZE
+            buffer = np.zeros((self.max_batch_size, 3, size, size), dtype=np.float32)
+            self._buffers.batch = buffer
+        return buffer
+
+    def _preprocess_into(self, crop: np.ndarray, out: np.ndarray):
+        """Aspect-preserving resize + zero pad into one CHW/RGB slot of the batch"""
+        size = self.INPUT_SIZE
+        h, w = crop.shape[:2]
+        scale = min(size / h, size / w)
+        new_w = max(1, int(round(w * scale)))
+        new_h = max(1, int(round(h * scale)))
+
+        resized = cv2.resize(crop, (new_w, new_h))
+        top = (size - new_h) // 2
+        left = (size - new_w) // 2
+
+        out.fill(0)
+        # BGR (OpenCV) -> RGB, HWC -> CHW, same as FaceRecognizerSF.feature
+        out[:, top:top + new_h, left:left + new_w] = resized[:, :, ::-1].transpose(2, 0, 1)
+
+    def _infer(self, blob: np.ndarray) -> np.ndarray:
+        with self._net_lock:
+            if self._batch_supported:
+                try:
+                    self.net.setInput(blob)
+                    out = self.net.forward()
+                    if out.shape[0] == blob.shape[0]:
+                        return out.reshape(blob.shape[0], -1)
+                except cv2.error as e:
+                    print(f"⚠️  Batched SFace inference unavailable, falling back per face: {e}")
+                self._batch_supported = False
+
+            outputs = []
+            for i in range(blob.shape[0]):
+                self.net.setInput(blob[i:i + 1])
+                outputs.append(self.net.forward().reshape(-1))
+            return np.vstack(outputs)
+
+    def _infer_many(self, blobs: List[np.ndarray]) -> List[np.ndarray]:
+        """One forward pass over several callers' blobs, split back per caller"""
+        if len(blobs) == 1:
+            return [self._infer(blobs[0])]
+        out = self._infer(np.concatenate(blobs))
+        bounds = np.cumsum([len(b) for b in blobs])[:-1]
+        return np.split(out, bounds)
+
+    def embed_faces(
+        self,
+        image: np.ndarray,
+        face_boxes: np.ndarray
+    ) -> Tuple[np.ndarray, List[int], Dict[str, float]]:
+        """
+        Embed every face crop in as few forward passes as possible
+
+        Args:
+            image: OpenCV image (BGR)
+            face_boxes: YOLO detected boxes [[x1,y1,x2,y2], ...]
+
+        Returns:
+            (embeddings, kept_indices, timings)
+            embeddings: float32 (M x 128), one row per non-empty crop
+            kept_indices: index into face_boxes for each embedding row
+            timings: {'crop_ms', 'preprocess_ms', 'infer_ms', 'batches'}
+        """
+        timings = {'crop_ms': 0.0, 'preprocess_ms': 0.0, 'infer_ms': 0.0, 'batches': 0}
+
+        start = time.perf_counter()
+        crops = []
+        kept_indices = []
+        height, width = image.shape[:2]
+        for i, box in enumerate(face_boxes):
+            x1, y1, x2, y2 = [int(v) for v in box[:4]]
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(width, x2), min(height, y2)
+            crop = image[y1:y2, x1:x2]
+            if crop.size == 0:
+                continue
+            crops.append(crop)
+            kept_indices.append(i)
+        timings['crop_ms'] = (time.perf_counter() - start) * 1000
+
+        if self.engine == 'deepface':
+            return self._represent_each(crops, kept_indices, timings)
+
+        embeddings = np.empty((len(crops), self.EMBEDDING_DIM), dtype=np.float32)
+        buffer = self._get_buffer()
+
+        for offset in range(0, len(crops), self.max_batch_size):
+            chunk = crops[offset:offset + self.max_batch_size]
+
+            start = time.perf_counter()
+            for j, crop in enumerate(chunk):
+                self._preprocess_into(crop, buffer[j])
+            timings['preprocess_ms'] += (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            embeddings[offset:offset + len(chunk)] = self._batcher.submit(buffer[:len(chunk)])
+            timings['infer_ms'] += (time.perf_counter() - start) * 1000
+            timings['batches'] += 1
+
+        for key in ('crop_ms', 'preprocess_ms', 'infer_ms'):
+            timings[key] = round(timings[key], 2)
+
+        return embeddings, kept_indices, timings
+
+    def _represent_each(
+        self,
+        crops: List[np.ndarray],
+        kept_indices: List[int],
+        timings: Dict[str, float]
+    ) -> Tuple[np.ndarray, List[int], Dict[str, float]]:
+        """One DeepFace.represent call per crop; crops it fails on are dropped"""
+        rows, kept = [], []
+        start = time.perf_counter()
+        for crop, index in zip(crops, kept_indices):
+            try:
+                represented = self._deepface.represent(
+                    img_path=crop,
+                    model_name=self.model_name,
+                    enforce_detection=False
+                )
+                embedding = np.asarray(represented[0]['embedding'], dtype=np.float32).flatten()
+            except Exception as e:
+                print(f"⚠️  Error processing face: {e}")
+                continue
+            if len(embedding) != self.EMBEDDING_DIM:
+                print(f"⚠️  Dimension mismatch: new embedding has {len(embedding)} dims")
+                continue
+            rows.append(embedding)
+            kept.append(index)
+        timings['infer_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        timings['batches'] = len(rows)
+        timings['crop_ms'] = round(timings['crop_ms'], 2)
+
+        embeddings = np.vstack(rows) if rows else np.empty((0, self.EMBEDDING_DIM), dtype=np.float32)
+        return embeddings, kept, timings
+
+
+def _warm_up(embedder: FaceEmbeddingService):
+    """Embed a blank crop so the first real batch doesn't pay graph setup"""
+    size = FaceEmbeddingService.INPUT_SIZE
+    embedder.embed_faces(np.zeros((size, size, 3), dtype=np.uint8), np.array([[0, 0, size, size]]))
+
+
+# Loaded lazily (or by the warm-up thread) through the model registry
+model_registry.register('face_embedder', FaceEmbeddingService, warmup=_warm_up)
+
+
+def get_face_embedder() -> FaceEmbeddingService:
+    return model_registry.get('face_embedder')
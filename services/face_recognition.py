@@ -1,8 +1,12 @@
+import time
 import numpy as np
-from deepface import DeepFace
-from scipy.spatial.distance import cosine
 from config.settings import Config
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set
+from services.gallery_matcher import ClassGallery
+from services.face_assignment import assign_faces
+from services.face_embedding import get_face_embedder
+from services.ann_index import institution_index
+from services.inference_pool import FaceAnalysis
 
 
 class FaceRecognitionService:
@@ -10,25 +14,13 @@ class FaceRecognitionService:
         self.model_name = Config.FACE_MODEL_NAME
         self.threshold = Config.SFACE_THRESHOLD
     
-    def _safe_flatten(self, embedding):
-        """Safely flatten embedding to 1D array"""
-        if embedding is None:
-            return None
-        
-        # Convert to numpy array and flatten
-        flat = np.array(embedding, dtype=float).flatten()
-        
-        # Ensure it's 1D
-        if len(flat.shape) != 1:
-            raise ValueError(f"Failed to flatten embedding: {flat.shape}")
-        
-        return flat
-    
     def process_attendance_image(
         self,
         image: np.ndarray,
         face_boxes: np.ndarray,
-        enrolled_students_embeddings: Dict
+        enrolled_students_embeddings: Dict,
+        gallery: Optional[ClassGallery] = None,
+        analysis: Optional[FaceAnalysis] = None
     ) -> Dict:
         """
         Process attendance with fixed embedding handling
@@ -37,7 +29,11 @@ class FaceRecognitionService:
             image: OpenCV image
             face_boxes: YOLO detected boxes [[x1,y1,x2,y2], ...]
             enrolled_students_embeddings: Dict from embeddings_loader
-                Format: {'student_name': [embedding_values]}
+                Format: {'student_id': embedding or [embedding, ...]}
+            gallery: Pre-normalized gallery for the same students
+                (built on the fly when omitted)
+            analysis: Embeddings already computed for face_boxes (e.g. by
+                the inference pool); the crops are embedded here otherwise
         
         Returns:
             {
@@ -50,75 +46,45 @@ class FaceRecognitionService:
         """
         total_faces_detected = len(face_boxes)
         recognized_student_ids: Set[str] = set()
-        already_labeled_in_image: Set[str] = set()
+        
+        if gallery is None:
+            gallery = ClassGallery.from_embeddings(enrolled_students_embeddings)
         
         face_results = []
         
-        for box in face_boxes:
-            x1, y1, x2, y2 = box
-            face_crop = image[y1:y2, x1:x2]
+        # Embed all face crops in batched forward passes
+        if analysis is not None:
+            embeddings, kept_indices, timings = analysis.embeddings, analysis.kept_indices, dict(analysis.timings)
+        else:
+            embeddings, kept_indices, timings = get_face_embedder().embed_faces(image, face_boxes)
+        face_bboxes = [
+            [int(v) for v in face_boxes[i][:4]]
+            for i in kept_indices
+        ]
+        
+        if len(embeddings) > 0 and len(gallery) > 0:
+            # Score every face against every enrolled student in one matmul
+            distances = gallery.distances(embeddings)
             
-            if face_crop.size == 0:
-                continue
+            # Globally optimal one-to-one assignment (no first-come labelling)
+            matches = assign_faces(
+                distances,
+                self.threshold,
+                face_keys=face_bboxes,
+                student_ids=gallery.student_ids
+            )
             
-            try:
-                # Generate embedding for detected face
-                embedding_obj = DeepFace.represent(
-                    img_path=face_crop,
-                    model_name=self.model_name,
-                    enforce_detection=False
-                )
+            for face_idx, student_idx, min_distance in matches:
+                predicted_student_id = gallery.student_ids[student_idx]
+                recognized_student_ids.add(predicted_student_id)
                 
-                # Flatten the new embedding
-                new_embedding = self._safe_flatten(embedding_obj[0]['embedding'])
-                
-                # Find best match among enrolled students
-                min_distance = float('inf')
-                predicted_student_id = None
-                predicted_name = 'Unknown'
-                
-                for student_id, student_embedding in enrolled_students_embeddings.items():
-                    try:
-                        # Flatten stored embedding
-                        stored_embedding = self._safe_flatten(student_embedding)
-                        
-                        # Check dimensions match
-                        if len(new_embedding) != len(stored_embedding):
-                            print(f"⚠️  Dimension mismatch for {student_id}:")
-                            print(f"   New embedding: {len(new_embedding)} dims")
-                            print(f"   Stored embedding: {len(stored_embedding)} dims")
-                            print(f"   Type: {type(student_embedding)}")
-                            continue
-                        
-                        # Calculate cosine distance
-                        dist = cosine(new_embedding, stored_embedding)
-                        
-                        if dist < min_distance:
-                            min_distance = dist
-                            predicted_student_id = student_id
-                            predicted_name = student_id  # Using student_id as name
-                    
-                    except Exception as e:
-                        print(f"⚠️  Error comparing with {student_id}: {e}")
-                        continue
-                
-                # Apply threshold and duplicate check
-                if min_distance < self.threshold:
-                    if predicted_student_id not in already_labeled_in_image:
-                        recognized_student_ids.add(predicted_student_id)
-                        already_labeled_in_image.add(predicted_student_id)
-                        
-                        face_results.append({
-                            'student_id': predicted_student_id,
-                            'name': predicted_name,
-                            'confidence': round((1 - min_distance) * 100, 2),
-                            'distance': round(min_distance, 3),
-                            'bbox': [int(x1), int(y1), int(x2), int(y2)]
-                        })
-                
-            except Exception as e:
-                print(f"⚠️  Error processing face: {e}")
-                continue
+                face_results.append({
+                    'student_id': predicted_student_id,
+                    'name': predicted_student_id,  # Using student_id as name
+                    'confidence': round((1 - min_distance) * 100, 2),
+                    'distance': round(min_distance, 3),
+                    'bbox': face_bboxes[face_idx]
+                })
         
         # Identify absent students
         all_enrolled_ids = set(enrolled_students_embeddings.keys())
@@ -141,8 +107,62 @@ class FaceRecognitionService:
             'processing_details': {
                 'model': self.model_name,
                 'threshold': self.threshold,
-                'total_enrolled': len(all_enrolled_ids)
+                'total_enrolled': len(all_enrolled_ids),
+                'timings_ms': timings
+            }
+        }
+
+    def identify_faces(
+        self,
+        image: np.ndarray,
+        face_boxes: np.ndarray,
+        top_k: int = 1,
+        analysis: Optional[FaceAnalysis] = None
+    ) -> Dict:
+        """
+        Search every detected face against the whole institution
+        
+        Uses the ANN index over the full embeddings database instead of one
+        class's gallery. Candidates at or above the threshold are dropped.
+        
+        Returns:
+            {
+                'faces': [{'bbox': [...], 'candidates': [{'key', 'distance', 'confidence'}]}],
+                'key_type': 'student_id' | 'full_name',
+                'index': index name
             }
+        """
+        if analysis is not None:
+            embeddings, kept_indices, timings = analysis.embeddings, analysis.kept_indices, dict(analysis.timings)
+        else:
+            embeddings, kept_indices, timings = get_face_embedder().embed_faces(image, face_boxes)
+        store, index = institution_index.get()
+        
+        faces = []
+        if index is not None and len(embeddings) > 0:
+            start = time.perf_counter()
+            matches = index.search(embeddings, k=top_k)
+            timings['search_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            
+            for box_idx, candidates in zip(kept_indices, matches):
+                faces.append({
+                    'bbox': [int(v) for v in face_boxes[box_idx][:4]],
+                    'candidates': [
+                        {
+                            'key': store.keys[student_idx],
+                            'distance': round(distance, 3),
+                            'confidence': round((1 - distance) * 100, 2)
+                        }
+                        for student_idx, distance in candidates
+                        if distance < self.threshold
+                    ]
+                })
+        
+        return {
+            'faces': faces,
+            'key_type': store.key_type,
+            'index': getattr(index, 'name', None),
+            'timings_ms': timings
         }
 
 
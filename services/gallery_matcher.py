@@ -0,0 +1,157 @@
+import numpy as np
+from typing import Dict, List, Optional
+from config.settings import Config
+
+EMBEDDING_DIM = 128
+
+
+class ClassGallery:
+    """
+    Pre-normalized float32 embedding matrix for one class
+
+    Each student owns one or more contiguous rows (prototypes):
+    student i -> matrix[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(
+        self,
+        student_ids: List[str],
+        matrix: np.ndarray,
+        offsets: Optional[np.ndarray] = None,
+        aggregate: str = None,
+        top_k: int = None
+    ):
+        self.student_ids = student_ids
+        self.matrix = matrix
+        self.offsets = np.arange(len(student_ids) + 1) if offsets is None else np.asarray(offsets)
+        self.aggregate = (aggregate or Config.EMBEDDING_AGGREGATE).lower()
+        self.top_k = max(1, top_k or Config.EMBEDDING_TOP_K)
+
+    @classmethod
+    def from_embeddings(cls, enrolled_embeddings: Dict, dim: int = EMBEDDING_DIM) -> 'ClassGallery':
+        """
+        Build a gallery from {student_id: embedding or [embedding, ...]}
+
+        Embeddings with the wrong dimension are skipped, matching the old
+        per-student loop which ignored them on every comparison.
+        """
+        student_ids = []
+        blocks = []
+
+        for student_id, embedding in enrolled_embeddings.items():
+            block = np.asarray(embedding, dtype=np.float32)
+            if block.ndim == 1:
+                block = block[np.newaxis, :]
+            if block.ndim != 2 or block.shape[1] != dim or block.shape[0] == 0:
+                print(f"⚠️  Dimension mismatch for {student_id}: {block.shape} (expected (K, {dim}))")
+                continue
+            student_ids.append(student_id)
+            blocks.append(block)
+
+        offsets = np.zeros(len(blocks) + 1, dtype=np.intp)
+        offsets[1:] = np.cumsum([len(b) for b in blocks])
+
+        matrix = np.empty((offsets[-1], dim), dtype=np.float32)
+        for i, block in enumerate(blocks):
+            matrix[offsets[i]:offsets[i + 1]] = block
+
+        return cls(student_ids, normalize_rows(matrix), offsets)
+
+    @classmethod
+    def from_matrix(
+        cls,
+        student_ids: List[str],
+        matrix: np.ndarray,
+        offsets: Optional[np.ndarray] = None
+    ) -> 'ClassGallery':
+        """Build from rows already selected out of the embedding store"""
+        return cls(list(student_ids), normalize_rows(matrix), offsets)
+
+    def __len__(self) -> int:
+        return len(self.student_ids)
+
+    def distances(self, face_embeddings: np.ndarray) -> np.ndarray:
+        """
+        Cosine distance matrix (faces x students) with one matrix multiply
+
+        Same definition as scipy.spatial.distance.cosine: 1 - u.v / (|u| |v|).
+        Zero vectors (which scipy turns into NaN and never match) get +inf.
+        Students with several prototypes are reduced per EMBEDDING_AGGREGATE:
+        'max' (closest prototype) or 'topk' (mean of the top_k closest).
+        """
+        queries = np.asarray(face_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[np.newaxis, :]
+
+        if len(self.student_ids) == 0 or queries.shape[0] == 0:
+            return np.full((queries.shape[0], len(self.student_ids)), np.inf, dtype=np.float32)
+
+        dist = 1.0 - normalize_rows(queries) @ self.matrix.T
+
+        dist[~np.any(queries, axis=1), :] = np.inf
+        dist[:, ~np.any(self.matrix, axis=1)] = np.inf
+
+        if self.matrix.shape[0] == len(self.student_ids):
+            return dist
+        if self.aggregate == 'topk' and self.top_k > 1:
+            return self._top_k_mean(dist)
+        return np.minimum.reduceat(dist, self.offsets[:-1], axis=1)
+
+    def _top_k_mean(self, dist: np.ndarray) -> np.ndarray:
+        """Mean of each student's k closest prototypes (fewer if they have fewer)"""
+        counts = np.diff(self.offsets)
+        width = int(counts.max())
+
+        # (students x width) row index table; padding points at a +inf column
+        slots = np.arange(width)
+        table = self.offsets[:-1, np.newaxis] + slots
+        table[slots >= counts[:, np.newaxis]] = dist.shape[1]
+
+        padded = np.concatenate([dist, np.full((dist.shape[0], 1), np.inf, dtype=dist.dtype)], axis=1)
+        grouped = np.sort(padded[:, table], axis=2)
+
+        k = np.minimum(counts, self.top_k)
+        head = grouped[:, :, :int(k.max())]
+        mask = np.arange(head.shape[2]) < k[:, np.newaxis]
+        return np.where(mask, head, 0).sum(axis=2) / k
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize rows in float32; zero rows stay zero"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def compact_prototypes(vectors: np.ndarray, max_prototypes: int, iterations: int = 10) -> np.ndarray:
+    """
+    Reduce one student's (K x D) embeddings to at most max_prototypes
+
+    Spherical k-means (cosine) with deterministic farthest-point seeding,
+    so the same photos always give the same prototypes. Returns unit-norm
+    centroids.
+    """
+    vectors = normalize_rows(vectors)
+    if max_prototypes <= 0 or len(vectors) <= max_prototypes:
+        return vectors
+
+    # Seed with the vector closest to the mean, then farthest points
+    mean = normalize_rows(vectors.mean(axis=0, keepdims=True))[0]
+    chosen = [int(np.argmax(vectors @ mean))]
+    closest = 1.0 - vectors @ vectors[chosen[0]]
+    while len(chosen) < max_prototypes:
+        nxt = int(np.argmax(closest))
+        chosen.append(nxt)
+        closest = np.minimum(closest, 1.0 - vectors @ vectors[nxt])
+
+    centroids = vectors[chosen].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(len(centroids)):
+            members = vectors[assignment == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = normalize_rows(centroids)
+
+    return centroids
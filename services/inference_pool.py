@@ -0,0 +1,339 @@
+"""
+Detection + embedding in a pool of worker processes
+
+Each worker process owns its own YOLO detector and SFace embedder, so CPU
+inference no longer competes with the Flask request threads for one
+interpreter. Images travel through preallocated shared-memory slots: the
+request thread copies the pixels into a slot once and only the slot name,
+shape and dtype are pickled onto the task queue. Workers send back the
+small results (boxes, embeddings, timings).
+
+INFERENCE_WORKERS=0 (the default) keeps everything in-process.
+"""
+import atexit
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+import numpy as np
+from collections import namedtuple
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+from config.settings import Config
+
+# Native thread pools that size themselves from the environment at import
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+# Result of detect + embed for one image
+FaceAnalysis = namedtuple('FaceAnalysis', ['boxes', 'embeddings', 'kept_indices', 'timings'])
+
+
+def run_analysis(image: np.ndarray) -> FaceAnalysis:
+    """Detect faces and embed every crop with this process's models"""
+    from services.face_detection import get_face_detector
+    from services.face_embedding import get_face_embedder
+
+    start = time.perf_counter()
+    boxes = get_face_detector().detect_faces(image)
+    detect_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    embeddings, kept_indices, timings = get_face_embedder().embed_faces(image, boxes)
+    return FaceAnalysis(boxes, embeddings, kept_indices, {'detect_ms': detect_ms, **timings})
+
+
+def analyze_faces(image: np.ndarray) -> FaceAnalysis:
+    """Detect + embed, in the worker pool when INFERENCE_WORKERS > 0"""
+    if Config.INFERENCE_WORKERS > 0:
+        return inference_pool.analyze(image)
+    return run_analysis(image)
+
+
+def _worker_main(task_queue, result_queue, threads: int):
+    """Worker process: load models once, then serve tasks until a None sentinel"""
+    # One task at a time per worker, so there is nothing to batch across
+    Config.MICROBATCH_MAX_WAIT_MS = 0
+    if threads > 0:
+        # OMP / BLAS pools were already capped through the environment the
+        # parent spawned us with; these size their pools per library instead
+        Config.ONNX_INTRA_OP_THREADS = threads
+
+    from services.face_detection import get_face_detector
+    from services.face_embedding import get_face_embedder
+
+    get_face_detector()
+    get_face_embedder()
+    if threads > 0:
+        # Whichever of these the loaded backends pulled in
+        if 'cv2' in sys.modules:
+            sys.modules['cv2'].setNumThreads(threads)
+        if 'torch' in sys.modules:
+            sys.modules['torch'].set_num_threads(threads)
+    result_queue.put((None, 'ready', os.getpid()))
+
+    slots: Dict[str, shared_memory.SharedMemory] = {}
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        task_id, shm_name, shape, dtype, is_slot = task
+        try:
+            shm = slots.get(shm_name)
+            if shm is None:
+                # Spawned workers share the parent's resource tracker, which
+                # stays responsible for unlinking the segment
+                shm = shared_memory.SharedMemory(name=shm_name)
+                if is_slot:
+                    slots[shm_name] = shm
+            try:
+                image = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+                analysis = run_analysis(image)
+                del image
+            finally:
+                if not is_slot:
+                    shm.close()
+            result_queue.put((task_id, 'ok', tuple(analysis)))
+        except Exception as e:
+            result_queue.put((task_id, 'error', f"{type(e).__name__}: {e}"))
+
+    for shm in slots.values():
+        shm.close()
+
+
+class InferencePool:
+    """
+    N inference processes fed through shared-memory image slots
+
+    analyze() blocks the calling request thread until a slot is free
+    (bounding in-flight images and memory) and the worker answers.
+    """
+
+    def __init__(self, workers: int = None, slots: int = None, slot_bytes: int = None):
+        self.workers = Config.INFERENCE_WORKERS if workers is None else workers
+        self.num_slots = slots or Config.INFERENCE_SLOTS or 2 * max(1, self.workers)
+        self.slot_bytes = slot_bytes or Config.INFERENCE_SLOT_MB * 1024 * 1024
+        self.timeout = Config.INFERENCE_TIMEOUT_SECONDS
+
+        self._processes = []
+        self._task_queues: Dict[int, object] = {}   # worker pid -> its own task queue
+        self._slots = []
+        self._free_slots: queue.Queue = queue.Queue()
+        self._pending: Dict[int, tuple] = {}
+        self._ready_pids = set()
+        self._task_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._started = False
+
+    @property
+    def ready(self) -> bool:
+        alive = {p.pid for p in self._processes if p.is_alive()}
+        return self._started and len(alive & self._ready_pids) == self.workers
+
+    def start(self):
+        """Spawn the workers and allocate the slots (idempotent)"""
+        with self._lock:
+            if self._started or mp.parent_process() is not None:
+                # Never start a pool from inside a pool worker (spawn re-imports __main__)
+                return
+            # spawn, not fork: onnxruntime / torch thread pools don't survive fork
+            self._ctx = mp.get_context('spawn')
+            self._result_queue = self._ctx.Queue()
+
+            prefix = f"attn-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+            for i in range(self.num_slots):
+                shm = shared_memory.SharedMemory(name=f"{prefix}-{i}", create=True, size=self.slot_bytes)
+                self._slots.append(shm)
+                self._free_slots.put(i)
+
+            for _ in range(self.workers):
+                self._spawn_worker()
+
+            threading.Thread(target=self._collect, name='inference-results', daemon=True).start()
+            atexit.register(self.shutdown)
+            self._started = True
+            print(f"🧵 Inference pool started: {self.workers} workers, {self.num_slots} x {self.slot_bytes // (1024 * 1024)}MB slots")
+
+    def analyze(self, image: np.ndarray) -> FaceAnalysis:
+        if not self._started:
+            self.start()
+        self._respawn_dead_workers()
+
+        image = np.ascontiguousarray(image)
+        try:
+            slot = self._free_slots.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError("No free inference slot")
+
+        if image.nbytes <= self.slot_bytes:
+            shm, owned = self._slots[slot], None
+        else:
+            # Rare oversized image: one-off segment, freed with the result
+            owned = shared_memory.SharedMemory(create=True, size=image.nbytes)
+            shm = owned
+        np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)[...] = image
+
+        future: Future = Future()
+        task_id = next(self._task_ids)
+        with self._lock:
+            # Each task goes to one worker's own queue, so a crashed worker's
+            # tasks are known and can be failed. The slot is released by the
+            # collector when the worker answers (or dies), never here: a
+            # timed-out task may still be reading it
+            pid = self._least_busy_worker()
+            self._pending[task_id] = (future, slot, owned, pid, time.monotonic() + self.timeout)
+            self._task_queues[pid].put((task_id, shm.name, image.shape, image.dtype.str, owned is None))
+
+        return FaceAnalysis(*future.result(timeout=self.timeout))
+
+    def stats(self) -> Dict:
+        return {
+            'workers': self.workers,
+            'ready_workers': len(self._ready_pids & {p.pid for p in self._processes if p.is_alive()}),
+            'free_slots': self._free_slots.qsize(),
+            'in_flight': len(self._pending)
+        }
+
+    def shutdown(self):
+        if not self._started:
+            return
+        for task_queue in self._task_queues.values():
+            task_queue.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for shm in self._slots:
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._started = False
+
+    def _spawn_worker(self):
+        task_queue = self._ctx.Queue()
+        threads = Config.INFERENCE_WORKER_THREADS
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(task_queue, self._result_queue, threads),
+            name=f'inference-worker-{len(self._processes)}',
+            daemon=True
+        )
+        # The child's interpreter starts with our environment, so OMP / BLAS
+        # read the cap before unpickling the target imports numpy
+        saved = {var: os.environ.get(var) for var in THREAD_ENV_VARS}
+        if threads > 0:
+            os.environ.update({var: str(threads) for var in THREAD_ENV_VARS})
+        try:
+            process.start()
+        finally:
+            for var, value in saved.items():
+                if value is None:
+                    os.environ.pop(var, None)
+                else:
+                    os.environ[var] = value
+        self._processes.append(process)
+        self._task_queues[process.pid] = task_queue
+
+    def _least_busy_worker(self) -> int:
+        """Pid of the live worker with the fewest tasks in flight (call under _lock)"""
+        load = {p.pid: 0 for p in self._processes if p.is_alive()} or {p.pid: 0 for p in self._processes}
+        for entry in self._pending.values():
+            if entry[3] in load:
+                load[entry[3]] += 1
+        return min(load, key=load.get)
+
+    def _terminate_hung_workers(self):
+        """
+        Kill workers holding a task past INFERENCE_TIMEOUT_SECONDS
+
+        A worker that hangs without dying would keep its slots forever.
+        Once it's terminated nothing can still read those slots, and
+        _respawn_dead_workers fails its tasks and frees them.
+        """
+        now = time.monotonic()
+        with self._lock:
+            overdue = {entry[3] for entry in self._pending.values() if entry[4] < now}
+        for process in list(self._processes):
+            if process.pid in overdue and process.is_alive():
+                print(f"⚠️ Inference worker {process.pid} stuck for over {self.timeout}s, terminating")
+                process.terminate()
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+
+    def _respawn_dead_workers(self):
+        dead = [p for p in self._processes if not p.is_alive()]
+        if not dead:
+            return
+        orphaned = []
+        with self._lock:
+            for process in dead:
+                if process in self._processes:
+                    print(f"⚠️ Inference worker {process.pid} exited ({process.exitcode}), respawning")
+                    self._processes.remove(process)
+                    self._ready_pids.discard(process.pid)
+                    self._task_queues.pop(process.pid, None)
+                    self._spawn_worker()
+                    orphaned.extend(
+                        task_id for task_id, entry in self._pending.items()
+                        if entry[3] == process.pid
+                    )
+            entries = [self._pending.pop(task_id) for task_id in orphaned]
+
+        # Running or still queued on the dead worker: they will never be answered
+        now = time.monotonic()
+        for future, slot, owned, pid, deadline in entries:
+            self._release(slot, owned)
+            if deadline < now:
+                future.set_exception(TimeoutError(f"Inference worker {pid} did not answer within {self.timeout}s"))
+            else:
+                future.set_exception(RuntimeError(f"Inference worker {pid} died before answering"))
+
+    def _release(self, slot: int, owned: Optional[shared_memory.SharedMemory]):
+        if owned is not None:
+            owned.close()
+            owned.unlink()
+        self._free_slots.put(slot)
+
+    def _collect(self):
+        """Route worker results back to the waiting request threads"""
+        last_check = time.monotonic()
+        while True:
+            # Notice crashed or hung workers even while no request comes in,
+            # and at most once a second under load
+            if self._started and time.monotonic() - last_check >= 1:
+                self._terminate_hung_workers()
+                self._respawn_dead_workers()
+                last_check = time.monotonic()
+            try:
+                task_id, status, payload = self._result_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            if status == 'ready':
+                self._ready_pids.add(payload)
+                continue
+
+            with self._lock:
+                entry = self._pending.pop(task_id, None)
+            if entry is None:
+                continue
+
+            future, slot, owned = entry[:3]
+            self._release(slot, owned)
+
+            if status == 'ok':
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+
+
+# Singleton instance (processes start on first use or from app startup)
+inference_pool = InferencePool()
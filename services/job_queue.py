@@ -0,0 +1,363 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+import httpx
+from urllib.parse import urlsplit
+from typing import Callable, Dict, Optional
+from config.settings import Config
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+class QueueFullError(RuntimeError):
+    """Every worker is busy and JOB_QUEUE_SIZE jobs are already waiting"""
+    pass
+
+
+def validate_callback_url(url: str):
+    """
+    Raises ValueError unless url is https on a JOB_CALLBACK_ALLOWED_HOSTS host
+
+    The server POSTs to this URL, so arbitrary hosts (cloud metadata,
+    internal services) must never be reachable through it.
+    """
+    allowed = {h.strip().lower() for h in Config.JOB_CALLBACK_ALLOWED_HOSTS.split(',') if h.strip()}
+    if not allowed:
+        raise ValueError("callback_url is disabled on this server")
+    parts = urlsplit(url)
+    if parts.scheme != 'https' or (parts.hostname or '').lower() not in allowed:
+        raise ValueError("callback_url must be https on an allowed host")
+
+
+class MemoryJobStore:
+    """Job records in a dict; lost on restart, visible to this process only"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def put(self, job: Dict):
+        with self._lock:
+            self._jobs[job['job_id']] = dict(job)
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def purge(self, older_than: float):
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job['finished_at'] is not None and job['finished_at'] < older_than
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """
+    Job records in a local SQLite file
+
+    Survives worker restarts, and every gunicorn worker on the host can
+    answer status polls for jobs another worker ran. Jobs left queued or
+    running by a worker that died are marked failed when the store opens.
+    """
+
+    COLUMNS = (
+        'job_id', 'kind', 'owner', 'status', 'created_at', 'started_at',
+        'finished_at', 'result', 'error', 'http_status', 'callback_url', 'pid'
+    )
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'job_id TEXT PRIMARY KEY, kind TEXT, owner TEXT, status TEXT, '
+            'created_at REAL, started_at REAL, finished_at REAL, '
+            'result TEXT, error TEXT, http_status INTEGER, callback_url TEXT, pid INTEGER)'
+        )
+        existing = {row[1] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+        if 'pid' not in existing:
+            # Files created before jobs recorded their worker
+            self._conn.execute('ALTER TABLE jobs ADD COLUMN pid INTEGER')
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._fail_abandoned(time.time() - Config.JOB_RESULT_TTL_SECONDS)
+
+    def put(self, job: Dict):
+        row = {**job, 'result': _dump(job.get('result'))}
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(self.COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in self.COLUMNS)})",
+                [row.get(column) for column in self.COLUMNS]
+            )
+            self._conn.commit()
+
+    def update(self, job_id: str, **fields):
+        if 'result' in fields:
+            fields['result'] = _dump(fields['result'])
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE job_id = ?",
+                [*fields.values(), job_id]
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(self.COLUMNS, row))
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def purge(self, older_than: float):
+        with self._lock:
+            self._conn.execute('DELETE FROM jobs WHERE finished_at < ?', (older_than,))
+            self._conn.commit()
+
+    def _fail_abandoned(self, older_than: float):
+        """
+        Finalise unfinished jobs whose worker is gone
+
+        Their finished_at stays NULL, so purge() would never remove them
+        and pollers would see 'queued' forever. A job counts as abandoned
+        when its worker pid is dead (or is this process, which has only
+        just opened the store), or it was created before older_than,
+        which also covers a dead pid reused by another process.
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT job_id, pid, created_at FROM jobs WHERE finished_at IS NULL'
+            ).fetchall()
+            abandoned = [
+                job_id for job_id, pid, created_at in rows
+                if created_at < older_than or not _pid_alive(pid)
+            ]
+            self._conn.executemany(
+                'UPDATE jobs SET status = ?, error = ?, http_status = 500, finished_at = ? '
+                'WHERE job_id = ? AND finished_at IS NULL',
+                [(STATUS_FAILED, 'Worker exited before finishing the job', now, job_id) for job_id in abandoned]
+            )
+            self._conn.commit()
+        if abandoned:
+            print(f"⚠️ Marked {len(abandoned)} abandoned job(s) as failed")
+
+
+def _dump(value) -> Optional[str]:
+    return json.dumps(value) if value is not None else None
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if pid is None or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by another user
+    return True
+
+
+class JobQueue:
+    """
+    Bounded local worker pool for slow pipeline work
+
+    submit() enqueues and returns a job id immediately; JOB_WORKERS threads
+    drain the queue. When JOB_QUEUE_SIZE jobs are already waiting, submit()
+    raises QueueFullError so the API can answer 429 instead of letting
+    requests pile up behind gunicorn's timeout.
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = None, store=None):
+        self.workers = workers or Config.JOB_WORKERS
+        self.max_pending = max_pending or Config.JOB_QUEUE_SIZE
+        self._store = store
+        self._queue: queue.Queue = queue.Queue(maxsize=self.max_pending)
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._persist_lock = threading.Lock()
+        self._purged_at = 0.0
+
+    @property
+    def store(self):
+        # Opened on first use so a gunicorn --preload master never holds a
+        # SQLite connection across fork
+        if self._store is None:
+            with self._start_lock:
+                if self._store is None:
+                    self._store = _create_store()
+        return self._store
+
+    def submit(
+        self,
+        kind: str,
+        owner: str,
+        fn: Callable,
+        *args,
+        callback_url: str = None
+    ) -> Dict:
+        """
+        Queue fn(*args) -> (result dict, http status). Returns the job record
+
+        Raises:
+            QueueFullError: when the queue is at capacity
+            ValueError: when callback_url is not allowed
+        """
+        if callback_url:
+            validate_callback_url(callback_url)
+        self._ensure_started()
+        self._purge_expired()
+
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'kind': kind,
+            'owner': owner,
+            'status': STATUS_QUEUED,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None,
+            'http_status': None,
+            'callback_url': callback_url,
+            'pid': os.getpid()
+        }
+        # Persisted only once enqueued, so a rejected submit leaves no record.
+        # Workers take _persist_lock before touching the record, so they
+        # can't update it before this put lands
+        with self._persist_lock:
+            try:
+                self._queue.put_nowait((job['job_id'], fn, args))
+            except queue.Full:
+                raise QueueFullError(f"{self.max_pending} jobs already waiting")
+            self.store.put(job)
+
+        return job
+
+    def get(self, job_id: str, owner: str) -> Optional[Dict]:
+        """Job record with timings, or None if unknown or owned by someone else"""
+        job = self.store.get(job_id)
+        if job is None or job['owner'] != owner:
+            return None
+        return describe_job(job)
+
+    def stats(self) -> Dict:
+        return {
+            'workers': self.workers,
+            'pending': self._queue.qsize(),
+            'capacity': self.max_pending
+        }
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, daemon=True, name=f'job-worker-{i}')
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job_id, fn, args = self._queue.get()
+            with self._persist_lock:
+                pass  # submit() has stored the record by now
+            self.store.update(job_id, status=STATUS_RUNNING, started_at=time.time())
+            try:
+                result, http_status = fn(*args)
+                self.store.update(
+                    job_id,
+                    status=STATUS_DONE,
+                    result=result,
+                    http_status=http_status,
+                    finished_at=time.time()
+                )
+            except Exception as e:
+                traceback.print_exc()
+                self.store.update(
+                    job_id,
+                    status=STATUS_FAILED,
+                    error=str(e),
+                    http_status=500,
+                    finished_at=time.time()
+                )
+            finally:
+                self._queue.task_done()
+
+            self._notify(job_id)
+
+    def _notify(self, job_id: str):
+        """POST the finished job to its callback_url (best effort, no retries)"""
+        job = self.store.get(job_id)
+        if not job or not job.get('callback_url'):
+            return
+        try:
+            # Checked again in case the allow-list changed since submit;
+            # redirects are not followed, so they can't leave the allowed hosts
+            validate_callback_url(job['callback_url'])
+            httpx.post(job['callback_url'], json=describe_job(job), timeout=10, follow_redirects=False)
+        except Exception as e:
+            print(f"⚠️ Job {job_id} callback failed: {e}")
+
+    def _purge_expired(self):
+        now = time.time()
+        if now - self._purged_at < 60:
+            return
+        self._purged_at = now
+        self.store.purge(now - Config.JOB_RESULT_TTL_SECONDS)
+
+
+def describe_job(job: Dict) -> Dict:
+    """Public view of a job record: status, timings and (when done) the result"""
+    created, started, finished = job['created_at'], job['started_at'], job['finished_at']
+    timings = {}
+    if started is not None:
+        timings['queue_ms'] = round((started - created) * 1000, 2)
+    if finished is not None and started is not None:
+        timings['run_ms'] = round((finished - started) * 1000, 2)
+    if finished is not None:
+        timings['total_ms'] = round((finished - created) * 1000, 2)
+
+    return {
+        'job_id': job['job_id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'result': job['result'],
+        'error': job['error'],
+        'http_status': job['http_status'],
+        'timings_ms': timings
+    }
+
+
+def _create_store():
+    if Config.JOB_STORE.lower() == 'sqlite':
+        return SQLiteJobStore(Config.JOB_DB_PATH)
+    return MemoryJobStore()
+
+
+# Singleton instance
+job_queue = JobQueue()
@@ -0,0 +1,114 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+from config.settings import Config
+
+
+class MicroBatcher:
+    """
+    Dynamic batching across request threads
+
+    Callers block in submit(item). A single background thread takes the
+    first waiting item, keeps collecting for up to max_wait_ms (or until
+    max_size worth of items), runs run_batch(items) once and hands each
+    caller its own result. A lone caller never waits: the collection
+    window only opens while other callers are already queued.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run_batch: Callable[[List], List],
+        max_size: int,
+        max_wait_ms: float = None,
+        size_of: Callable = None
+    ):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_size = max(1, max_size)
+        self.max_wait = (Config.MICROBATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self.size_of = size_of or (lambda item: 1)
+
+        self._queue: List = []
+        self._cond = threading.Condition()
+        self._active = 0
+        self._thread = None
+        self._batches = 0
+        self._items = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_wait > 0
+
+    def submit(self, item):
+        """Run item through the next batch and return its result (or raise its error)"""
+        if not self.enabled:
+            return self.run_batch([item])[0]
+
+        future: Future = Future()
+        with self._cond:
+            self._ensure_thread()
+            self._active += 1
+            self._queue.append((item, future))
+            self._cond.notify_all()
+        try:
+            return future.result()
+        finally:
+            with self._cond:
+                self._active -= 1
+
+    def stats(self) -> Dict:
+        return {
+            'batches': self._batches,
+            'items': self._items,
+            'mean_batch': round(self._items / self._batches, 2) if self._batches else 0.0
+        }
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name=f'batcher-{self.name}', daemon=True)
+            self._thread.start()
+
+    def _take_batch(self) -> List:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+
+            # Others already queued means we are under concurrent load:
+            # hold the window open for stragglers, up to max_wait
+            if len(self._queue) > 1 or self._active > 1:
+                deadline = time.monotonic() + self.max_wait
+                while self._queued_size() < self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+            batch, size = [], 0
+            while self._queue:
+                item_size = self.size_of(self._queue[0][0])
+                if batch and size + item_size > self.max_size:
+                    break
+                batch.append(self._queue.pop(0))
+                size += item_size
+            return batch
+
+    def _queued_size(self) -> int:
+        return sum(self.size_of(item) for item, _ in self._queue)
+
+    def _loop(self):
+        while True:
+            batch = self._take_batch()
+            items = [item for item, _ in batch]
+            try:
+                results = self.run_batch(items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self._batches += 1
+            self._items += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,160 @@
+import gc
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+class ModelRegistry:
+    """
+    Lazy, thread-safe holder for heavy models
+
+    Models are registered with a factory and loaded on first use (or by the
+    background warm-up thread). A per-model lock makes sure concurrent first
+    requests wait for one load instead of each building their own copy.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, tuple] = {}
+        self._instances: Dict[str, object] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._status: Dict[str, str] = {}
+        self._load_times: Dict[str, float] = {}
+        self._warm_pids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._warmup_thread: Optional[threading.Thread] = None
+
+    def register(
+        self,
+        name: str,
+        factory: Callable,
+        warmup: Optional[Callable] = None,
+        fork_safe: bool = True
+    ):
+        """
+        Register a model factory
+
+        warmup(instance) runs once per process after loading. fork_safe=False
+        keeps a model out of preload(), for runtimes whose thread pools don't
+        survive fork.
+        """
+        with self._lock:
+            self._factories[name] = (factory, warmup, fork_safe)
+            self._locks.setdefault(name, threading.Lock())
+            self._status.setdefault(name, 'pending')
+
+    def get(self, name: str):
+        """Return the model, loading (and warming up) it on first use in this process"""
+        instance = self._instances.get(name)
+        if instance is not None and self._warm_pids.get(name) == os.getpid():
+            return instance
+
+        if name not in self._factories:
+            raise KeyError(f"Model '{name}' is not registered")
+
+        with self._locks[name]:
+            # Another thread may have finished loading while we waited
+            instance = self._instances.get(name)
+            if instance is not None and self._warm_pids.get(name) == os.getpid():
+                return instance
+
+            factory, warmup, _ = self._factories[name]
+            self._status[name] = 'loading'
+            start = time.perf_counter()
+
+            try:
+                if instance is None:
+                    instance = factory()
+                    self._instances[name] = instance
+                # Preloaded models are inherited from the master un-warmed
+                if warmup is not None:
+                    warmup(instance)
+            except Exception as e:
+                self._status[name] = f'error: {e}'
+                print(f"❌ Failed to load model '{name}': {e}")
+                raise
+
+            self._load_times[name] = round(time.perf_counter() - start, 2)
+            self._warm_pids[name] = os.getpid()
+            self._status[name] = 'loaded'
+            print(f"✅ Model '{name}' ready in {self._load_times[name]}s")
+            return instance
+
+    def preload(self):
+        """
+        Load fork-safe model weights without running inference
+
+        Meant for gunicorn --preload: the master loads weights once and the
+        forked workers share those pages copy-on-write. Warm-up inference
+        (which starts native thread pools) is left to each worker.
+        """
+        for name, (factory, _, fork_safe) in list(self._factories.items()):
+            if not fork_safe or name in self._instances:
+                continue
+            with self._locks[name]:
+                try:
+                    self._instances[name] = factory()
+                    self._status[name] = 'preloaded'
+                except Exception as e:
+                    self._status[name] = f'error: {e}'
+                    print(f"❌ Failed to preload model '{name}': {e}")
+
+        # Keep the cyclic GC from touching (and so copying) preloaded objects
+        gc.freeze()
+
+    def load_all(self):
+        """Load every registered model (errors are recorded, not raised)"""
+        for name in list(self._factories):
+            try:
+                self.get(name)
+            except Exception:
+                continue
+
+    def warm_up_async(self, *tasks: Callable, load_models: bool = True) -> threading.Thread:
+        """Run extra startup tasks, then load all models, in a daemon thread"""
+        with self._lock:
+            if self._warmup_thread is not None:
+                return self._warmup_thread
+
+            def run():
+                for task in tasks:
+                    try:
+                        task()
+                    except Exception as e:
+                        print(f"⚠️  Warm-up task failed: {e}")
+                if load_models:
+                    self.load_all()
+
+            self._warmup_thread = threading.Thread(target=run, name='model-warmup', daemon=True)
+            self._warmup_thread.start()
+            return self._warmup_thread
+
+    def warm_up_after_fork(self, *tasks: Callable, load_models: bool = True):
+        """Start the warm-up thread in every forked child (threads don't survive fork)"""
+        def start_in_child():
+            self._lock = threading.Lock()
+            self._warmup_thread = None
+            self.warm_up_async(*tasks, load_models=load_models)
+
+        os.register_at_fork(after_in_child=start_in_child)
+
+    def is_loaded(self, name: str) -> bool:
+        return self._warm_pids.get(name) == os.getpid()
+
+    @property
+    def ready(self) -> bool:
+        pid = os.getpid()
+        return all(self._warm_pids.get(name) == pid for name in self._factories)
+
+    def status(self) -> Dict[str, Dict]:
+        return {
+            name: {
+                'status': self._status.get(name, 'pending'),
+                'load_seconds': self._load_times.get(name)
+            }
+            for name in self._factories
+        }
+
+
+# Singleton instance
+model_registry = ModelRegistry()
@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from services.supabase_client import supabase_client
+from config.settings import Config
+
+PROFILE_COLUMNS = 'user_id, email, full_name, role, department'
+
+# Profile fields that are safe to carry in an issued JWT
+TOKEN_PROFILE_FIELDS = ('email', 'full_name', 'department')
+
+
+class ProfileCache:
+    """
+    TTL cache of user_profiles rows keyed by user_id
+
+    Login warms it; get_many() fetches every miss in one .in_() query, so
+    rosters and name lookups reuse profiles already loaded. Call
+    invalidate() after changing a profile.
+    """
+
+    def __init__(self, ttl_seconds: int = None, max_size: int = None):
+        self.ttl_seconds = Config.PROFILE_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_size = Config.PROFILE_CACHE_SIZE if max_size is None else max_size
+        self._profiles: "OrderedDict[str, tuple]" = OrderedDict()   # user_id -> (loaded_at, profile)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> Optional[Dict]:
+        """Profile of one user, or None if there is none"""
+        return self.get_many([user_id]).get(user_id)
+
+    def get_many(self, user_ids: List[str]) -> Dict[str, Dict]:
+        """user_id -> profile for every user that has one"""
+        found, missing = {}, []
+        for user_id in dict.fromkeys(user_ids):
+            profile = self._fresh(user_id)
+            if profile is None:
+                missing.append(user_id)
+            else:
+                found[user_id] = profile
+
+        if missing:
+            profiles = supabase_client.table('user_profiles')\
+                .select(PROFILE_COLUMNS)\
+                .in_('user_id', missing)\
+                .execute()
+            for profile in profiles.data:
+                self.put(profile)
+                found[profile['user_id']] = profile
+        return found
+
+    def put(self, profile: Dict):
+        if self.ttl_seconds <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            self._profiles[profile['user_id']] = (time.monotonic(), dict(profile))
+            self._profiles.move_to_end(profile['user_id'])
+            while len(self._profiles) > self.max_size:
+                self._profiles.popitem(last=False)
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Drop one user's profile, or all of them"""
+        with self._lock:
+            if user_id is None:
+                self._profiles.clear()
+            else:
+                self._profiles.pop(user_id, None)
+
+    def _fresh(self, user_id: str) -> Optional[Dict]:
+        """Cached profile if still within the TTL; a hit becomes most recently used"""
+        with self._lock:
+            entry = self._profiles.get(user_id)
+            if entry is None:
+                return None
+            loaded_at, profile = entry
+            if time.monotonic() - loaded_at > self.ttl_seconds:
+                del self._profiles[user_id]
+                return None
+            self._profiles.move_to_end(user_id)
+            return dict(profile)
+
+
+def token_claims(profile: Dict) -> Dict:
+    """Non-sensitive profile fields to embed in an issued token"""
+    return {field: profile.get(field) or '' for field in TOKEN_PROFILE_FIELDS}
+
+
+# Singleton instance
+profile_cache = ProfileCache()
@@ -0,0 +1,77 @@
+-- Bulk attendance save with idempotency keys
+--
+-- POST /api/attendance/save-bulk calls save_attendance_bulk() once per
+-- chunk of records: every attendance_records row and all of its
+-- student_attendance rows are written in one transaction, in one round trip.
+-- A record whose idempotency_key already exists is skipped (its existing
+-- record_id is returned), so client retries never duplicate rows.
+
+alter table attendance_records
+    add column if not exists idempotency_key text;
+
+create unique index if not exists attendance_records_idempotency_key_idx
+    on attendance_records (idempotency_key);
+
+create or replace function save_attendance_bulk(p_teacher_id uuid, p_records jsonb)
+returns table (idempotency_key text, record_id text, created boolean)
+language plpgsql
+security definer
+set search_path = public
+as $$
+#variable_conflict use_column
+declare
+    rec jsonb;
+    new_id attendance_records.record_id%type;
+    key text;
+begin
+    for rec in select * from jsonb_array_elements(p_records)
+    loop
+        key := rec ->> 'idempotency_key';
+        new_id := null;
+
+        insert into attendance_records as ar (
+            class_id, teacher_id, date, total_students, present_count, absent_count, idempotency_key
+        )
+        values (
+            (rec ->> 'class_id')::uuid,
+            p_teacher_id,
+            (rec ->> 'date')::date,
+            jsonb_array_length(rec -> 'present_students') + jsonb_array_length(rec -> 'absent_students'),
+            jsonb_array_length(rec -> 'present_students'),
+            jsonb_array_length(rec -> 'absent_students'),
+            key
+        )
+        on conflict (idempotency_key) do nothing
+        returning ar.record_id into new_id;
+
+        if new_id is null then
+            -- Retry of a record we already stored
+            return query
+                select key, ar.record_id::text, false
+                from attendance_records ar
+                where ar.idempotency_key = key;
+            continue;
+        end if;
+
+        insert into student_attendance (record_id, student_id, status, marked_by_ai, manually_edited)
+        select
+            new_id,
+            s.student_id::uuid,
+            s.status,
+            not coalesce((rec ->> 'manually_edited')::boolean, false),
+            coalesce((rec ->> 'manually_edited')::boolean, false)
+        from (
+            select value as student_id, 'present' as status
+            from jsonb_array_elements_text(rec -> 'present_students')
+            union all
+            select value, 'absent'
+            from jsonb_array_elements_text(rec -> 'absent_students')
+        ) s;
+
+        return query select key, new_id::text, true;
+    end loop;
+end;
+$$;
+
+revoke all on function save_attendance_bulk(uuid, jsonb) from public, anon, authenticated;
+grant execute on function save_attendance_bulk(uuid, jsonb) to service_role;
@@ -0,0 +1,124 @@
+-- Student attendance history, aggregated in the database
+--
+-- GET /api/students/attendance calls student_attendance_summary() for the
+-- per-class totals and streaks and student_attendance_sessions() for one
+-- page of recent sessions, instead of pulling every student_attendance row
+-- into Python. Both take an optional inclusive date range; the page's
+-- total count comes from the summary's total_sessions.
+
+create index if not exists student_attendance_student_id_idx
+    on student_attendance (student_id);
+
+create or replace function student_attendance_summary(
+    p_student_id uuid,
+    p_from date default null,
+    p_to date default null
+)
+returns table (
+    class_id text,
+    total_sessions bigint,
+    present_count bigint,
+    absent_count bigint,
+    attendance_percentage numeric,
+    current_streak bigint,
+    longest_streak bigint,
+    first_date date,
+    last_date date,
+    last_present_date date
+)
+language sql
+stable
+security definer
+set search_path = public
+as $$
+    with sessions as (
+        select
+            ar.class_id,
+            ar.date,
+            sa.status,
+            row_number() over (partition by ar.class_id order by ar.date, ar.record_id) as seq,
+            row_number() over (
+                partition by ar.class_id, sa.status = 'present'
+                order by ar.date, ar.record_id
+            ) as seq_in_status
+        from student_attendance sa
+        join attendance_records ar on ar.record_id = sa.record_id
+        where sa.student_id = p_student_id
+          and (p_from is null or ar.date >= p_from)
+          and (p_to is null or ar.date <= p_to)
+    ),
+    -- Gaps and islands: consecutive present sessions share seq - seq_in_status
+    runs as (
+        select class_id, count(*) as length, max(seq) as last_seq
+        from sessions
+        where status = 'present'
+        group by class_id, seq - seq_in_status
+    ),
+    totals as (
+        select
+            class_id,
+            count(*) as total_sessions,
+            count(*) filter (where status = 'present') as present_count,
+            max(seq) as last_seq,
+            min(date) as first_date,
+            max(date) as last_date,
+            max(date) filter (where status = 'present') as last_present_date
+        from sessions
+        group by class_id
+    )
+    select
+        t.class_id::text,
+        t.total_sessions,
+        t.present_count,
+        t.total_sessions - t.present_count,
+        round(100.0 * t.present_count / t.total_sessions, 2),
+        coalesce((select r.length from runs r where r.class_id = t.class_id and r.last_seq = t.last_seq), 0),
+        coalesce((select max(r.length) from runs r where r.class_id = t.class_id), 0),
+        t.first_date,
+        t.last_date,
+        t.last_present_date
+    from totals t
+    order by t.class_id;
+$$;
+
+create or replace function student_attendance_sessions(
+    p_student_id uuid,
+    p_from date default null,
+    p_to date default null,
+    p_class_id uuid default null,
+    p_limit integer default 20,
+    p_offset integer default 0
+)
+returns table (
+    record_id text,
+    class_id text,
+    date date,
+    status text,
+    manually_edited boolean
+)
+language sql
+stable
+security definer
+set search_path = public
+as $$
+    select
+        ar.record_id::text,
+        ar.class_id::text,
+        ar.date,
+        sa.status,
+        sa.manually_edited
+    from student_attendance sa
+    join attendance_records ar on ar.record_id = sa.record_id
+    where sa.student_id = p_student_id
+      and (p_from is null or ar.date >= p_from)
+      and (p_to is null or ar.date <= p_to)
+      and (p_class_id is null or ar.class_id = p_class_id)
+    order by ar.date desc, ar.record_id desc
+    limit p_limit
+    offset p_offset;
+$$;
+
+revoke all on function student_attendance_summary(uuid, date, date) from public, anon, authenticated;
+revoke all on function student_attendance_sessions(uuid, date, date, uuid, integer, integer) from public, anon, authenticated;
+grant execute on function student_attendance_summary(uuid, date, date) to service_role;
+grant execute on function student_attendance_sessions(uuid, date, date, uuid, integer, integer) to service_role;
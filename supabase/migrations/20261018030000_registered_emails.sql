@@ -0,0 +1,25 @@
+-- Case-insensitive lookup of already registered emails
+--
+-- POST /api/auth/register/bulk checks every row's email against
+-- user_profiles before creating anything. A plain .in_() filter compares
+-- case-sensitively, so 'Alice@x.edu' in the table did not stop a new
+-- 'alice@x.edu'. registered_emails() compares lower-cased on both sides
+-- and returns the matches lower-cased.
+
+create index if not exists user_profiles_email_lower_idx
+    on user_profiles (lower(email));
+
+create or replace function registered_emails(p_emails text[])
+returns table (email text)
+language sql
+stable
+security definer
+set search_path = public
+as $$
+    select distinct lower(up.email)
+    from user_profiles up
+    where lower(up.email) = any (select lower(e) from unnest(p_emails) e);
+$$;
+
+revoke all on function registered_emails(text[]) from public, anon, authenticated;
+grant execute on function registered_emails(text[]) to service_role;
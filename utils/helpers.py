@@ -2,10 +2,36 @@ import cv2
 import numpy as np
 import base64
 from PIL import Image
+import csv
 import io
+from config.settings import Config
 
-def decode_base64_image(base64_string: str) -> np.ndarray:
-    """Convert base64 string to OpenCV image"""
+# Raw (non-JSON, non-multipart) bodies accepted by read_request_image
+RAW_IMAGE_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'application/octet-stream')
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+class ImageTooLargeError(ValueError):
+    """Upload exceeds Config.MAX_IMAGE_SIZE_MB"""
+    pass
+
+# cv2 decode flags for JPEG DCT-domain downscaling (other formats are resized after decode)
+REDUCED_DECODE_FLAGS = {
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+}
+# EXIF orientations that swap width and height once applied
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def decode_base64_image(base64_string: str, max_width: int = None) -> np.ndarray:
+    """
+    Convert base64 string to OpenCV image
+    
+    Decoded by decode_image_bytes like the multipart and raw uploads, so
+    EXIF orientation and reduced-resolution decoding behave the same.
+    """
     try:
         # Remove header if present
         if ',' in base64_string:
@@ -13,12 +39,9 @@ def decode_base64_image(base64_string: str) -> np.ndarray:
         
         # Decode
         img_bytes = base64.b64decode(base64_string)
-        img = Image.open(io.BytesIO(img_bytes))
-        img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-        
-        return img_cv
     except Exception as e:
         raise ValueError(f"Invalid image data: {e}")
+    return decode_image_bytes(img_bytes, max_width)
 
 def encode_image_to_base64(image: np.ndarray) -> str:
     """Convert OpenCV image to base64 string"""
@@ -34,3 +57,156 @@ def resize_image_if_needed(image: np.ndarray, max_width: int = 1920) -> np.ndarr
         new_height = int(height * ratio)
         image = cv2.resize(image, (max_width, new_height))
     return image
+
+def reduction_factor(width: int, max_width: int) -> int:
+    """Largest decode scale-down (1, 2, 4 or 8) that keeps width >= max_width"""
+    for factor in (8, 4, 2):
+        if width // factor >= max_width:
+            return factor
+    return 1
+
+def image_header_size(buffer) -> tuple:
+    """(width, height) as displayed, read from the header only (nothing is decoded)"""
+    img = Image.open(io.BytesIO(buffer))
+    width, height = img.size
+    if img.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    return width, height
+
+def decode_image_bytes(buffer, max_width: int = None) -> np.ndarray:
+    """
+    Decode encoded image bytes straight to a BGR array with cv2.imdecode
+    
+    With max_width, the scale is picked from the header so a 12MP JPEG is
+    decoded at 1/2 or 1/4 resolution instead of full size and then shrunk.
+    """
+    if not buffer:
+        raise ValueError("Invalid image data: empty")
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    flags = cv2.IMREAD_COLOR
+    if max_width:
+        try:
+            width, _ = image_header_size(buffer)
+        except Exception:
+            width = 0  # unknown header; let imdecode decide whether it is valid
+        flags = REDUCED_DECODE_FLAGS.get(reduction_factor(width, max_width), flags)
+    image = cv2.imdecode(data, flags)
+    if image is None:
+        raise ValueError("Invalid image data: could not decode")
+    return image
+
+def max_image_bytes() -> int:
+    return int(Config.MAX_IMAGE_SIZE_MB * 1024 * 1024)
+
+def read_stream_limited(stream, limit: int) -> bytearray:
+    """Read a request stream in chunks, failing as soon as it exceeds limit bytes"""
+    buffer = bytearray()
+    while True:
+        chunk = stream.read(STREAM_CHUNK_BYTES)
+        if not chunk:
+            return buffer
+        buffer += chunk
+        if len(buffer) > limit:
+            raise ImageTooLargeError(f"Image exceeds {Config.MAX_IMAGE_SIZE_MB}MB")
+
+def read_request_image(req, max_width: int = None) -> tuple:
+    """
+    Decode the uploaded image from a Flask request. Returns (image, params)
+    
+    max_width enables reduced-resolution decoding (see decode_image_bytes);
+    the result may still be wider, so callers keep resize_image_if_needed.
+
+    Accepts:
+        multipart/form-data: 'image' file part, other fields in params
+        image/jpeg, image/png, ...: raw body, params from the query string
+        application/json: base64 'image' field (legacy), params = JSON body
+
+    The size limit is checked against Content-Length before anything is
+    buffered; raw bodies without one are cut off while streaming.
+    """
+    limit = max_image_bytes()
+    content_type = (req.mimetype or '').lower()
+    content_length = req.content_length
+
+    if content_type == 'multipart/form-data':
+        if content_length is None:
+            raise ValueError("Content-Length required for multipart uploads")
+        if content_length > limit:
+            raise ImageTooLargeError(f"Image exceeds {Config.MAX_IMAGE_SIZE_MB}MB")
+
+        upload = req.files.get('image')
+        if upload is None:
+            raise ValueError("image file part required")
+        image = decode_image_bytes(read_stream_limited(upload.stream, limit), max_width)
+        return image, req.form.to_dict()
+
+    if content_type in RAW_IMAGE_TYPES:
+        if content_length is not None and content_length > limit:
+            raise ImageTooLargeError(f"Image exceeds {Config.MAX_IMAGE_SIZE_MB}MB")
+        image = decode_image_bytes(read_stream_limited(req.stream, limit), max_width)
+        return image, req.args.to_dict()
+
+    # Legacy JSON/base64: base64 inflates the payload by 4/3
+    if content_length is not None and content_length > limit * 4 // 3 + 64 * 1024:
+        raise ImageTooLargeError(f"Image exceeds {Config.MAX_IMAGE_SIZE_MB}MB")
+
+    data = req.get_json(silent=True) or {}
+    if 'image' not in data:
+        raise ValueError("image required")
+    return decode_base64_image(data['image'], max_width), data
+
+def read_request_images(req, max_width: int = None, max_count: int = 1) -> tuple:
+    """
+    Like read_request_image, but a multipart request may carry up to
+    max_count 'image' parts. Returns ([image, ...], params)
+    """
+    if (req.mimetype or '').lower() != 'multipart/form-data':
+        image, params = read_request_image(req, max_width)
+        return [image], params
+
+    limit = max_image_bytes()
+    content_length = req.content_length
+    if content_length is None:
+        raise ValueError("Content-Length required for multipart uploads")
+    if content_length > limit * max_count:
+        raise ImageTooLargeError(f"Upload exceeds {max_count} x {Config.MAX_IMAGE_SIZE_MB}MB")
+
+    uploads = req.files.getlist('image')
+    if not uploads:
+        raise ValueError("image file part required")
+    if len(uploads) > max_count:
+        raise ValueError(f"At most {max_count} images per request")
+
+    images = [
+        decode_image_bytes(read_stream_limited(upload.stream, limit), max_width)
+        for upload in uploads
+    ]
+    return images, req.form.to_dict()
+
+
+def read_request_rows(req, max_rows: int, json_key: str = 'rows') -> list:
+    """
+    Read a table of records from a request: CSV (text/csv body or a
+    multipart 'file' part, header row first) or JSON (a list, or an
+    object holding the list under json_key). Returns [dict, ...]
+    """
+    mimetype = (req.mimetype or '').lower()
+    if mimetype == 'multipart/form-data':
+        upload = req.files.get('file')
+        if upload is None:
+            raise ValueError("file part required")
+        rows = list(csv.DictReader(io.StringIO(upload.stream.read().decode('utf-8-sig'))))
+    elif mimetype in ('text/csv', 'application/csv'):
+        rows = list(csv.DictReader(io.StringIO(req.get_data().decode('utf-8-sig'))))
+    else:
+        data = req.get_json(silent=True)
+        rows = data.get(json_key) if isinstance(data, dict) else data
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError(f"Body must be CSV, a JSON list, or {{'{json_key}': [...]}}")
+
+    if not rows:
+        raise ValueError("No rows to process")
+    if len(rows) > max_rows:
+        raise ValueError(f"At most {max_rows} rows per request")
+    # CSV gives '' for empty cells; treat them as missing
+    return [{k.strip(): v for k, v in row.items() if k and v not in (None, '')} for row in rows]
@@ -2,11 +2,15 @@ import re
 
 def validate_email(email: str) -> bool:
     """Validate email format"""
+    if not isinstance(email, str):
+        return False
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
 
 def validate_password(password: str) -> tuple:
     """Validate password strength. Returns (is_valid, error_message)"""
+    if not isinstance(password, str):
+        return False, "Password must be a string"
     if len(password) < 6:
         return False, "Password must be at least 6 characters"
     return True, ""
@@ -15,3 +19,28 @@ def validate_required_fields(data: dict, required_fields: list) -> tuple:
     """Check if all required fields are present. Returns (is_valid, missing_fields)"""
     missing = [field for field in required_fields if field not in data or not data[field]]
     return len(missing) == 0, missing
+
+def validate_registration(data: dict) -> tuple:
+    """Validate one registration (as /register does). Returns (is_valid, error_message)"""
+    is_valid, missing = validate_required_fields(data, ['email', 'password', 'full_name', 'role'])
+    if not is_valid:
+        return False, f"Missing fields: {missing}"
+    # JSON bodies can carry numbers or lists where text is expected
+    not_text = [
+        field for field in ('email', 'password', 'full_name', 'role', 'department', 'designation', 'section')
+        if field in data and not isinstance(data[field], str)
+    ]
+    if not_text:
+        return False, f"Fields must be strings: {not_text}"
+    if not validate_email(data['email']):
+        return False, "Invalid email format"
+    is_valid, msg = validate_password(data['password'])
+    if not is_valid:
+        return False, msg
+    if data['role'] not in ['teacher', 'student']:
+        return False, "Role must be teacher or student"
+    if data['role'] == 'teacher' and not data.get('employee_id'):
+        return False, "employee_id required for teachers"
+    if data['role'] == 'student' and not data.get('enrollment_number'):
+        return False, "enrollment_number required for students"
+    return True, ""